@@ -17,15 +17,17 @@ limitations under the License.
 """
 import os
 import sys
+import importlib
 
 sys.setrecursionlimit(10000)
 
 # Set the PATH and PYTHON_PATH variables
-from .setup import set_environment, gather_info
+from .setup import set_environment, SystemInfo
 
 set_environment()
 
-system_info = gather_info()
+# Gathered on first use.
+system_info = SystemInfo()
 
 
 def root_path(*args):
@@ -35,38 +37,49 @@ def root_path(*args):
 library_paths = [root_path('problog', 'library')]
 
 
-# Load all submodules. This has two reasons:
-#   - initializes all transformations (@transform)
-#   - makes it possible to just import 'problog' and then use
-#       something like problog.program.PrologFile
-from . import cnf_formula
-from . import core
-from . import engine
-from . import evaluator
-from . import formula
-from . import logic
-from . import ddnnf_formula
-from . import parser
-from . import program
-from . import sdd_formula
-from . import sdd_formula_explicit
-from . import util
-from . import bdd_formula
-from . import forward
-from . import cycles
-from . import kbest
-from . import tasks
-from . import debug
-
-
-_evaluatables = {'sdd': sdd_formula.SDD,
-                 'sddx': sdd_formula_explicit.SDDExplicit,
-                 'bdd': bdd_formula.BDD,
-                 'nnf': ddnnf_formula.DDNNF,
-                 'ddnnf': ddnnf_formula.DDNNF,
-                 'kbest': kbest.KBestFormula,
-                 'fsdd': forward.ForwardSDD,
-                 'fbdd': forward.ForwardBDD}
+# Submodules are imported on first use. This keeps the startup of the command line interface fast:
+#   - the modules that register transformations (@transform) are imported by the first
+#       transformation (see ProbLog.convert)
+#   - it is still possible to just import 'problog' and then use
+#       something like problog.program.PrologFile (through the module __getattr__ below, or by
+#       importing all submodules at the end of this file on Python < 3.7)
+from .core import ProbLog
+
+ProbLog.transformation_modules += [
+    'problog.cnf_formula',
+    'problog.engine',
+    'problog.evaluator',
+    'problog.formula',
+    'problog.ddnnf_formula',
+    'problog.program',
+    'problog.sdd_formula',
+    'problog.sdd_formula_explicit',
+    'problog.bdd_formula',
+    'problog.forward',
+    'problog.cycles',
+    'problog.kbest',
+]
+
+_submodules = {'cnf_formula', 'core', 'engine', 'evaluator', 'formula', 'logic', 'ddnnf_formula',
+               'parser', 'program', 'sdd_formula', 'sdd_formula_explicit', 'util', 'bdd_formula',
+               'forward', 'cycles', 'kbest', 'tasks', 'debug'}
+
+
+def __getattr__(name):
+    if name in _submodules:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
+
+
+# Module and class name of each evaluatable.
+_evaluatables = {'sdd': ('sdd_formula', 'SDD'),
+                 'sddx': ('sdd_formula_explicit', 'SDDExplicit'),
+                 'bdd': ('bdd_formula', 'BDD'),
+                 'nnf': ('ddnnf_formula', 'DDNNF'),
+                 'ddnnf': ('ddnnf_formula', 'DDNNF'),
+                 'kbest': ('kbest', 'KBestFormula'),
+                 'fsdd': ('forward', 'ForwardSDD'),
+                 'fbdd': ('forward', 'ForwardBDD')}
 
 
 def get_evaluatables():
@@ -76,9 +89,17 @@ def get_evaluatables():
 def get_evaluatable(name=None, semiring=None):
     if name is None:
         if semiring is None or semiring.is_dsp():
-            return evaluator.EvaluatableDSP
+            from .evaluator import EvaluatableDSP
+            return EvaluatableDSP
         else:
-            return formula.LogicNNF
+            from .formula import LogicNNF
+            return LogicNNF
     else:
-        return _evaluatables[name]
+        module, cls = _evaluatables[name]
+        return getattr(importlib.import_module('.' + module, __name__), cls)
 
+
+# Module __getattr__ requires Python 3.7 (PEP 562): load all submodules on older versions.
+if sys.version_info < (3, 7):
+    for _name in sorted(_submodules):
+        importlib.import_module('.' + _name, __name__)
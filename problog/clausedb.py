@@ -5,7 +5,9 @@ import os
 from collections import defaultdict, namedtuple
 
 from .program import LogicProgram, PrologFile
+from . import library_cache
 from .logic import *
+from .engine_unify import compile_head
 
 from .errors import GroundingError, InvalidValue
 from .util import OrderedSet
@@ -73,6 +75,7 @@ class ClauseDB(LogicProgram):
         self.__parent = parent
         self.__node_redirect = {}
         self.__extern = defaultdict(list)
+        self.__matchers = {}    # node index => compiled head matcher
 
         if parent is None:
             self.__offset = 0
@@ -84,6 +87,7 @@ class ClauseDB(LogicProgram):
             self.__offset = len(parent)
 
         self.dont_cache = set()
+        self.cache_policies = {}    # (functor, arity) => tabling policy (see set_cache_policy)
 
         self.queries = []
         self._load_builtin_module()
@@ -206,6 +210,27 @@ class ClauseDB(LogicProgram):
         else:
             return self.__nodes[index - self.__offset]
 
+    def get_head_matcher(self, index):
+        """Get the compiled head matcher of the clause or fact at the given index.
+
+        The matcher is created when it is first requested (see :func:`.engine_unify.compile_head`).
+
+        :param index: index of a ``clause`` or ``fact`` node
+        :type index: :class:`int`
+        :returns: function ``match(call_args, target_context)``
+        """
+        index = self.__node_redirect.get(index, index)
+
+        if index < self.__offset:
+            return self.__parent.get_head_matcher(index)
+        matcher = self.__matchers.get(index)
+        if matcher is None:
+            node = self.__nodes[index - self.__offset]
+            # The context of a clause is fresh, facts are unified with the call context itself.
+            matcher = compile_head(node.args, fresh=isinstance(node, self._clause))
+            self.__matchers[index] = matcher
+        return matcher
+
     def _set_node(self, index, node):
         if index < self.__offset:
             raise IndexError('Can\'t update node in parent.')
@@ -309,6 +334,26 @@ class ClauseDB(LogicProgram):
         else:
             return self.add_clause(Clause(term, Term('true')), scope=scope)
 
+    def set_cache_policy(self, functor, arity, policy, location=None):
+        """Set the tabling policy of a predicate.
+
+        :param functor: functor of the predicate
+        :param arity: arity of the predicate
+        :param policy: 'always' (table all calls, default), 'never' (don't table calls) or a \
+        positive integer (table the results of this many most recently used calls)
+        :param location: location of the declaration (used for error messages)
+        :raises InvalidValue: the policy is not valid
+        """
+        if policy not in ('always', 'never') and \
+                not (type(policy) == int and policy > 0):
+            raise InvalidValue("Invalid tabling policy for '%s/%s': %s" % (functor, arity, policy),
+                               location=location)
+        predicate = (functor, arity)
+        if policy == 'always':
+            self.cache_policies.pop(predicate, None)
+        else:
+            self.cache_policies[predicate] = policy
+
     def add_extern(self, predicate, arity, func, scope=None):
         head = Term(predicate, *[None] * arity)
         head = self._scope_term(head, scope)
@@ -601,8 +646,15 @@ class ClauseDB(LogicProgram):
             identifier = len(self.source_files)
             self.source_files.append(filename)
             self.source_parent.append(location)
-            program = PrologFile(filename, identifier=identifier, factory=self.extra_info.get('factory'),
-                            parser=self.extra_info.get('parser'))
+            factory = self.extra_info.get('factory')
+            parser = self.extra_info.get('parser')
+            if library_cache.is_cached(filename, parser):
+                cached = library_cache.load(filename, identifier=identifier, factory=factory)
+                if cached is not None:
+                    clauses, line_info = cached
+                    self.line_info.append(line_info)
+                    return self.add_all(clauses)
+            program = PrologFile(filename, identifier=identifier, factory=factory, parser=parser)
             self.line_info.append(program.line_info[0])
             # engine._process_directives(database)
             return self.add_all(program)
@@ -335,20 +335,8 @@ def clarks_completion(source, destination, force_atoms=False, **kwdargs):
             destination.add_atom(i+1, force=force_atoms)
 
         # Complete other nodes
-        # Note: assumes negation is encoded as negative number.
-        for index, node, nodetype in source:
-            if nodetype == 'conj':
-                destination.add_clause(index, list(map(lambda x: -x, node.children)))
-                for c in node.children:
-                    destination.add_clause(-index, [c])
-            elif nodetype == 'disj':
-                destination.add_clause(-index, node.children)
-                for c in node.children:
-                    destination.add_clause(index, [-c])
-            elif nodetype == 'atom':
-                pass
-            else:
-                raise ValueError("Unexpected node type: '%s'" % nodetype)
+        for head, body in _completion_clauses(source):
+            destination.add_clause(head, body)
 
         # Copy constraints.
         for c in source.constraints():
@@ -359,3 +347,60 @@ def clarks_completion(source, destination, force_atoms=False, **kwdargs):
             destination.add_name(n, i, l)
 
         return destination
+
+
+def _completion_clauses(source):
+    """Generate the clauses of Clark's completion of the nodes of the given formula.
+
+    :param source: acyclic program
+    :return: iterator of clauses (head, body)
+    """
+    # Note: assumes negation is encoded as negative number.
+    for index, node, nodetype in source:
+        if nodetype == 'conj':
+            yield index, list(map(lambda x: -x, node.children))
+            for c in node.children:
+                yield -index, [c]
+        elif nodetype == 'disj':
+            yield -index, node.children
+            for c in node.children:
+                yield index, [-c]
+        elif nodetype == 'atom':
+            pass
+        else:
+            raise ValueError("Unexpected node type: '%s'" % nodetype)
+
+
+def write_dimacs(source, output, names=False):
+    """Write the CNF of an acyclic program in DIMACS format without constructing the CNF.
+
+    The output is the same as ``CNF.create_from(source).to_dimacs(names=names)``, but the clauses \
+    are generated while writing.
+    This is used for formulas with ``disk_storage``, which are read twice instead of being \
+    loaded in memory.
+
+    :param source: acyclic program to transform
+    :type source: LogicDAG
+    :param output: file object to write to
+    :param names: Print names in comments
+    """
+    with Timer('Clark\'s completion'):
+        constraints = [list(c.as_clauses()) for c in source.constraints()]
+        clausecount = sum(len(c) for c in constraints)
+        for index, node, nodetype in source:
+            if nodetype == 'conj' or nodetype == 'disj':
+                clausecount += len(node.children) + 1
+
+        output.write('p cnf %s %s\n' % (len(source), clausecount))
+        if names:
+            tpl = 'c {{:<{}}} {{}}\n'.format(len(str(len(source))) + 1)
+            for n, i, l in source.get_names_with_label():
+                output.write(tpl.format(i, n))
+        separator = ''
+        for head, body in _completion_clauses(source):
+            output.write(separator + ' '.join(map(str, [head] + list(body))) + ' 0')
+            separator = '\n'
+        for clauses in constraints:
+            for body in clauses:
+                output.write(separator + ' '.join(map(str, body)) + ' 0')
+                separator = '\n'
@@ -204,6 +204,7 @@ class ConstraintAD(Constraint):
         result = ConstraintAD(self.group)
         result.nodes = set(rename.get(x, x) for x in self.nodes)
         result.extra_node = rename.get(self.extra_node, self.extra_node)
+        result.location = self.location
         return result
 
     def check(self, values):
@@ -23,6 +23,7 @@ Provides core functionality of ProbLog.
 """
 from __future__ import print_function
 
+import importlib
 from collections import defaultdict
 
 from .errors import ProbLogError
@@ -37,6 +38,14 @@ class ProbLog(object):
     transformations = defaultdict(list)
     create_as = defaultdict(list)
     allow_subclass = set()
+    # Names of the modules that register transformations, imported on first use.
+    transformation_modules = []
+
+    @classmethod
+    def load_transformations(cls):
+        """Import the modules in :attr:`transformation_modules` that are not imported yet."""
+        while cls.transformation_modules:
+            importlib.import_module(cls.transformation_modules.pop(0))
 
     @classmethod
     def register_transformation(cls, src, target, action=None):
@@ -103,6 +112,7 @@ class ProbLog(object):
         :param target: target class
         :param kwdargs: additional arguments passed to transformation functions
         """
+        cls.load_transformations()
 
         for d in cls.create_as[target]:
             if type(src) == d:
@@ -209,6 +219,7 @@ class transform(object):
 
 def list_transformations():
     """Print an overview of available transformations."""
+    ProbLog.load_transformations()
     print ('Available transformations:')
     for target in ProbLog.transformations:
         print ('\tcreate %s.%s' % (target.__module__, target.__name__))
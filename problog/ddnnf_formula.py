@@ -58,20 +58,30 @@ class DDNNF(LogicDAG, EvaluatableDSP):
         LogicDAG.__init__(self, auto_compact=False)
 
     def _create_evaluator(self, semiring, weights, **kwargs):
-        return SimpleDDNNFEvaluator(self, semiring, weights)
+        return SimpleDDNNFEvaluator(self, semiring, weights, **kwargs)
 
 
 class SimpleDDNNFEvaluator(Evaluator):
     """Evaluator for d-DNNFs."""
 
-    def __init__(self, formula, semiring, weights=None, **kwargs):
+    def __init__(self, formula, semiring, weights=None, extracted_weights=None, **kwargs):
+        """
+        :param extracted_weights: weights in internal representation (see \
+        :func:`LogicFormula.extract_weights`); when given, the weights are not extracted from the \
+        formula
+        :type extracted_weights: dict[int, tuple[any, any]]
+        """
         Evaluator.__init__(self, formula, semiring, weights, **kwargs)
         self.cache_intermediate = {}  # weights of intermediate nodes
+        self._extracted_weights = extracted_weights
 
     def _initialize(self, with_evidence=True):
         self.weights.clear()
 
-        model_weights = self.formula.extract_weights(self.semiring, self.given_weights)
+        if self._extracted_weights is not None:
+            model_weights = self._extracted_weights
+        else:
+            model_weights = self.formula.extract_weights(self.semiring, self.given_weights)
         self.weights = model_weights.copy()
 
         if with_evidence:
@@ -122,6 +132,68 @@ class SimpleDDNNFEvaluator(Evaluator):
                 result = self.semiring.normalize(result, self._get_z())
         return self.semiring.result(result, self.formula)
 
+    def evaluate_facts(self, nodes):
+        """Evaluate a list of facts at once.
+
+        This computes the derivatives of the circuit with respect to all literal weights in one \
+        backward pass (reverse mode), instead of one circuit evaluation per fact.
+        The result is the same as calling :func:`evaluate_fact` for each node.
+
+        :param nodes: nodes of the facts to evaluate
+        :type nodes: list[int]
+        :return: list of results
+        """
+        root = len(self.formula)
+        semiring = self.semiring
+        # Forward pass: fill the cache of intermediate weights bottom-up.
+        for index in range(1, root + 1):
+            if index not in self.weights:
+                self._get_weight(index)
+
+        # Backward pass: derivative of the root weight with respect to each node.
+        derivatives = {root: semiring.one()}
+        for index in range(root, 0, -1):
+            d = derivatives.get(index)
+            if d is None or index in self.weights:
+                continue
+            node = self.formula.get_node(index)
+            ntype = type(node).__name__
+            if ntype == 'disj':
+                for c in node.children:
+                    prev = derivatives.get(c)
+                    derivatives[c] = d if prev is None else semiring.plus(prev, d)
+            elif ntype == 'conj':
+                children = node.children
+                # Product of the other children (prefix and suffix products avoid division).
+                suffix = [semiring.one()] * (len(children) + 1)
+                for i in range(len(children) - 1, -1, -1):
+                    suffix[i] = semiring.times(suffix[i + 1], self._get_weight(children[i]))
+                prefix = d
+                for i, c in enumerate(children):
+                    value = semiring.times(prefix, suffix[i + 1])
+                    prev = derivatives.get(c)
+                    derivatives[c] = value if prev is None else semiring.plus(prev, value)
+                    prefix = semiring.times(prefix, self._get_weight(c))
+
+        results = []
+        for node in nodes:
+            if node == 0 or node is None or abs(node) not in self.weights:
+                results.append(self.evaluate(node))
+                continue
+            if node not in derivatives and -node not in derivatives:
+                # The fact does not occur in the circuit: it is independent of the evidence.
+                pos, neg = self.weights[abs(node)]
+                w = self._get_weight(node)
+                result = semiring.normalize(w, semiring.plus(pos, neg))
+            else:
+                result = semiring.times(self._get_weight(node), derivatives.get(node, semiring.zero()))
+                if self.weights.get(0) is not None:
+                    result = semiring.times(result, self.weights.get(0)[0])
+                if self.has_evidence() or semiring.is_nsp():
+                    result = semiring.normalize(result, self._get_z())
+            results.append(semiring.result(result, self.formula))
+        return results
+
     def _reset_value(self, index, pos, neg):
         self.set_weight(index, pos, neg)
 
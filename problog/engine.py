@@ -491,6 +491,12 @@ class ClauseDBEngine(GenericEngine):
             else:
                 self.ground_queries(db, target, queries)
                 self.ground_evidence(db, target, evidence)
+        if logger.isEnabledFor(logging.DEBUG) and hasattr(getattr(target, '_cache', None), 'statistics'):
+            for predicate, stats in sorted(target._cache.statistics().items()):
+                hits, misses, size, evictions = stats
+                logger.debug('Tabling %s: %.1f%% hits (%s calls), %s tabled, %s discarded',
+                             predicate, 100.0 * hits / max(1, hits + misses), hits + misses,
+                             size, evictions)
         return target
 
     def add_external_calls(self, externals):
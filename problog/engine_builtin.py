@@ -205,6 +205,7 @@ def add_standard_builtins(engine, b=None, s=None, sp=None):
     engine.add_builtin('cmd_args', 1, s(_builtin_cmdargs))
     engine.add_builtin('atom_number', 2, s(_builtin_atom_number))
     engine.add_builtin('nocache', 2, b(_builtin_nocache))
+    engine.add_builtin('cache_policy', 3, b(_builtin_cache_policy))
 
     engine.add_builtin('numbervars', 2, s(_builtin_numbervars_0))
     engine.add_builtin('numbervars', 3, s(_builtin_numbervars))
@@ -238,6 +239,19 @@ def _builtin_nocache(functor, arity, database=None, **kwd):
     return True
 
 
+def _builtin_cache_policy(functor, arity, policy, database=None, location=None, **kwd):
+    check_mode((functor, arity, policy), ['aia', 'aic'], database=database, location=location,
+               **kwd)
+    if policy.functor == 'lru' and policy.arity == 1 and _is_integer(policy.args[0]):
+        policy = int(policy.args[0])
+    else:
+        policy = str(policy)
+    if location:
+        location = database.lineno(location)
+    database.set_cache_policy(str(functor), int(arity), policy, location=location)
+    return True
+
+
 def _builtin_clause(head, body, database=None, **kwd):
     mode = check_mode((head, body), ['c*', 'v*'], **kwd)
 
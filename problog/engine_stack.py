@@ -26,14 +26,14 @@ from __future__ import print_function
 import sys
 import random
 
-from .logic import Term, ArithmeticError, is_ground, list2term
+from .logic import Term, Constant, ArithmeticError, is_ground, list2term
 from .engine import UnifyError, instantiate, UnknownClause, UnknownClauseInternal, is_variable
 from .engine import NonGroundProbabilisticClause
 from .errors import GroundingError
 from .engine import ClauseDBEngine, substitute_head_args, substitute_call_args, unify_call_head, \
     unify_call_return, OccursCheck, substitute_simple
 from .engine_builtin import add_standard_builtins, IndirectCallCycleError
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 
 
 class NegativeCycle(GroundingError):
@@ -96,19 +96,19 @@ def results_to_actions(resultlist, engine, node, context, target, parent, identi
                     result = transform(result)
                 if result is None:
                     if n == 0:
-                        actions += [complete(parent, identifier)]
+                        actions.append(complete(parent, identifier))
                 else:
                     if target_node == NODE_TRUE and target.flag('keep_all') \
                             and not node.functor.startswith('_problog'):
                         name = Term(node.functor, *result)
                         target_node = target.add_atom(name, None, None, name=name, source=None)
 
-                    actions += [new_result(parent, result, target_node, identifier, n == 0)]
+                    actions.append(new_result(parent, result, target_node, identifier, n == 0))
             elif n == 0:
-                actions += [complete(parent, identifier)]
+                actions.append(complete(parent, identifier))
     else:
         # The goal does not have results: send the completion message.
-        actions += [complete(parent, identifier)]
+        actions.append(complete(parent, identifier))
     return actions
 
 
@@ -330,7 +330,7 @@ class StackBasedEngine(ClauseDBEngine):
         # This is stored in the target ground program because
         # node ids are only valid in that context.
         if not hasattr(target, '_cache'):
-            target._cache = DefineCache(database.dont_cache)
+            target._cache = DefineCache(database.dont_cache, database.cache_policies)
 
         # Retrieve the list of actions needed to evaluate the top-level node.
         # parent = kwdargs.get('parent')
@@ -372,7 +372,7 @@ class StackBasedEngine(ClauseDBEngine):
                 #     parent = actions._msg_parent(message)
                 #     print (parent, self.in_cycle(parent))
                 next_actions = self.cycle_root.closeCycle(True)
-                actions += reversed(next_actions)
+                actions.push(next_actions)
             else:
                 act, obj, args, context = actions.pop()
 
@@ -464,7 +464,7 @@ class StackBasedEngine(ClauseDBEngine):
                         # If there are no more actions and we have an active cycle, we should close the cycle.
                         next_actions = self.cycle_root.closeCycle(True)
                     # Update the list of actions.
-                    actions += list(reversed(next_actions))
+                    actions.push(next_actions)
 
                     # Do debugging.
                     if self.debug:  # pragma: no cover
@@ -511,7 +511,7 @@ class StackBasedEngine(ClauseDBEngine):
         # This is stored in the target ground program because
         # node ids are only valid in that context.
         if not hasattr(target, '_cache'):
-            target._cache = DefineCache(database.dont_cache)
+            target._cache = DefineCache(database.dont_cache, database.cache_policies)
 
         # Retrieve the list of actions needed to evaluate the top-level node.
         # parent = kwdargs.get('parent')
@@ -522,7 +522,7 @@ class StackBasedEngine(ClauseDBEngine):
 
         # Initialize the action stack.
         actions = self.init_message_stack()
-        actions += reversed(initial_actions)
+        actions.push(initial_actions)
         solutions = []
 
         # Main loop: process actions until there are no more.
@@ -545,7 +545,7 @@ class StackBasedEngine(ClauseDBEngine):
                 #     parent = actions._msg_parent(message)
                 #     print (parent, self.in_cycle(parent))
                 next_actions = self.cycle_root.closeCycle(True)
-                actions += reversed(next_actions)
+                actions.push(next_actions)
             else:
                 act, obj, args, context = actions.pop()
                 if debugger:
@@ -644,7 +644,7 @@ class StackBasedEngine(ClauseDBEngine):
                         # If there are no more actions and we have an active cycle, we should close the cycle.
                         next_actions = self.cycle_root.closeCycle(True)
                     # Update the list of actions.
-                    actions += list(reversed(next_actions))
+                    actions.push(next_actions)
 
                     # Do debugging.
                     if self.debug:  # pragma: no cover
@@ -745,10 +745,10 @@ class StackBasedEngine(ClauseDBEngine):
                 else:
                     print('    %s: %s' % (i, x))
 
-    def eval_fact(self, parent, node_id, node, context, target, identifier, **kwdargs):
+    def eval_fact(self, parent, node_id, node, context, target, identifier, database, **kwdargs):
         try:
             # Verify that fact arguments unify with call arguments.
-            unify_call_head(context, node.args, context)
+            database.get_head_matcher(node_id)(context, context)
 
             if True or self.label_all:
                 name = Term(node.functor, *node.args)
@@ -874,17 +874,15 @@ class StackBasedEngine(ClauseDBEngine):
         ground_mask = [not is_ground(c) for c in call_args]
 
         def result_transform(result):
-            if hasattr(result, 'state'):
-                state1 = result.state
-            else:
-                state1 = None
-
-            output1 = self._clone_context(context, state=state1)
+            # The state of the result replaces the state of the calling context.
+            state = get_state(result)
+            if state is None:
+                state = get_state(context)
             try:
                 assert (len(result) == len(node.args))
-                output = unify_call_return(result, call_args, output1, var_translate, min_var,
+                output = unify_call_return(result, call_args, context, var_translate, min_var,
                                            mask=ground_mask)
-                output = self.create_context(output, parent=output1)
+                output = Context(output, state=state or NULL_STATE)
                 if self.debugger:
                     location = kwdargs['database'].lineno(node.location)
                     self.debugger.call_result(node_id, node.functor, call_args, result, location)
@@ -926,7 +924,7 @@ class StackBasedEngine(ClauseDBEngine):
 
         try:
             try:
-                unify_call_head(context, node.args, new_context)
+                kwdargs['database'].get_head_matcher(node_id)(context, new_context)
             except OccursCheck as err:
                 raise OccursCheck(location=kwdargs['database'].lineno(node.location))
 
@@ -1002,22 +1000,18 @@ class StackBasedEngine(ClauseDBEngine):
         return actions
 
     def create_context(self, content, define=None, parent=None, state=None):
-        """Create a variable context."""
-
-        con = Context(content)
-        if state is not None:
-            con.state = state
-        elif not con.state:
-            con.state = get_state(parent)
-        if con.state is None:
-            con.state = State()
-        return con
-
-    def _clone_context(self, context, parent=None, state=None):
-        con = Context(context, state=state)
-        if not con.state:
-            con.state = get_state(parent)
-        return con
+        """Create a variable context.
+
+        The context takes the given state, the state of the content or the state of the parent \
+        (in that order). Contexts without state share the (immutable) :data:`NULL_STATE`.
+        """
+        if state is None:
+            state = get_state(content)
+            if not state:
+                state = get_state(parent)
+                if state is None:
+                    state = NULL_STATE
+        return Context(content, state)
 
     def _fix_context(self, context):
         return FixedContext(context)
@@ -1083,16 +1077,34 @@ class State(dict):
         return hash(tuple([(k, tuple(v)) for k, v in self.items()]))
 
 
+class _NullState(State):
+    """Empty state that is shared by all contexts without state."""
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('The null state can not be modified.')
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _immutable
+
+    def __reduce__(self):
+        return _null_state, ()
+
+
+def _null_state():
+    return NULL_STATE
+
+
+NULL_STATE = _NullState()
+
+
 class Context(list):
 
     def __init__(self, parent, state=None):
         list.__init__(self, parent)
         if state is None:
-            self.state = get_state(parent)
-        else:
-            self.state = state
-        if self.state is None:
-            self.state = State()
+            state = get_state(parent)
+            if state is None:
+                state = NULL_STATE
+        self.state = state
 
     def __repr__(self):
         return '%s {%s}' % (list.__repr__(self), self.state)
@@ -1139,6 +1151,14 @@ class MessageQueue(object):
             self.append(message)
         return self
 
+    def push(self, messages):
+        """Add a batch of messages such that the first message of the batch is popped first.
+
+        :param messages: list of messages
+        """
+        for message in reversed(messages):
+            self.append(message)
+
     def cycle_exhausted(self):
         """Check whether there are messages inside the cycle.
 
@@ -1190,6 +1210,12 @@ class MessageFIFO(MessageQueue):
         if self.engine.debugger:
             self.engine.debugger.process_message(*message)
 
+    def push(self, messages):
+        self.messages.extend(reversed(messages))
+        if self.engine.debugger:
+            for message in reversed(messages):
+                self.engine.debugger.process_message(*message)
+
     def pop(self):
         return self.messages.pop(-1)
 
@@ -1249,6 +1275,9 @@ class MessageOrderD(MessageAnyOrder):
     def append(self, message):
         self.messages.append(message)
 
+    def push(self, messages):
+        self.messages.extend(reversed(messages))
+
     def pop(self):
         return self.messages.pop(-1)
 
@@ -1462,80 +1491,6 @@ class EvalOr(EvalNode):
         return EvalNode.__str__(self) + ' tc: ' + str(self.to_complete)
 
 
-class NestedDict(object):
-    def __init__(self):
-        self.__base = {}
-
-    def __getitem__(self, key):
-        p_key, s_key = key
-        p_key = (p_key, len(s_key))
-        s_key = list(s_key) + [get_state(s_key)]
-        elem = self.__base[p_key]
-        for s in s_key:
-            elem = elem[s]
-        return elem
-
-    def get(self, key, default=None):
-        try:
-            return self[key]
-        except KeyError:
-            return default
-
-    def __contains__(self, key):
-        p_key, s_key = key
-        p_key = (p_key, len(s_key))
-        s_key = list(s_key) + [get_state(s_key)]
-        try:
-            elem = self.__base[p_key]
-            for s in s_key:
-                elem = elem[s]
-            return True
-        except KeyError:
-            return False
-
-    def __setitem__(self, key, value):
-        p_key, s_key = key
-        p_key = (p_key, len(s_key))
-        s_key = list(s_key) + [get_state(s_key)]
-        if s_key:
-            elem = self.__base.get(p_key)
-            if elem is None:
-                elem = {}
-                self.__base[p_key] = elem
-            for s in s_key[:-1]:
-                elemN = elem.get(s)
-                if elemN is None:
-                    elemN = {}
-                    elem[s] = elemN
-                elem = elemN
-            elem[s_key[-1]] = value
-        else:
-            self.__base[p_key] = value
-
-    def __delitem__(self, key):
-        p_key, s_key = key
-        p_key = (p_key, len(s_key))
-        s_key = list(s_key) + [get_state(s_key)]
-        if s_key:
-            elem = self.__base[p_key]
-            elems = [(p_key, self.__base, elem)]
-            for s in s_key[:-1]:
-                elem_n = elem[s]
-                elems.append((s, elem, elem_n))
-                elem = elem_n
-            del elem[s_key[-1]]  # Remove last element
-            for s, e, ec in reversed(elems):
-                if len(ec) == 0:
-                    del e[s]
-                else:
-                    break
-        else:
-            del self.__base[p_key]
-
-    def __str__(self):  # pragma: no cover
-        return str(self.__base)
-
-
 class VarReindex(object):
 
     def __init__(self):
@@ -1556,94 +1511,244 @@ class VarReindex(object):
         #     return var
 
 
+def _term_key(term, reindex=None):
+    """Build a hashable key for a term.
+
+    Two terms have equal keys if and only if they are equal as Terms. Atoms and constants are \
+    represented by their value, such that they can be hashed and compared without calling back \
+    into Python. Compound terms are represented by the term itself (its hash is cached).
+
+    :param term: term or variable
+    :param reindex: renaming of the variables (see :class:`VarReindex`), or None for ground terms
+    :return: hashable key
+    """
+    if term is None or type(term) == int:
+        return term if reindex is None else reindex[term]
+    cls = type(term)
+    if cls is Term and term.arity == 0 and type(term.functor) == str:
+        return term.functor
+    elif cls is Constant:
+        return Constant, type(term.functor), term.functor
+    elif term.is_var():
+        return term if reindex is None else reindex[term.name]
+    elif reindex is None:
+        return term
+    else:
+        return term.apply(reindex)
+
+
+def _goal_key(args, reindex=None):
+    """Build the key for a goal with the given arguments (see :func:`_term_key`).
+
+    :param args: arguments of the goal (a context)
+    :param reindex: renaming of the variables, or None for ground goals
+    :return: tuple of the argument keys and the state of the context
+    """
+    return tuple([_term_key(arg, reindex) for arg in args]), get_state(args) or None
+
+
+class _LRUTable(OrderedDict):
+    """Table that discards the least recently used entries when it exceeds its size."""
+
+    def __init__(self, size):
+        OrderedDict.__init__(self)
+        self.size = size
+        self.evictions = 0
+
+    def __setitem__(self, key, value):
+        OrderedDict.__setitem__(self, key, value)
+        self.move_to_end(key)
+        while len(self) > self.size:
+            # Not popitem(): before Python 3.11 it may call the overridden methods.
+            OrderedDict.__delitem__(self, next(iter(self)))
+            self.evictions += 1
+
+    def touch(self, key):
+        """Mark the given entry as most recently used."""
+        self.move_to_end(key)
+
+    def copy(self):
+        result = _LRUTable(self.size)
+        for key, value in self.items():
+            OrderedDict.__setitem__(result, key, value)
+        result.evictions = self.evictions
+        return result
+
+
 class DefineCache(object):
-    def __init__(self, dont_cache):
-        self.__non_ground = NestedDict()
-        self.__ground = NestedDict()
-        self.__active = NestedDict()
+    """Table of the evaluated goals and their results.
+
+    The tabling policy of a predicate determines which results are kept:
+
+        - ``'always'`` (default): all results are kept
+        - ``'never'``: no results are kept (same as the predicates in *dont_cache*)
+        - an integer *n*: the results of the *n* most recently used goals are kept
+
+    Goals in progress (needed for cycle detection) are always tabled.
+
+    :param dont_cache: set of predicates (functor, arity) that are not tabled
+    :param policies: dictionary of tabling policies per predicate (functor, arity)
+    """
+
+    def __init__(self, dont_cache, policies=None):
+        self.__non_ground = {}
+        self.__ground = {}
+        self.__active = {}
         self.__dont_cache = dont_cache
+        self.__policies = {} if policies is None else policies
+        self.__statistics = {}
+
+    def copy(self):
+        """Copy the cache (the cached results are shared)."""
+        result = DefineCache(self.__dont_cache, self.__policies)
+        result.__non_ground = {k: v.copy() for k, v in self.__non_ground.items()}
+        result.__ground = {k: v.copy() for k, v in self.__ground.items()}
+        result.__active = {k: v.copy() for k, v in self.__active.items()}
+        result.__statistics = {k: list(v) for k, v in self.__statistics.items()}
+        return result
 
     def reset(self):
-        self.__non_ground = NestedDict()
-        self.__ground = NestedDict()
+        self.__non_ground = {}
+        self.__ground = {}
+
+    def _table(self, tables, predicate):
+        """Get the results table of the given predicate (created according to its policy)."""
+        table = tables.get(predicate)
+        if table is None:
+            policy = self.__policies.get(predicate)
+            if type(policy) == int:
+                table = _LRUTable(policy)
+            else:
+                table = {}
+            tables[predicate] = table
+        return table
 
-    def _reindex_vars(self, goal):
-        ri = VarReindex()
-        return goal[0], [substitute_simple(g, ri) for g in goal[1]]
+    def _key(self, goal):
+        """Translate a goal into its predicate and its key.
+
+        :param goal: tuple of functor and arguments
+        :return: tuple of predicate (functor, arity), ground flag and goal key
+        """
+        functor, args = goal
+        if is_ground(*args):
+            return (functor, len(args)), True, _goal_key(args)
+        else:
+            return (functor, len(args)), False, _goal_key(args, VarReindex())
 
     def is_dont_cache(self, goal):
-        return goal[0][:9] == '_nocache_' or (goal[0], len(goal[1])) in self.__dont_cache
+        return goal[0][:9] == '_nocache_' or (goal[0], len(goal[1])) in self.__dont_cache or \
+            self.__policies.get((goal[0], len(goal[1]))) == 'never'
 
     def activate(self, goal, node):
-        self.__active[self._reindex_vars(goal)] = node
+        predicate, ground, key = self._key(goal)
+        table = self.__active.get(predicate)
+        if table is None:
+            table = self.__active[predicate] = {}
+        table[key] = node
 
     def deactivate(self, goal):
-        del self.__active[self._reindex_vars(goal)]
+        predicate, ground, key = self._key(goal)
+        table = self.__active[predicate]
+        del table[key]
+        if not table:
+            del self.__active[predicate]
 
     def getEvalNode(self, goal):
-        return self.__active.get(self._reindex_vars(goal))
+        predicate, ground, key = self._key(goal)
+        table = self.__active.get(predicate)
+        if table is None:
+            return None
+        return table.get(key)
 
     def __setitem__(self, goal, results):
         if self.is_dont_cache(goal):
             return
         # Results
         functor, args = goal
+        predicate = (functor, len(args))
         if is_ground(*args):
+            table = self._table(self.__ground, predicate)
             if results:
                 # assert(len(results) == 1)
                 res_key = next(iter(results.keys()))
-                key = (functor, res_key)
-                self.__ground[key] = results[res_key]
+                table[_goal_key(res_key)] = results[res_key]
             else:
-                key = (functor, args)
-                self.__ground[key] = NODE_FALSE  # Goal failed
+                table[_goal_key(args)] = NODE_FALSE  # Goal failed
         else:
-            goal = self._reindex_vars(goal)
             res_keys = list(results.keys())
-            self.__non_ground[goal] = results
+            self._table(self.__non_ground, predicate)[_goal_key(args, VarReindex())] = \
+                results
             all_ground = True
             for res_key in res_keys:
-                key = (functor, res_key)
                 all_ground &= is_ground(*res_key)
                 if not all_ground:
                     break
 
             # TODO caching might be incorrect if program contains var(X) or nonvar(X) or ground(X).
             if all_ground:
+                table = self._table(self.__ground, predicate)
                 for res_key in res_keys:
-                    key = (functor, res_key)
-                    self.__ground[key] = results[res_key]
+                    table[_goal_key(res_key)] = results[res_key]
 
     def get(self, key, default=None):
+        """Get the results of the given goal and update the statistics of its predicate."""
+        predicate, ground, goal_key = self._key(key)
+        statistics = self.__statistics.get(predicate)
+        if statistics is None:
+            statistics = self.__statistics[predicate] = [0, 0]
         try:
-            return self[key]
+            result = self._lookup(key, predicate, ground, goal_key)
+            statistics[0] += 1
+            return result
         except KeyError:
+            statistics[1] += 1
             return default
 
-    def __getitem__(self, goal):
-        functor, args = goal
-        if is_ground(*args):
-            return [(args, self.__ground[goal])]
+    def _lookup(self, goal, predicate, ground, key):
+        table = (self.__ground if ground else self.__non_ground)[predicate]
+        result = table[key]
+        if type(table) is _LRUTable:
+            table.touch(key)
+        if ground:
+            return [(goal[1], result)]
         else:
-            goal = self._reindex_vars(goal)
-            # res_keys = self.__non_ground[goal]
-            return self.__non_ground[goal].items()
+            return result.items()
+
+    def __getitem__(self, goal):
+        return self._lookup(goal, *self._key(goal))
 
     def __delitem__(self, goal):
-        functor, args = goal
-        if is_ground(*args):
-            del self.__ground[goal]
+        predicate, ground, key = self._key(goal)
+        if ground:
+            del self.__ground[predicate][key]
         else:
-            goal = self._reindex_vars(goal)
-            del self.__non_ground[goal]
+            del self.__non_ground[predicate][key]
 
     def __contains__(self, goal):
-        functor, args = goal
-        if is_ground(*args):
-            return goal in self.__ground
+        predicate, ground, key = self._key(goal)
+        if ground:
+            table = self.__ground.get(predicate)
         else:
-            goal = self._reindex_vars(goal)
-            return goal in self.__non_ground
+            table = self.__non_ground.get(predicate)
+        return table is not None and key in table
+
+    def statistics(self):
+        """Get the tabling statistics per predicate.
+
+        :return: dictionary with for each predicate 'functor/arity' a tuple (hits, misses, \
+        number of tabled goals, number of discarded goals)
+        """
+        result = {}
+        for predicate, (hits, misses) in self.__statistics.items():
+            size = 0
+            evictions = 0
+            for tables in (self.__ground, self.__non_ground):
+                table = tables.get(predicate)
+                if table is not None:
+                    size += len(table)
+                    evictions += getattr(table, 'evictions', 0)
+            result['%s/%s' % predicate] = (hits, misses, size, evictions)
+        return result
 
     def __str__(self):  # pragma: no cover
         return '%s\n%s' % (self.__non_ground, self.__ground)
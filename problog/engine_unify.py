@@ -339,6 +339,88 @@ def _unify_call_head_single(source_value, target_value, target_context, source_v
                 raise UnifyError()
 
 
+def compile_head(head_args, fresh=True):
+    """Compile the arguments of a clause head into a matcher function.
+
+    The matcher ``match(call_args, target_context)`` has the same effect on target_context as \
+    ``unify_call_head(call_args, head_args, target_context)``, but the structure of the head \
+    is analysed only once, and the substituted context is not constructed.
+
+    :param head_args: arguments of the head
+    :param fresh: the target context passed to the matcher is initially filled with None \
+    (this allows the first occurrence of each head variable to be a simple assignment)
+    :return: matcher function that raises UnifyError when unification fails
+    """
+    seen = set() if fresh else None
+    assign = []     # (argument position, variable): first occurrences of variables
+    match_args = []     # (argument position, matcher) for the other arguments
+    for i, head_arg in enumerate(head_args):
+        if _is_fresh_variable(head_arg, seen):
+            assign.append((i, head_arg))
+        else:
+            match_args.append((i, _compile_head_arg(head_arg, seen)))
+    assign = tuple(assign)
+    match_args = tuple(match_args)
+
+    if not match_args:
+        def match(call_args, target_context):
+            for i, var in assign:
+                target_context[var] = call_args[i]
+    elif not assign and len(match_args) == 1:
+        i0, match0 = match_args[0]
+
+        def match(call_args, target_context):
+            match0(call_args[i0], target_context, {})
+    else:
+        def match(call_args, target_context):
+            for i, var in assign:
+                target_context[var] = call_args[i]
+            source_values = {}
+            for i, match_arg in match_args:
+                match_arg(call_args[i], target_context, source_values)
+    return match
+
+
+def _is_fresh_variable(head_arg, seen):
+    """Check whether head_arg is the first occurrence of a head variable (and register it)."""
+    if seen is not None and type(head_arg) == int and head_arg not in seen:
+        seen.add(head_arg)
+        return True
+    else:
+        return False
+
+
+def _compile_head_arg(head_arg, seen):
+    """Compile a single head argument into a function ``match(value, target_context, \
+    source_values)`` with the same effect as :func:`_unify_call_head_single`."""
+    if is_variable(head_arg):
+        if _is_fresh_variable(head_arg, seen):
+            def match(value, target_context, source_values):
+                target_context[head_arg] = value
+        else:
+            def match(value, target_context, source_values):
+                target_context[head_arg] = \
+                    unify_value(value, target_context[head_arg], source_values)
+        return match
+
+    signature = head_arg.signature
+    match_args = tuple(_compile_head_arg(arg, seen) for arg in head_arg.args)
+
+    def match(value, target_context, source_values):
+        if value is None:
+            pass
+        elif type(value) == int:
+            source_values[value] = unify_value(source_values.get(value), head_arg, source_values)
+        elif value.is_var():
+            _unify_call_head_single(value, head_arg, target_context, source_values)
+        elif value.signature == signature:
+            for match_arg, arg in zip(match_args, value.args):
+                match_arg(arg, target_context, source_values)
+        else:
+            raise UnifyError()
+    return match
+
+
 class _VarTranslateWrapper(object):
     def __init__(self, var_translate, min_var):
         self.base = var_translate
@@ -23,6 +23,7 @@ Data structures for propositional logic.
 """
 from __future__ import print_function
 
+import copy
 from collections import namedtuple, defaultdict, OrderedDict
 
 from .core import ProbLogObject
@@ -34,6 +35,7 @@ from .logic import Term, Or, Clause, And, is_ground
 from .evaluator import Evaluatable, FormulaEvaluator, FormulaEvaluatorNSP
 
 from .constraint import ConstraintAD
+from .formula_disk import NodeStore, NodeIndex, DEFAULT_CACHE_SIZE
 from .core import transform
 
 
@@ -432,18 +434,28 @@ class LogicFormula(BaseFormula):
     def __init__(self, auto_compact=True, avoid_name_clash=False, keep_order=False,
                  use_string_names=False, keep_all=False, propagate_weights=None,
                  max_arity=0, keep_duplicates=False, keep_builtins=False, hide_builtins=False, database=None,
-                 **kwdargs):
+                 disk_storage=None, disk_cache_size=None, **kwdargs):
         BaseFormula.__init__(self)
 
-        # List of nodes
-        self._nodes = []
-        # Lookup index for 'atom' nodes, key is identifier passed to addAtom()
-        self._index_atom = {}
+        if disk_storage:
+            # Keep the nodes and lookup indices on disk (directory or True for temporary directory)
+            if disk_cache_size is None:
+                disk_cache_size = DEFAULT_CACHE_SIZE
+            directory = None if disk_storage is True else disk_storage
+            self._nodes = NodeStore(directory, disk_cache_size)
+            self._index_atom = NodeIndex(self._nodes, 'identifier')
+            self._index_conj = NodeIndex(self._nodes, 'children')
+            self._index_disj = NodeIndex(self._nodes, 'children')
+        else:
+            # List of nodes
+            self._nodes = []
+            # Lookup index for 'atom' nodes, key is identifier passed to addAtom()
+            self._index_atom = {}
+            # Lookup index for 'and' nodes, key is tuple of sorted children
+            self._index_conj = {}
+            # Lookup index for 'or' nodes, key is tuple of sorted children
+            self._index_disj = {}
         self._index_next = 0
-        # Lookup index for 'and' nodes, key is tuple of sorted children
-        self._index_conj = {}
-        # Lookup index for 'or' nodes, key is tuple of sorted children
-        self._index_disj = {}
 
         self._atomcount = 0
 
@@ -1564,6 +1576,33 @@ label_all=True)
             q += 1
         return s + '}'
 
+    def copy(self):
+        """Copy this formula such that nodes, names and constraints can be added to the copy \
+        without changing the original.
+        The node and name data is shared. The grounding table (if any) is copied as well.
+
+        :return: copy of this formula
+        :rtype: LogicFormula
+        """
+        result = copy.copy(self)
+        if isinstance(self._nodes, NodeStore):
+            result._nodes = self._nodes.copy()
+            result._index_atom = self._index_atom.copy(result._nodes)
+            result._index_conj = self._index_conj.copy(result._nodes)
+            result._index_disj = self._index_disj.copy(result._nodes)
+        else:
+            result._nodes = self._nodes[:]
+            result._index_atom = self._index_atom.copy()
+            result._index_conj = self._index_conj.copy()
+            result._index_disj = self._index_disj.copy()
+        result._weights = self._weights.copy()
+        result._constraints = [c.copy() for c in self._constraints]
+        result._constraints_me = {group: c.copy() for group, c in self._constraints_me.items()}
+        result._names = defaultdict(dict, ((label, names.copy()) for label, names in self._names.items()))
+        if hasattr(self, '_cache'):
+            result._cache = self._cache.copy()
+        return result
+
     def clone(self, destination):
         destination._auto_compact = False
         source = self
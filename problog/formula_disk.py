@@ -0,0 +1,321 @@
+"""
+problog.formula_disk - Disk-backed storage for ground programs
+--------------------------------------------------------------
+
+Storage for the nodes of a :class:`problog.formula.LogicFormula` that keeps them on disk instead \
+of in Python lists and dictionaries.
+It is used when the formula is created with the option ``disk_storage``.
+
+The nodes are pickled into an append-only memory-mapped data file; a second memory-mapped file \
+holds the offset of each node.
+Only a bounded number of recently used nodes is kept in memory.
+The lookup indices used for reusing nodes are hash tables in memory-mapped files that only store \
+the hash of the key; candidates are verified against the stored node.
+
+The files are created in a temporary directory (inside the given directory, if any), which is \
+removed when the formula is garbage collected.
+
+..
+    Part of the ProbLog distribution.
+
+    Copyright 2015 KU Leuven, DTAI Research Group
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+from __future__ import print_function
+
+import os
+import mmap
+import pickle
+import shutil
+import struct
+import tempfile
+import weakref
+
+from collections import OrderedDict
+
+# Default number of nodes kept in memory.
+DEFAULT_CACHE_SIZE = 100000
+
+# Offset table and index slots: two 64-bit integers.
+_SLOT = struct.Struct('<qq')
+
+
+class _MappedFile(object):
+    """Memory-mapped file that grows on demand."""
+
+    def __init__(self, filename, size):
+        self._file = open(filename, 'w+b')
+        self._file.truncate(size)
+        self.mm = mmap.mmap(self._file.fileno(), size)
+
+    def reserve(self, size):
+        """Make sure the file is at least the given size.
+
+        :param size: required size in bytes
+        """
+        if size > len(self.mm):
+            size = max(size, 2 * len(self.mm))
+            self.mm.close()
+            self._file.truncate(size)
+            self.mm = mmap.mmap(self._file.fileno(), size)
+
+    def close(self):
+        self.mm.close()
+        self._file.close()
+
+
+def _remove_files(files, directory):
+    for f in files:
+        f.close()
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+class NodeStore(object):
+    """List of nodes stored in an append-only memory-mapped file.
+
+    Supports the list operations used by :class:`problog.formula.LogicFormula`: ``len``, \
+    ``append``, indexing, item assignment and iteration.
+    Replacing a node appends its new content; the old content stays in the file.
+
+    :param directory: directory in which the (temporary) files are created (default: system \
+    temporary directory)
+    :param cache_size: number of nodes kept in memory
+    """
+
+    def __init__(self, directory=None, cache_size=DEFAULT_CACHE_SIZE):
+        self.directory = tempfile.mkdtemp(prefix='problog-', dir=directory)
+        self.cache_size = cache_size
+        self._data = _MappedFile(os.path.join(self.directory, 'nodes.dat'), 1 << 20)
+        self._offsets = _MappedFile(os.path.join(self.directory, 'nodes.idx'), _SLOT.size << 12)
+        self._files = [self._data, self._offsets]
+        self._size = 0
+        self._end = 0
+        self._cache = OrderedDict()
+        self._finalizer = weakref.finalize(self, _remove_files, self._files, self.directory)
+
+    def _write(self, index, node):
+        data = pickle.dumps(node, pickle.HIGHEST_PROTOCOL)
+        start = self._end
+        self._end += len(data)
+        self._data.reserve(self._end)
+        self._data.mm[start:self._end] = data
+        self._offsets.reserve(_SLOT.size * (index + 1))
+        _SLOT.pack_into(self._offsets.mm, _SLOT.size * index, start, len(data))
+        self._cache_node(index, node)
+
+    def _read(self, index):
+        start, length = _SLOT.unpack_from(self._offsets.mm, _SLOT.size * index)
+        return pickle.loads(self._data.mm[start:start + length])
+
+    def _cache_node(self, index, node):
+        if self.cache_size > 0:
+            self._cache[index] = node
+            self._cache.move_to_end(index)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _check_index(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('node index out of range')
+        return index
+
+    def append(self, node):
+        """Add a node at the end of the list.
+
+        :param node: node to add
+        """
+        self._write(self._size, node)
+        self._size += 1
+
+    def __getitem__(self, index):
+        index = self._check_index(index)
+        node = self._cache.get(index)
+        if node is None:
+            node = self._read(index)
+            self._cache_node(index, node)
+        else:
+            self._cache.move_to_end(index)
+        return node
+
+    def __setitem__(self, index, node):
+        self._write(self._check_index(index), node)
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        # Sequential scans (e.g. exporters) do not replace the cached nodes.
+        for index in range(0, self._size):
+            node = self._cache.get(index)
+            if node is None:
+                node = self._read(index)
+            yield node
+
+    @property
+    def disk_usage(self):
+        """Number of bytes used by the stored nodes."""
+        return self._end + _SLOT.size * self._size
+
+    def copy(self):
+        """Create an independent copy of this store (in a new temporary directory).
+
+        :return: copy of the store
+        :rtype: NodeStore
+        """
+        result = NodeStore(os.path.dirname(self.directory), self.cache_size)
+        result._data.reserve(self._end)
+        result._data.mm[0:self._end] = self._data.mm[0:self._end]
+        result._offsets.reserve(_SLOT.size * self._size)
+        result._offsets.mm[0:_SLOT.size * self._size] = self._offsets.mm[0:_SLOT.size * self._size]
+        result._size = self._size
+        result._end = self._end
+        result._cache = self._cache.copy()
+        return result
+
+    def close(self):
+        """Close and remove the files of this store."""
+        self._cache.clear()
+        self._finalizer()
+
+    def __reduce__(self):
+        # Pickled as the list of nodes, unpickled in a new temporary directory.
+        return _load_store, (self.cache_size, list(self))
+
+
+def _load_store(cache_size, nodes):
+    result = NodeStore(cache_size=cache_size)
+    for node in nodes:
+        result.append(node)
+    return result
+
+
+class NodeIndex(object):
+    """Lookup table from node content to node identifier, stored in a memory-mapped hash table.
+
+    Only the hash of each key is stored: a matching slot is verified by comparing the key with \
+    the given field of the node in the node store.
+    Supports the dictionary operations used by :class:`problog.formula.LogicFormula`.
+
+    :param nodes: store containing the nodes
+    :type nodes: NodeStore
+    :param field: field of the node that is used as key (e.g. ``identifier`` or ``children``)
+    :param capacity: initial number of slots (a power of two)
+    """
+
+    def __init__(self, nodes, field, capacity=1 << 12):
+        self._nodes = nodes
+        self._field = field
+        self._count = 0
+        self._capacity = capacity
+        self._table = self._create_table(capacity)
+        self._last = (None, None, 0)
+
+    def _create_table(self, capacity):
+        fd, filename = tempfile.mkstemp(dir=self._nodes.directory, suffix='.index')
+        os.close(fd)
+        table = _MappedFile(filename, _SLOT.size * capacity)
+        self._nodes._files.append(table)
+        return table
+
+    def _lookup(self, key):
+        """Find the slot of the given key.
+
+        :return: tuple (slot, node identifier) with identifier 0 if the key is not present
+        """
+        last_key, slot, index = self._last
+        if last_key is key:
+            return slot, index
+        h = hash(key)
+        mask = self._capacity - 1
+        slot = h & mask
+        mm = self._table.mm
+        while True:
+            stored_hash, index = _SLOT.unpack_from(mm, _SLOT.size * slot)
+            if index == 0 or \
+                    (stored_hash == h and getattr(self._nodes[index - 1], self._field) == key):
+                self._last = (key, slot, index)
+                return slot, index
+            slot = (slot + 1) & mask
+
+    def _grow(self):
+        old_table, old_capacity = self._table, self._capacity
+        self._capacity *= 2
+        self._table = self._create_table(self._capacity)
+        mask = self._capacity - 1
+        for old_slot in range(0, old_capacity):
+            stored_hash, index = _SLOT.unpack_from(old_table.mm, _SLOT.size * old_slot)
+            if index:
+                slot = stored_hash & mask
+                while _SLOT.unpack_from(self._table.mm, _SLOT.size * slot)[1]:
+                    slot = (slot + 1) & mask
+                _SLOT.pack_into(self._table.mm, _SLOT.size * slot, stored_hash, index)
+        self._nodes._files.remove(old_table)
+        old_table.close()
+
+    def __contains__(self, key):
+        return self._lookup(key)[1] != 0
+
+    def __getitem__(self, key):
+        index = self._lookup(key)[1]
+        if index == 0:
+            raise KeyError(key)
+        return index
+
+    def get(self, key, default=None):
+        return self._lookup(key)[1] or default
+
+    def __setitem__(self, key, index):
+        slot, current = self._lookup(key)
+        _SLOT.pack_into(self._table.mm, _SLOT.size * slot, hash(key), index)
+        self._last = (None, None, 0)
+        if current == 0:
+            self._count += 1
+            if 2 * self._count > self._capacity:
+                self._grow()
+
+    def __len__(self):
+        return self._count
+
+    def copy(self, nodes=None):
+        """Create a copy of this index.
+
+        :param nodes: node store of the copy (default: the same store)
+        :return: copy of the index
+        :rtype: NodeIndex
+        """
+        if nodes is None:
+            nodes = self._nodes
+        result = NodeIndex(nodes, self._field, self._capacity)
+        size = _SLOT.size * self._capacity
+        result._table.mm[0:size] = self._table.mm[0:size]
+        result._count = self._count
+        return result
+
+    def __reduce__(self):
+        # Hashes are not stored, they may differ between processes.
+        indices = []
+        for slot in range(0, self._capacity):
+            index = _SLOT.unpack_from(self._table.mm, _SLOT.size * slot)[1]
+            if index:
+                indices.append(index)
+        return _load_index, (self._nodes, self._field, indices)
+
+
+def _load_index(nodes, field, indices):
+    result = NodeIndex(nodes, field)
+    for index in indices:
+        result[getattr(nodes[index - 1], field)] = index
+    return result
@@ -43,12 +43,17 @@ It uses the following extensions of ProbLog's classes:
 
 from __future__ import print_function
 
+import os
+import re
 import sys
+import mmap
+import pickle
+import time
 import random
 import math
 import logging
 
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 
 from problog.engine import DefaultEngine, ground
 from problog.evaluator import SemiringProbability
@@ -57,11 +62,17 @@ from problog.logic import Term, Constant, Clause, AnnotatedDisjunction, Or, Var,
 from problog.program import PrologString, PrologFile, LogicProgram
 from problog.core import ProbLogError
 from problog.errors import process_error, InconsistentEvidenceError
+from problog.ddnnf_formula import DDNNF
 
 
 from problog import get_evaluatable, get_evaluatables
 import traceback
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 def str2bool(s):
     if str(s) == 'true':
@@ -74,8 +85,14 @@ def str2bool(s):
 
 class LFIProblem(SemiringProbability, LogicProgram):
 
+    # Only learn from the facts in the part of the ground program that is relevant for the evidence.
+    relevant_only = False
+
     def __init__(self, source, examples, max_iter=10000, min_improv=1e-10, verbose=0, knowledge=None,
-                 leakprob=None, propagate_evidence=True, normalize=False, **extra):
+                 leakprob=None, propagate_evidence=True, normalize=False, processes=1, method='em',
+                 learning_rate=0.1, batch_size=None, online=False, step_decay=0.7, cache_size=100,
+                 checkpoint=None, checkpoint_every=10, checkpoint_circuits=False, resume=False,
+                 output_model=None, skip_tolerance=0.0, **extra):
         """
         :param source: filename of file containing input model
         :type source: str
@@ -95,6 +112,37 @@ class LFIProblem(SemiringProbability, LogicProgram):
                          retrieve the constants from the evidence file.
                          (default: None)
         :type leakprob: float or None
+        :param processes: number of worker processes used for compiling and evaluating examples
+        :type processes: int
+        :param method: learning method: 'em' (expectation maximization), 'lbfgs' or 'adam' \
+        (gradient ascent on the log-likelihood)
+        :type method: str
+        :param learning_rate: step size for 'adam'
+        :type learning_rate: float
+        :param batch_size: number of examples per minibatch for 'adam' (default: all examples) \
+        or online EM (default: 100)
+        :type batch_size: int
+        :param online: use stepwise (online) EM over minibatches of a stream of examples
+        :type online: bool
+        :param step_decay: decay :math:`\\alpha` of the online EM step size \
+        :math:`(k+2)^{-\\alpha}` for minibatch :math:`k` (0.5 < alpha <= 1)
+        :type step_decay: float
+        :param cache_size: maximal number of compiled circuits kept in online EM
+        :type cache_size: int
+        :param checkpoint: file to which the state of the learning is written periodically
+        :type checkpoint: str
+        :param checkpoint_every: number of iterations (minibatches for online EM) between checkpoints
+        :type checkpoint_every: int
+        :param checkpoint_circuits: also store the compiled examples in the checkpoint \
+        (not available with multiple processes)
+        :type checkpoint_circuits: bool
+        :param resume: continue from the checkpoint (if it exists)
+        :type resume: bool
+        :param output_model: file to which the learned model is written at every checkpoint
+        :type output_model: str
+        :param skip_tolerance: reuse the previous result of an example if none of the weights in \
+        its circuit moved more than this since it was last evaluated (None: evaluate all examples)
+        :type skip_tolerance: float | None
         :param extra: catch all for additional parameters (not used)
         """
         SemiringProbability.__init__(self)
@@ -109,12 +157,41 @@ class LFIProblem(SemiringProbability, LogicProgram):
         # When necessary they are replaced by a dictionary [t(arg1, arg2, ...) -> float]
         #  for weights of form t(SV, arg1, arg2, ...).
         self._weights = []
+        # Dense numbering of the weight keys that occur in the compiled examples.
+        self.weight_index = WeightIndex()
 
         self.examples = examples
         self.leakprob = leakprob
         self.leakprobatoms = None
         self.propagate_evidence = propagate_evidence
         self._compiled_examples = None
+        self.processes = processes
+        self._pool = None
+        if method not in learners:
+            raise ProbLogError("Unknown learning method '%s'." % method)
+        self.method = method
+        self.learning_rate = learning_rate
+        self.batch_size = batch_size
+        self._learner = None
+        if online and method != 'em':
+            raise ProbLogError("Online learning is only available for method 'em'.")
+        self.online = online
+        self.step_decay = step_decay
+        self.cache_size = cache_size
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_circuits = checkpoint_circuits
+        self.resume = resume
+        self.output_model = output_model
+        self.skip_tolerance = skip_tolerance
+        # Score of the last iteration and its improvement.
+        self._score = -1e10
+        self._delta = 1000
+        # State of online learning.
+        self._online = None
+        # Number of example evaluations and (iteration, evaluations, seconds, score) per iteration.
+        self.evaluations = 0
+        self.trace = []
         
         self.max_iter = max_iter
         self.min_improv = min_improv
@@ -154,7 +231,14 @@ class LFIProblem(SemiringProbability, LogicProgram):
     
     def prepare(self):
         """Prepare for learning."""
-        self._compile_examples()
+        state = self._load_checkpoint()
+        if state is None:
+            self._compile_examples()
+        else:
+            self._compile_examples(state.get('examples'))
+        self._learner = learners[self.method](self)
+        if state is not None:
+            self._restore(state)
 
     def _get_weight(self, index, args, strict=True):
         index = int(index)
@@ -194,8 +278,25 @@ class LFIProblem(SemiringProbability, LogicProgram):
     def _add_weight(self, weight):
         self._weights.append(weight)
 
-    def _process_examples(self):
+    def ground_example(self, baseprogram, atoms, values):
+        """Ground the program for the evidence of an example.
+
+        :param baseprogram: prepared program
+        :param atoms: evidence atoms
+        :param values: evidence values (None for evidence atoms without value)
+        :return: ground program
+        :rtype: LogicFormula
+        """
+        ground_program = None  # Let the grounder decide
+        return ground(baseprogram, ground_program,
+                      evidence=list(zip(atoms, values)),
+                      propagate_evidence=self.propagate_evidence)
+
+    def _process_examples(self, examples=None, start=0):
         """Process examples by grouping together examples with similar structure.
+
+        :param examples: examples to process (default: all examples)
+        :param start: index of the first example
     
         :return: example groups based on evidence atoms
         :rtype: dict of atoms : values for examples
@@ -206,34 +307,48 @@ class LFIProblem(SemiringProbability, LogicProgram):
 
         # Simple implementation: don't add neutral evidence.
 
-        if self.propagate_evidence:
-            result = ExampleSet()
-            for index, example in enumerate(self.examples):
-                atoms, values = zip(*example)
-                result.add(index, atoms, values)
-            return result
-        else:
-            # smarter: compile-once all examples with same atoms
-            result = ExampleSet()
-            for index, example in enumerate(self.examples):
-                atoms, values = zip(*example)
-                result.add(index, atoms, values)
-            return result
+        if examples is None:
+            examples = self.examples
+
+        # If the evidence values are propagated into the ground program, only identical examples
+        #  can share a compiled circuit; otherwise compile once for all examples with same atoms.
+        result = ExampleSet(share_structure=not self.propagate_evidence)
+        for index, example in enumerate(examples, start):
+            atoms, values = zip(*example)
+            result.add(index, atoms, values)
+        return result
     
-    def _compile_examples(self):
+    def _compile_examples(self, examples=None):
         """Compile examples.
     
-        :param examples: Output of ::func::`process_examples`.
+        :param examples: compiled examples restored from a checkpoint (if any)
+        :type examples: ExampleSet
         """
         logger = logging.getLogger('problog_lfi')
 
         baseprogram = DefaultEngine(**self.extra).prepare(self)
-        examples = self._process_examples()
-        result = []
-        for example in examples:
-            example.compile(self, baseprogram)
+        self.weight_index.siblings = {i: idx for p, idx in self._adatoms for i in idx}
+        if examples is not None:
+            units = examples.units()
+            logger.info('Restored %s compiled circuits from checkpoint' % len(units))
+        else:
+            examples = self._process_examples()
+            units = examples.units()
+            logger.info('Compiling %s circuits for %s examples' % (len(units), len(self.examples)))
+        if self.processes > 1:
+            self._pool = ExamplePool(self, baseprogram, units, self.processes)
+        else:
+            for unit in units:
+                if not unit.compiled:
+                    unit.compile(self, baseprogram)
         self._compiled_examples = examples
 
+    def close(self):
+        """Release the worker processes (if any)."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
     def _process_atom(self, atom, body):
         """Returns tuple ( prob_atom, [ additional clauses ] )"""
         if isinstance(atom, Or):
@@ -489,61 +604,106 @@ class LFIProblem(SemiringProbability, LogicProgram):
                     self.leakprobatoms.add(example)
         return self.leakprobatoms
 
-    def _evaluate_examples(self):
-        """Evaluate the model with its current estimates for all examples."""
-        
-        results = []
-        i = 0
-        logging.getLogger('problog_lfi').debug('Evaluating examples ...')
-
-        evaluator = ExampleEvaluator(self._weights)
+    def _evaluate_examples(self, batch=None):
+        """Evaluate the model with its current estimates for all examples.
 
-        return map(evaluator, self._compiled_examples)
-    
-    def _update(self, results):
-        """Update the current estimates based on the latest evaluation results."""
-        
-        fact_marg = defaultdict(float)
-        fact_count = defaultdict(int)
-        score = 0.0
-        for m, pEvidence, result in results:
-            for fact, value in result.items():
-                index = fact.args[0:2]
-                fact_marg[index] += value * m
-                fact_count[index] += m
-            try:
-                score += math.log(pEvidence)
-            except ValueError:
-                raise ProbLogError('Inconsistent evidence.')
+        :param batch: only evaluate the minibatch ``(offset, count)``, \
+        i.e. every count-th example starting at offset
+        :type batch: tuple[int, int] | None
+        :return: expected counts of the facts to learn
+        :rtype: ExpectedCounts
+        """
+        logging.getLogger('problog_lfi').debug('Evaluating examples ...')
 
-        for index in fact_marg:
-            if fact_count[index] > 0:
-                self._set_weight(index[0], index[1], fact_marg[index] / fact_count[index])
+        if self._pool is not None:
+            counts = self._pool.evaluate(self._weights, batch)
+        else:
+            evaluator = ExampleEvaluator(self._weights, weight_index=self.weight_index,
+                                         tolerance=self.skip_tolerance)
+            counts = ExpectedCounts(len(self.weight_index))
+            for result in map(evaluator, select_batch(list(self._compiled_examples), batch)):
+                counts.add(*result)
+            counts.reused = evaluator.reused
+        self.evaluations += counts.examples - counts.reused
+        return counts
+
+    def _update(self, counts, exceeding=False):
+        """Update the current estimates based on the latest evaluation results.
+
+        :param counts: expected counts of the facts to learn
+        :type counts: ExpectedCounts
+        :param exceeding: rescale annotated disjunctions whose weights exceed the available \
+        probability (needed when the counts are mixed from different sources, as in online EM)
+        :return: score of the evaluation
+        """
+        weights = self._dense_weights()
+        update = _nonzero(counts.count)
+        if numpy is not None:
+            weights[update] = counts.marg[update] / counts.count[update]
+        else:
+            for slot in update:
+                weights[slot] = counts.marg[slot] / counts.count[slot]
 
         if self._enable_normalize:
-            self._normalize_weights()
-        return score
+            update = self._normalize_weights(weights, update)
+        elif exceeding and self._adatoms:
+            update = self._normalize_weights(weights, update, exceeding=True)
+        self._set_dense_weights(weights, update)
+        return counts.score
 
-    def _normalize_weights(self):
+    def _dense_weights(self):
+        """Get the current weights in the order of :attr:`weight_index`.
+
+        :return: array of weights
+        """
+        weights = [self._get_weight(key[0], key[1], strict=False) for key in self.weight_index.keys]
+        if numpy is not None:
+            return numpy.array(weights, dtype=float)
+        return weights
+
+    def _set_dense_weights(self, weights, slots):
+        """Set the weights of the given slots of :attr:`weight_index`."""
+        keys = self.weight_index.keys
+        for slot in slots:
+            key = keys[slot]
+            self._set_weight(key[0], key[1], float(weights[slot]))
+
+    def _normalize_weights(self, weights, update=(), exceeding=False):
+        """Normalize the weights of annotated disjunctions to the available probability.
+
+        :param weights: weights in the order of :attr:`weight_index` (updated in place)
+        :param update: slots that are already updated
+        :param exceeding: only normalize annotated disjunctions whose weights exceed the available \
+        probability
+        :return: slots that need to be updated
+        """
+        groups, available = self.weight_index.ad_groups(self._adatoms)
+        if numpy is not None:
+            member = groups >= 0
+            total = numpy.zeros(len(available))
+            numpy.add.at(total, groups[member], weights[member])
+            factor = numpy.divide(available, total, out=numpy.ones_like(total), where=total > 0)
+            if exceeding:
+                factor = numpy.minimum(factor, 1.0)
+            weights[member] *= factor[groups[member]]
+            return numpy.union1d(update, numpy.flatnonzero(member))
+        else:
+            total = [0.0] * len(available)
+            for slot, group in enumerate(groups):
+                if group >= 0:
+                    total[group] += weights[slot]
+            members = set(update)
+            for slot, group in enumerate(groups):
+                if group >= 0 and total[group] > 0:
+                    factor = available[group] / total[group]
+                    weights[slot] *= min(factor, 1.0) if exceeding else factor
+                    members.add(slot)
+            return sorted(members)
 
-        for p, idx in self._adatoms:
-            keys = set()
-            for i in idx:
-                for key, val in self.get_weights(i):
-                    keys.add(key)
-            if len(keys) > 1:
-                try:
-                    keys.remove(Term('t'))
-                except KeyError:
-                    pass
-            for key in keys:
-                w = sum(self._get_weight(i, key, strict=False) for i in idx)
-                n = p / w
-                for i in idx:
-                    self._set_weight(i, key, self._get_weight(i, key, strict=False) * n)
-        
     def step(self):
         self.iteration += 1
+        if self._learner is not None:
+            return self._learner.step()
         results = self._evaluate_examples()
         return self._update(results)
 
@@ -557,37 +717,939 @@ class LFIProblem(SemiringProbability, LogicProgram):
         return '\n'.join(lines)
         
     def run(self):
-        self.prepare()
-        logging.getLogger('problog_lfi').info('Weights to learn: %s' % self.names)
-        logging.getLogger('problog_lfi').info('Initial weights: %s' % self._weights)
-        delta = 1000
-        prev_score = -1e10
-        while self.iteration < self.max_iter and (delta < 0 or delta > self.min_improv):
-            score = self.step()
-            logging.getLogger('problog_lfi').info('Weights after iteration %s: %s' % (self.iteration, self._weights))
-            logging.getLogger('problog_lfi').info('Score after iteration %s: %s' % (self.iteration, score))
-            delta = score - prev_score
-            prev_score = score
-        return prev_score
+        if self.online:
+            return self.run_online()
+        try:
+            self.prepare()
+            logging.getLogger('problog_lfi').info('Weights to learn: %s' % self.names)
+            logging.getLogger('problog_lfi').info('Initial weights: %s' % self._weights)
+            start = time.time() - (self.trace[-1][2] if self.trace else 0.0)
+            while self.iteration < self.max_iter and (self._delta < 0 or self._delta > self.min_improv):
+                score = self.step()
+                elapsed = time.time() - start
+                self.trace.append((self.iteration, self.evaluations, elapsed, score))
+                logging.getLogger('problog_lfi').info('Weights after iteration %s: %s' % (self.iteration, self._weights))
+                logging.getLogger('problog_lfi').info('Score after iteration %s: %s (%s, %.3fs, %s example evaluations)'
+                                                      % (self.iteration, score, self.method, elapsed, self.evaluations))
+                self._delta = score - self._score
+                self._score = score
+                if self.iteration % self.checkpoint_every == 0:
+                    self.save_checkpoint()
+            self.save_checkpoint()
+            return self._score
+        finally:
+            self.close()
+
+    def save_checkpoint(self):
+        """Write the state of the learning to the checkpoint file and the learned model to the \
+        output model file (if they are set)."""
+        if self.output_model:
+            self.write_model(self.output_model)
+        if not self.checkpoint:
+            return
+        state = {'names': [str(n) for n in self.names],
+                 'method': self.method,
+                 'weights': self._weights,
+                 'weight_index': self.weight_index,
+                 'iteration': self.iteration,
+                 'evaluations': self.evaluations,
+                 'trace': self.trace,
+                 'score': (self._score, self._delta),
+                 'online': self._online}
+        if self._learner is not None:
+            state['learner'] = {k: v for k, v in vars(self._learner).items() if k not in ('lfi', '_ad')}
+        if self.checkpoint_circuits and self._pool is None and not self.online:
+            state['examples'] = self._compiled_examples
+        tmpfile = self.checkpoint + '.tmp'
+        with open(tmpfile, 'wb') as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmpfile, self.checkpoint)
+
+    def _load_checkpoint(self):
+        """Read the checkpoint file if learning should be resumed.
+
+        :return: state of the learning or None
+        :rtype: dict | None
+        """
+        if not self.resume or not self.checkpoint:
+            return None
+        if not os.path.exists(self.checkpoint):
+            logging.getLogger('problog_lfi').info('No checkpoint found, starting from scratch.')
+            return None
+        with open(self.checkpoint, 'rb') as f:
+            state = pickle.load(f)
+        if state.get('method') != self.method:
+            raise ProbLogError("Checkpoint '%s' was created with method '%s'."
+                               % (self.checkpoint, state.get('method')))
+        return state
+
+    def _restore(self, state):
+        """Restore the state of the learning from a checkpoint (see :func:`save_checkpoint`)."""
+        if state['names'] != [str(n) for n in self.names]:
+            raise ProbLogError("Checkpoint '%s' does not match the model." % self.checkpoint)
+        self._weights = state['weights']
+        self.weight_index = state['weight_index']
+        self.iteration = state['iteration']
+        self.evaluations = state['evaluations']
+        self.trace = state['trace']
+        self._score, self._delta = state['score']
+        self._online = state['online']
+        if self._learner is not None and 'learner' in state:
+            vars(self._learner).update(state['learner'])
+        logging.getLogger('problog_lfi').info('Resuming from iteration %s' % self.iteration)
+
+
+    def run_online(self):
+        """Learn the weights with stepwise EM over minibatches of examples.
+
+        The examples are read lazily, one minibatch at a time.
+        The expected counts of each minibatch are interpolated with the running counts using the \
+        step size :math:`(k+2)^{-\\alpha}`, after which the weights are updated.
+        Compiled circuits are kept in a bounded cache (least recently used first out).
+        If the examples can be iterated more than once, passes are repeated until the score of \
+        a pass no longer improves (or the maximal number of minibatches is reached).
+
+        :return: score of the last pass
+        :rtype: float
+        """
+        logger = logging.getLogger('problog_lfi')
+        state = self._load_checkpoint()
+        baseprogram = DefaultEngine(**self.extra).prepare(self)
+        self.weight_index.siblings = {i: idx for p, idx in self._adatoms for i in idx}
+        if state is None:
+            self._online = {'defaults': list(self._weights),
+                            'running': ExpectedCounts(0),
+                            'cache': CircuitCache(self.cache_size),
+                            'position': 0,         # minibatches done in the current pass
+                            'score': 0.0}          # score of the current pass
+        else:
+            self._restore(state)
+            if self._online.get('cache') is None:
+                self._online['cache'] = CircuitCache(self.cache_size)
+        logger.info('Weights to learn: %s' % self.names)
+        logger.info('Initial weights: %s' % self._weights)
+        online = self._online
+        cache = online['cache']
+        running = online['running']
+        batch_size = self.batch_size or 100
+        start = time.time() - (self.trace[-1][2] if self.trace else 0.0)
+        while self.iteration < self.max_iter:
+            first = True
+            for position, index, batch in _minibatches(self.examples, batch_size, online['position']):
+                first = False
+                if batch is None:
+                    continue    # already processed before the checkpoint
+                examples = self._process_examples(batch, index)
+                for unit in examples.units():
+                    compiled = cache.get(unit.key)
+                    if compiled is None:
+                        unit.compile(self, baseprogram)
+                        cache.put(unit.key, unit.compiled)
+                    else:
+                        unit.set_compiled(compiled, self.weight_index)
+                evaluator = ExampleEvaluator(self._weights, online['defaults'], self.weight_index)
+                counts = ExpectedCounts(len(self.weight_index))
+                for result in map(evaluator, examples):
+                    counts.add(*result)
+                self.evaluations += counts.examples
+                online['score'] += counts.score
+                online['position'] = position + 1
+
+                running.resize(len(self.weight_index))
+                for slot in _nonzero(counts.count):
+                    if not running.count[slot]:
+                        # Start from the current weight, as if observed in one example.
+                        running.marg[slot] = evaluator._get_weight(*self.weight_index.keys[slot])
+                        running.count[slot] = 1.0
+                step = (self.iteration + 2) ** -self.step_decay
+                running.interpolate(counts, step)
+                self._update(running, exceeding=True)
+                self.iteration += 1
+                elapsed = time.time() - start
+                self.trace.append((self.iteration, self.evaluations, elapsed, counts.score))
+                logger.info('Weights after minibatch %s: %s' % (self.iteration, self._weights))
+                logger.info('Score of minibatch %s: %s (%.3fs, %s circuits cached)'
+                            % (self.iteration, counts.score, elapsed, len(cache)))
+                if self.iteration % self.checkpoint_every == 0:
+                    self._save_online_checkpoint()
+                if self.iteration >= self.max_iter:
+                    break
+            else:
+                # Only complete passes are compared.
+                score = online['score']
+                online['position'] = 0
+                online['score'] = 0.0
+                self._delta = score - self._score
+                self._score = score
+                if first or iter(self.examples) is self.examples or self._delta <= self.min_improv:
+                    break
+        self._save_online_checkpoint()
+        return self._score
+
+    def _save_online_checkpoint(self):
+        # The cache of compiled circuits is only stored on request.
+        cache = self._online['cache']
+        if not self.checkpoint_circuits:
+            self._online['cache'] = None
+        try:
+            self.save_checkpoint()
+        finally:
+            self._online['cache'] = cache
+
+    def write_model(self, filename):
+        """Write the current model to a file (atomically replacing an existing file)."""
+        tmpfile = filename + '.tmp'
+        with open(tmpfile, 'w') as f:
+            f.write(self.get_model())
+        os.rename(tmpfile, filename)
+
+
+def _minibatches(examples, size, skip=0):
+    """Split a stream of examples in minibatches.
+
+    The examples of an :class:`ExampleReader` are read per minibatch from its index.
+
+    :param skip: number of minibatches to skip (these are not read from an :class:`ExampleReader`)
+    :return: tuples of position of the minibatch, index of its first example and list of \
+    examples (None for skipped minibatches)
+    """
+    if isinstance(examples, ExampleReader):
+        for position, index in enumerate(range(0, len(examples), size)):
+            if position < skip:
+                yield position, index, None
+            else:
+                yield position, index, examples.read(index, index + size)
+        return
+    batch = []
+    index = 0
+    position = 0
+    for example in examples:
+        batch.append(example)
+        if len(batch) == size:
+            yield position, index, batch if position >= skip else None
+            index += len(batch)
+            position += 1
+            batch = []
+    if batch:
+        yield position, index, batch if position >= skip else None
+
+
+class CircuitCache(object):
+    """Cache of compiled circuits with least-recently-used eviction.
+
+    :param size: maximal number of circuits
+    :type size: int
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._circuits = OrderedDict()
+
+    def get(self, key):
+        compiled = self._circuits.pop(key, None)
+        if compiled is not None:
+            self._circuits[key] = compiled
+        return compiled
+
+    def put(self, key, compiled):
+        self._circuits.pop(key, None)
+        self._circuits[key] = compiled
+        while len(self._circuits) > self.size:
+            self._circuits.popitem(last=False)
+
+    def __len__(self):
+        return len(self._circuits)
+
+
+class WeightIndex(object):
+    """Dense numbering of the weights to learn.
+
+    Each weight key ``(index, args)`` of a weight ``lfi(index, args)`` gets a slot, in order of \
+    first occurrence.
+    The other heads of an annotated disjunction get a slot at the same time, so that the \
+    disjunction can be normalized.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self._slots = {}
+        self._ad_groups = None
+        # Weight indices of the other heads of each annotated disjunction.
+        self.siblings = {}
+
+    def slot(self, key):
+        """Get the slot of the given weight key (a new slot is added if necessary).
+
+        :param key: weight key
+        :type key: tuple[Constant, Term]
+        :rtype: int
+        """
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = len(self.keys)
+            self._slots[key] = slot
+            self.keys.append(key)
+            for i in self.siblings.get(int(key[0]), ()):
+                self.slot((Constant(i), key[1]))
+        return slot
+
+    def ad_groups(self, adatoms):
+        """Group the slots of annotated disjunctions by disjunction and weight arguments.
+
+        :param adatoms: available probability and weight indices of each annotated disjunction
+        :return: group of each slot (-1 if not in an annotated disjunction), \
+        available probability of each group
+        """
+        if self._ad_groups is None or len(self._ad_groups[0]) != len(self.keys):
+            disjunction = {}
+            for d, (p, idx) in enumerate(adatoms):
+                for i in idx:
+                    disjunction[i] = d
+            numbers = {}
+            groups = []
+            available = []
+            for index, args in self.keys:
+                d = disjunction.get(int(index))
+                if d is None:
+                    groups.append(-1)
+                else:
+                    group = numbers.get((d, args))
+                    if group is None:
+                        group = len(available)
+                        numbers[(d, args)] = group
+                        available.append(adatoms[d][0])
+                    groups.append(group)
+            if numpy is not None:
+                groups = numpy.array(groups, dtype=int)
+                available = numpy.array(available, dtype=float)
+            self._ad_groups = groups, available
+        return self._ad_groups
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def _zeros(size):
+    if numpy is not None:
+        return numpy.zeros(size)
+    return [0.0] * size
+
+
+def _nonzero(values):
+    """Indices of the non-zero values."""
+    if numpy is not None:
+        return numpy.flatnonzero(values)
+    return [i for i, v in enumerate(values) if v]
+
+
+class ExpectedCounts(object):
+    """Expected counts of the facts to learn, accumulated over examples.
+
+    Counts are stored in arrays in the order of the slots of the weight keys \
+    (see :class:`WeightIndex`).
+
+    :param size: number of slots
+    :type size: int
+    """
+
+    def __init__(self, size):
+        self.marg = _zeros(size)
+        self.count = _zeros(size)
+        self.score = 0.0
+        self.examples = 0
+        # Number of examples for which a previous result was reused.
+        self.reused = 0
+
+    def resize(self, size):
+        """Extend the arrays to the given number of slots."""
+        extra = size - len(self.marg)
+        if extra > 0:
+            if numpy is not None:
+                self.marg = numpy.concatenate((self.marg, numpy.zeros(extra)))
+                self.count = numpy.concatenate((self.count, numpy.zeros(extra)))
+            else:
+                self.marg += [0.0] * extra
+                self.count += [0.0] * extra
+
+    def add(self, m, p_evidence, slots, values):
+        """Add the result of evaluating an example.
+
+        :param m: number of times the example occurs
+        :param p_evidence: probability of the evidence in the example
+        :param slots: slots of the facts to learn
+        :param values: probability of each fact to learn given the evidence
+        """
+        if numpy is not None:
+            numpy.add.at(self.marg, slots, values * m)
+            numpy.add.at(self.count, slots, m)
+        else:
+            for slot, value in zip(slots, values):
+                self.marg[slot] += value * m
+                self.count[slot] += m
+        self.examples += m
+        try:
+            self.score += m * math.log(p_evidence)
+        except ValueError:
+            raise ProbLogError('Inconsistent evidence.')
+
+    def interpolate(self, other, step):
+        """Move these counts towards the counts of another minibatch (stepwise EM).
+
+        The counts of the minibatch are normalized by its number of examples.
+
+        :param other: counts of a minibatch
+        :type other: ExpectedCounts
+        :param step: step size in (0, 1]
+        """
+        if not other.examples:
+            return self
+        scale = step / other.examples
+        self.resize(len(other.marg))
+        if numpy is not None:
+            self.marg = (1.0 - step) * self.marg + scale * other.marg
+            self.count = (1.0 - step) * self.count + scale * other.count
+        else:
+            for slot in range(0, len(other.marg)):
+                self.marg[slot] = (1.0 - step) * self.marg[slot] + scale * other.marg[slot]
+                self.count[slot] = (1.0 - step) * self.count[slot] + scale * other.count[slot]
+        self.score = other.score
+        return self
+
+    def merge(self, other):
+        """Add the counts of another ExpectedCounts object (with the same slots)."""
+        if numpy is not None:
+            self.marg += other.marg
+            self.count += other.count
+        else:
+            for slot in range(0, len(other.marg)):
+                self.marg[slot] += other.marg[slot]
+                self.count[slot] += other.count[slot]
+        self.score += other.score
+        self.examples += other.examples
+        self.reused += other.reused
+        return self
+
+
+def _example_worker(lfi, baseprogram, units, connection):
+    """Worker process of :class:`ExamplePool`.
+
+    Compiles its share of the examples once and then evaluates them for every set of weights
+    it receives.
+    """
+    try:
+        examples = []
+        for unit in units:
+            if not unit.compiled:
+                unit.compile(lfi, baseprogram)
+            examples += unit.instances()
+        connection.send(('ready', lfi.weight_index.keys))
+    except Exception as err:
+        connection.send(('error', _transferable_error(err)))
+        return
+
+    while True:
+        try:
+            message, data = connection.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message == 'stop':
+            break
+        elif message == 'index':
+            # Switch to the slots of the parent process (no reply).
+            lfi.weight_index = data
+            for unit in units:
+                unit.index_queries(data)
+            continue
+        try:
+            weights, batch = data
+            evaluator = ExampleEvaluator(weights, weight_index=lfi.weight_index,
+                                         tolerance=lfi.skip_tolerance)
+            counts = ExpectedCounts(len(lfi.weight_index))
+            for example in select_batch(examples, batch):
+                counts.add(*evaluator(example))
+            counts.reused = evaluator.reused
+            connection.send(('counts', counts))
+        except Exception as err:
+            connection.send(('error', _transferable_error(err)))
+
+
+def _transferable_error(err):
+    """Make sure an exception raised in a worker can be sent to the parent process."""
+    import pickle
+    try:
+        pickle.loads(pickle.dumps(err))
+        return err
+    except Exception:
+        return ProbLogError(str(err))
+
+
+class ExamplePool(object):
+    """Long-lived worker processes that hold compiled examples.
+
+    Each worker compiles a share of the examples when the pool is created.
+    Afterwards, only the current weights are sent to the workers and only the expected counts are
+    sent back.
+
+    :param lfi: learning problem
+    :type lfi: LFIProblem
+    :param baseprogram: prepared program
+    :param examples: examples to distribute over the workers (units of compilation)
+    :type examples: list[Example | ExampleGroup]
+    :param processes: number of worker processes
+    """
+
+    def __init__(self, lfi, baseprogram, examples, processes):
+        import multiprocessing
+        self._index = lfi.weight_index
+        try:
+            context = multiprocessing.get_context('fork')
+        except ValueError:
+            context = multiprocessing.get_context()
+
+        processes = max(1, min(processes, len(examples)))
+        self._workers = []
+        self._connections = []
+        for i in range(0, processes):
+            parent_conn, child_conn = context.Pipe()
+            worker = context.Process(target=_example_worker,
+                                     args=(lfi, baseprogram, examples[i::processes], child_conn))
+            worker.daemon = True
+            worker.start()
+            child_conn.close()
+            self._workers.append(worker)
+            self._connections.append(parent_conn)
+        try:
+            # Number the weights found by all workers.
+            for keys in self._receive():
+                for key in keys:
+                    self._index.slot(key)
+            for connection in self._connections:
+                connection.send(('index', self._index))
+        except Exception:
+            self.close()
+            raise
+
+    def _receive(self):
+        results = []
+        error = None
+        for connection in self._connections:
+            message, data = connection.recv()
+            if message == 'error':
+                error = data
+            else:
+                results.append(data)
+        if error is not None:
+            raise error
+        return results
+
+    def evaluate(self, weights, batch=None):
+        """Evaluate all examples with the given weights.
+
+        :param batch: only evaluate the given minibatch of each worker (see :func:`select_batch`)
+        :return: expected counts over all examples
+        :rtype: ExpectedCounts
+        """
+        for connection in self._connections:
+            connection.send(('evaluate', (weights, batch)))
+        counts = ExpectedCounts(len(self._index))
+        for partial in self._receive():
+            counts.merge(partial)
+        return counts
+
+    def close(self):
+        """Stop the worker processes."""
+        for connection in self._connections:
+            try:
+                connection.send(('stop', None))
+            except (IOError, OSError):
+                pass
+        for worker in self._workers:
+            worker.join(5)
+            if worker.is_alive():
+                worker.terminate()
+        self._workers = []
+        self._connections = []
+
+
+def select_batch(examples, batch):
+    """Select the minibatch ``(offset, count)`` from a list of examples.
+
+    :param examples: list of examples
+    :param batch: every count-th example starting at offset (None selects all examples)
+    :type batch: tuple[int, int] | None
+    :return: list of examples
+    """
+    if batch is None:
+        return examples
+    offset, count = batch
+    return examples[offset::count]
+
+
+class GradientLearner(object):
+    """Base class for gradient-based parameter learning.
+
+    The weights are optimized in logit space: :math:`p = 1/(1+e^{-\\theta})` for independent facts \
+    and a softmax over the heads (and the remaining probability) for annotated disjunctions.
+    The gradient of the log-likelihood with respect to the logit of a weight is the difference \
+    between its expected count given the evidence and its expected count under the model, \
+    i.e. ``marg - p * count`` (see :class:`ExpectedCounts`).
+    These marginals are obtained from one backward pass over each compiled example.
+    For annotated disjunctions, this gradient is exact only when all heads are grounded in \
+    each example.
+
+    :param lfi: learning problem
+    :type lfi: LFIProblem
+    """
+
+    # Logits are clipped to keep the weights strictly between 0 and 1.
+    max_logit = 30.0
+
+    def __init__(self, lfi):
+        self.lfi = lfi
+        # Annotated disjunction of each weight index: (available probability, indices).
+        self._ad = {}
+        for group in lfi._adatoms:
+            for i in group[1]:
+                self._ad[i] = group
+
+    def logits(self, keys):
+        """Get the logits of the current weights.
+
+        :param keys: weight keys (see :class:`ExpectedCounts`)
+        :return: logit for each key
+        :rtype: dict[tuple[Constant, Term], float]
+        """
+        lfi = self.lfi
+        result = {}
+        for key in keys:
+            index, args = int(key[0]), key[1]
+            p = max(lfi._get_weight(index, args, strict=False), 1e-12)
+            group = self._ad.get(index)
+            if group is None:
+                p = min(p, 1.0 - 1e-12)
+                result[key] = math.log(p / (1.0 - p))
+            elif lfi._enable_normalize:
+                result[key] = math.log(p)
+            else:
+                rest = group[0] - sum(lfi._get_weight(i, args, strict=False) for i in group[1])
+                result[key] = math.log(p / max(rest, 1e-12))
+        return result
+
+    def set_logits(self, logits):
+        """Set the weights from their logits.
+
+        :param logits: logit for each weight key
+        :type logits: dict[tuple[Constant, Term], float]
+        """
+        lfi = self.lfi
+        groups = defaultdict(dict)
+        for key, theta in logits.items():
+            index, args = int(key[0]), key[1]
+            theta = min(max(theta, -self.max_logit), self.max_logit)
+            group = self._ad.get(index)
+            if group is None:
+                lfi._set_weight(index, args, 1.0 / (1.0 + math.exp(-theta)))
+            else:
+                groups[(id(group), args)][index] = theta
+        for (group, args), thetas in groups.items():
+            available, indices = self._ad[next(iter(thetas))]
+            missing = [(Constant(i), args) for i in indices if i not in thetas]
+            for key, theta in self.logits(missing).items():
+                thetas[int(key[0])] = theta
+            # Softmax over the heads (and the remaining probability, with logit 0).
+            top = max(thetas.values())
+            if lfi._enable_normalize:
+                z = 0.0
+            else:
+                top = max(top, 0.0)
+                z = math.exp(-top)
+            z += sum(math.exp(t - top) for t in thetas.values())
+            for i, theta in thetas.items():
+                lfi._set_weight(i, args, available * math.exp(theta - top) / z)
+
+    def gradient(self, counts):
+        """Gradient of the log-likelihood with respect to the logits of the weights.
+
+        :param counts: expected counts obtained with the current weights
+        :type counts: ExpectedCounts
+        :return: gradient for each weight key
+        :rtype: dict[tuple[Constant, Term], float]
+        """
+        keys = self.lfi.weight_index.keys
+        weights = self.lfi._dense_weights()
+        result = {}
+        for slot in _nonzero(counts.count):
+            result[keys[slot]] = counts.marg[slot] - weights[slot] * counts.count[slot]
+        return result
+
+    def step(self):
+        """Perform one iteration.
+
+        :return: log-likelihood of the examples
+        :rtype: float
+        """
+        raise NotImplementedError('abstract method')
+
+
+class EMLearner(object):
+    """Expectation maximization (see :func:`LFIProblem._update`)."""
+
+    def __init__(self, lfi):
+        self.lfi = lfi
+
+    def step(self):
+        return self.lfi._update(self.lfi._evaluate_examples())
+
+
+class LBFGSLearner(GradientLearner):
+    """Full-batch L-BFGS with a backtracking line search.
+
+    :param lfi: learning problem
+    :type lfi: LFIProblem
+    :param memory: number of correction pairs to keep
+    :type memory: int
+    """
+
+    def __init__(self, lfi, memory=10):
+        GradientLearner.__init__(self, lfi)
+        self.memory = memory
+        self._history = []
+        self._keys = None
+        self._theta = None
+        self._score = None
+        self._grad = None
+
+    def _evaluate(self):
+        counts = self.lfi._evaluate_examples()
+        grad = self.gradient(counts)
+        return counts.score, [grad.get(key, 0.0) for key in self._keys]
+
+    def _set(self, theta):
+        theta = [min(max(t, -self.max_logit), self.max_logit) for t in theta]
+        self.set_logits(dict(zip(self._keys, theta)))
+        return theta
+
+    def _direction(self, grad):
+        # Two-loop recursion for the ascent direction.
+        q = list(grad)
+        alphas = []
+        for s, y, rho in reversed(self._history):
+            a = rho * _dot(s, q)
+            q = [qi - a * yi for qi, yi in zip(q, y)]
+            alphas.append(a)
+        if self._history:
+            s, y, rho = self._history[-1]
+            gamma = _dot(s, y) / _dot(y, y)
+            q = [gamma * qi for qi in q]
+        for (s, y, rho), a in zip(self._history, reversed(alphas)):
+            b = rho * _dot(y, q)
+            q = [qi + (a - b) * si for qi, si in zip(q, s)]
+        return q
+
+    def step(self):
+        if self._keys is None:
+            counts = self.lfi._evaluate_examples()
+            self._keys = [self.lfi.weight_index.keys[slot] for slot in _nonzero(counts.count)]
+            logits = self.logits(self._keys)
+            self._theta = self._set([logits[key] for key in self._keys])
+            self._score, self._grad = self._evaluate()
+        theta, score, grad = self._theta, self._score, self._grad
+
+        # The history stores pairs for minimizing the negative log-likelihood.
+        direction = self._direction([-g for g in grad])
+        direction = [-d for d in direction]
+        slope = _dot(grad, direction)
+        if slope <= 0:
+            direction = list(grad)
+            slope = _dot(grad, grad)
+            self._history = []
+        if slope <= 0:
+            return score
+        step = 1.0
+        if not self._history:
+            step = min(1.0, 1.0 / math.sqrt(slope))
+        for _ in range(0, 30):
+            new_theta = self._set([t + step * d for t, d in zip(theta, direction)])
+            new_score, new_grad = self._evaluate()
+            if new_score >= score + 1e-4 * step * slope:
+                break
+            step *= 0.5
+        else:
+            self._set(theta)
+            return score
+
+        s = [a - b for a, b in zip(new_theta, theta)]
+        y = [b - a for a, b in zip(new_grad, grad)]
+        sy = _dot(s, y)
+        if sy > 1e-12:
+            self._history.append((s, y, 1.0 / sy))
+            if len(self._history) > self.memory:
+                self._history.pop(0)
+        self._theta, self._score, self._grad = new_theta, new_score, new_grad
+        return new_score
+
+
+class AdamLearner(GradientLearner):
+    """Adam over minibatches of examples.
+
+    Each iteration is one pass (epoch) over all examples.
+    The score of an iteration is the sum of the scores of its minibatches.
+
+    :param lfi: learning problem
+    :type lfi: LFIProblem
+    """
+
+    def __init__(self, lfi, beta1=0.9, beta2=0.999, epsilon=1e-8):
+        GradientLearner.__init__(self, lfi)
+        self.learning_rate = lfi.learning_rate
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.epsilon = epsilon
+        self._m = defaultdict(float)
+        self._v = defaultdict(float)
+        self._t = 0
+        self.examples = sum(len(ex.n) for ex in lfi._compiled_examples)
+        if lfi.batch_size:
+            self.batches = max(1, int(math.ceil(float(self.examples) / lfi.batch_size)))
+        else:
+            self.batches = 1
+
+    def step(self):
+        if self._t == 0 and self.batches > 1:
+            # Fix the initial value of every weight key before the first minibatch changes some of them.
+            counts = self.lfi._evaluate_examples()
+            for slot in _nonzero(counts.count):
+                key = self.lfi.weight_index.keys[slot]
+                self.lfi._set_weight(key[0], key[1], self.lfi._get_weight(key[0], key[1]))
+        order = list(range(0, self.batches))
+        random.shuffle(order)
+        score = 0.0
+        for offset in order:
+            counts = self.lfi._evaluate_examples((offset, self.batches))
+            score += counts.score
+            if not counts.examples:
+                continue
+            self._t += 1
+            b1, b2 = self.beta1, self.beta2
+            gradient = self.gradient(counts)
+            logits = self.logits(gradient)
+            for key, g in gradient.items():
+                # Estimate of the gradient of the mean log-likelihood over all examples.
+                g *= float(self.batches) / self.examples
+                self._m[key] = b1 * self._m[key] + (1 - b1) * g
+                self._v[key] = b2 * self._v[key] + (1 - b2) * g * g
+                m = self._m[key] / (1 - b1 ** self._t)
+                v = self._v[key] / (1 - b2 ** self._t)
+                logits[key] += self.learning_rate * m / (math.sqrt(v) + self.epsilon)
+            self.set_logits(logits)
+        return score
+
+
+def _dot(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+learners = {'em': EMLearner, 'lbfgs': LBFGSLearner, 'adam': AdamLearner}
 
 
 class ExampleSet(object):
+    """Set of examples in which identical examples are merged.
 
-    def __init__(self):
+    :param share_structure: compile a single circuit for all examples with the same evidence atoms \
+    (requires that evidence values are not propagated into the ground program)
+    """
+
+    def __init__(self, share_structure=False):
         self._examples = {}
+        self._share_structure = share_structure
 
     def add(self, index, atoms, values):
-        ex = self._examples.get((atoms, values))
-        if ex is None:
-            self._examples[(atoms,values)] = Example(index, atoms, values)
+        if self._share_structure:
+            evidence = {}
+            for a, v in zip(atoms, values):
+                if a in evidence and evidence[a] != v:
+                    context = ' (found evidence({},{}) and evidence({},{}) in example {})'.format(
+                        a, evidence[a], a, v, index + 1)
+                    raise InconsistentEvidenceError(source=a, context=context)
+                evidence[a] = v
+            key = frozenset(evidence)
+            group = self._examples.get(key)
+            if group is None:
+                group = ExampleGroup(evidence.keys())
+                self._examples[key] = group
+            group.add(index, evidence)
         else:
-            ex.add_index(index)
+            ex = self._examples.get((atoms, values))
+            if ex is None:
+                self._examples[(atoms,values)] = Example(index, atoms, values)
+            else:
+                ex.add_index(index)
+
+    def units(self):
+        """Get the units of compilation (examples or groups of examples sharing a circuit).
+
+        :rtype: list[Example | ExampleGroup]
+        """
+        return list(self._examples.values())
 
     def __iter__(self):
-        return iter(self._examples.values())
+        for unit in self._examples.values():
+            for example in unit.instances():
+                yield example
+
+
+class CompilationUnit(object):
+    """Examples that are evaluated on the same compiled circuit.
+
+    Subclasses set the evidence ``atoms`` and the ``ground_values`` with which the circuit is \
+    grounded, and implement :func:`instances`.
+    """
+
+    compiled = None
+
+    def compile(self, lfi, baseprogram):
+        compiled = compile_example(lfi, baseprogram, self.atoms, self.ground_values)
+        self.set_compiled(compiled, lfi.weight_index)
+
+    def set_compiled(self, compiled, weight_index):
+        self.compiled = compiled
+        deterministic = self.deterministic_atoms()
+        for ex in self.instances():
+            ex.compiled = compiled
+            ex.deterministic = deterministic
+        self.index_queries(weight_index)
+
+    def deterministic_atoms(self):
+        """Evidence atoms that are deterministic in the compiled circuit and have to be checked \
+        for each example.
+
+        :rtype: dict[Term, int | None]
+        """
+        return {}
+
+    def index_queries(self, weight_index):
+        """Look up the weight slots of the facts to learn in the compiled circuit.
+
+        :param weight_index: numbering of the weights
+        :type weight_index: WeightIndex
+        """
+        nodes, slots, circuit_weights, dependencies = _index_queries(self.compiled, weight_index)
+        for ex in self.instances():
+            ex.nodes = nodes
+            ex.slots = slots
+            ex.circuit_weights = circuit_weights
+            ex.dependencies = dependencies
+            ex.last_result = None
+
+    def instances(self):
+        """Examples evaluated on the compiled circuit.
+
+        :rtype: list[Example]
+        """
+        raise NotImplementedError('abstract method')
 
 
-class Example(object):
+class Example(CompilationUnit):
 
     def __init__(self, index, atoms, values):
         """An example consists of a list of atoms and their corresponding values (True/False)."""
@@ -595,6 +1657,17 @@ class Example(object):
         self.values = tuple(values)
         self.compiled = []
         self.n = [index]
+        # Evidence atoms that are deterministic in the compiled circuit (atom -> node).
+        self.deterministic = {}
+        # Nodes of the facts to learn in the compiled circuit and their weight slots.
+        self.nodes = []
+        self.slots = []
+        # Weights of the compiled circuit (None if they have to be extracted by the evaluator).
+        self.circuit_weights = None
+        # Slots of all weights to learn in the compiled circuit.
+        self.dependencies = []
+        # Weights of the dependencies and result of the last evaluation (see ExampleEvaluator).
+        self.last_result = None
 
     def __hash__(self):
         return hash((self.atoms, self.values))
@@ -604,35 +1677,207 @@ class Example(object):
             return False
         return self.atoms == other.atoms and self.values == other.values
 
-    def compile(self, lfi, baseprogram):
-        ground_program = None  # Let the grounder decide
-        ground_program = ground(baseprogram, ground_program,
-                                evidence=list(zip(self.atoms, self.values)),
-                                propagate_evidence=lfi.propagate_evidence)
-        for i, node, t in ground_program:
-            if t == 'atom' and isinstance(node.probability, Term) and node.probability.functor == 'lfi':
-                factargs = ()
-                if type(node.identifier) == tuple:
-                    factargs = node.identifier[1]
-                fact = Term('lfi_fact', node.probability.args[0], node.probability.args[1], *factargs)
-                ground_program.add_query(fact, i)
-        self.compiled = lfi.knowledge.create_from(ground_program)
+    @property
+    def key(self):
+        """Key of the compiled circuit of this example."""
+        return self.atoms, self.values
+
+    @property
+    def ground_values(self):
+        return self.values
 
     def add_index(self, index):
         self.n.append(index)
 
+    def instances(self):
+        """Examples evaluated on the compiled circuit of this example."""
+        return [self]
+
+
+class ExampleGroup(CompilationUnit):
+
+    def __init__(self, atoms):
+        """A group of examples with the same evidence atoms.
+
+        The group is compiled once without evidence values.
+        The values of each example are applied when it is evaluated.
+        """
+        self.atoms = tuple(atoms)
+        self.ground_values = (None,) * len(self.atoms)
+        self.compiled = None
+        self._examples = {}
+
+    def add(self, index, evidence):
+        """Add an example to the group.
+
+        :param index: index of the example
+        :param evidence: evidence values of the example
+        :type evidence: dict[Term, bool]
+        """
+        values = tuple(evidence[a] for a in self.atoms)
+        ex = self._examples.get(values)
+        if ex is None:
+            self._examples[values] = Example(index, self.atoms, values)
+        else:
+            ex.add_index(index)
+
+    @property
+    def key(self):
+        """Key of the compiled circuit of this group."""
+        return frozenset(self.atoms)
+
+    def deterministic_atoms(self):
+        deterministic = {}
+        for name, node, value in self.compiled.evidence_all():
+            if node == 0 or node is None:
+                deterministic[name] = node
+        return deterministic
+
+    def instances(self):
+        """Examples evaluated on the compiled circuit of this group."""
+        return list(self._examples.values())
+
+
+def _index_queries(compiled, weight_index):
+    """Get the nodes of the facts to learn in a compiled circuit and their weight slots.
+
+    :return: list of nodes, array of slots, weights of the circuit (None if not supported), \
+    sorted slots of all weights to learn that occur in the circuit
+    """
+    nodes = []
+    slots = []
+    for name, node, label in compiled.labeled():
+        nodes.append(node)
+        slots.append(weight_index.slot(name.args[0:2]))
+    dependencies = set(slots)
+    for weight in compiled.get_weights().values():
+        if isinstance(weight, Term) and weight.functor == 'lfi':
+            dependencies.add(weight_index.slot(tuple(weight.args)))
+    dependencies = sorted(dependencies)
+    if numpy is not None:
+        slots = numpy.array(slots, dtype=int)
+        dependencies = numpy.array(dependencies, dtype=int)
+    if isinstance(compiled, DDNNF):
+        circuit_weights = CircuitWeights(compiled, weight_index)
+    else:
+        circuit_weights = None
+    return nodes, slots, circuit_weights, dependencies
+
+
+class CircuitWeights(object):
+    """Weights of a compiled circuit, with the weights of the facts to learn mapped to their slots.
+
+    The weights of the other facts are extracted once.
+    For each set of weights, the weights of the facts to learn are gathered from a dense weight \
+    vector, so that no weight terms have to be interpreted during evaluation.
+    """
+
+    def __init__(self, compiled, weight_index):
+        """
+        :param compiled: compiled circuit
+        :type compiled: DDNNF
+        :param weight_index: numbering of the weights
+        :type weight_index: WeightIndex
+        """
+        nodes = []
+        slots = []
+        for node, weight in compiled.get_weights().items():
+            if isinstance(weight, Term) and weight.functor == 'lfi':
+                nodes.append(node)
+                slots.append(weight_index.slot(tuple(weight.args)))
+        self.nodes = nodes
+        self.slots = numpy.array(slots, dtype=int) if numpy is not None else slots
+        # The facts to learn get a placeholder weight; it is replaced in extract.
+        self.static = compiled.extract_weights(SemiringProbability(), {n: 0.0 for n in nodes})
+        # Constraints that depend on the weights of the facts to learn.
+        learned = set(abs(n) for n in nodes)
+        self.constraints = [c for c in compiled.constraints()
+                            if learned.intersection(abs(n) for n in c.get_nodes())]
+
+    def extract(self, weights, semiring):
+        """Get the weights of the circuit in internal representation.
+
+        :param weights: dense weights in the order of the weight index
+        :param semiring: probability semiring
+        :return: dictionary { node : (positive weight, negative weight) }
+        :rtype: dict[int, tuple[float, float]]
+        """
+        result = self.static.copy()
+        if numpy is not None:
+            values = weights[self.slots].tolist()
+        else:
+            values = [weights[slot] for slot in self.slots]
+        for node, p in zip(self.nodes, values):
+            if node > 0:
+                result[node] = p, 1.0 - p
+            else:
+                result[-node] = 1.0 - p, p
+        for c in self.constraints:
+            c.update_weights(result, semiring)
+        return result
+
+
+def compile_example(lfi, baseprogram, atoms, values):
+    """Ground and compile the program for the given evidence.
+
+    :param lfi: learning problem
+    :type lfi: LFIProblem
+    :param baseprogram: prepared program
+    :param atoms: evidence atoms
+    :param values: evidence values (None for evidence atoms without value)
+    :return: compiled circuit
+    """
+    ground_program = lfi.ground_example(baseprogram, atoms, values)
+    relevant = None
+    if lfi.relevant_only:
+        relevant = ground_program.extract_relevant({abs(node) for name, node, value in ground_program.evidence_all()
+                                                    if ground_program.is_probabilistic(node)})
+    for i, node, t in ground_program:
+        if relevant is not None and not relevant[i]:
+            continue
+        if t == 'atom' and isinstance(node.probability, Term) and node.probability.functor == 'lfi':
+            factargs = ()
+            if type(node.identifier) == tuple:
+                factargs = node.identifier[1]
+            fact = Term('lfi_fact', node.probability.args[0], node.probability.args[1], *factargs)
+            ground_program.add_query(fact, i)
+    return lfi.knowledge.create_from(ground_program)
+
 
 class ExampleEvaluator(SemiringProbability):
 
-    def __init__(self, weights):
+    def __init__(self, weights, defaults=None, weight_index=None, tolerance=None):
+        """
+        :param weights: current weights
+        :param defaults: weight to use for keys that have no weight yet (by index)
+        :type defaults: list[float] | None
+        :param weight_index: numbering of the weights; if given, the weights of circuits with \
+        precomputed :class:`CircuitWeights` are gathered from a dense weight vector
+        :type weight_index: WeightIndex | None
+        :param tolerance: reuse the last result of an example if none of its weights moved more \
+        than this since (requires weight_index; None: always evaluate)
+        :type tolerance: float | None
+        """
         SemiringProbability.__init__(self)
         self._weights = weights
+        self._defaults = defaults
+        self._tolerance = tolerance
+        # Number of examples for which the last result was reused.
+        self.reused = 0
+        self._dense = None
+        if weight_index is not None:
+            dense = [self._get_weight(index, args, strict=False) for index, args in weight_index.keys]
+            self._dense = numpy.array(dense, dtype=float) if numpy is not None else dense
 
     def _get_weight(self, index, args, strict=True):
         index = int(index)
         weight = self._weights[index]
         if isinstance(weight, dict):
-            if strict:
+            if args in weight:
+                return weight[args]
+            elif self._defaults is not None:
+                return self._defaults[index]
+            elif strict:
                 return weight[args]
             else:
                 return weight.get(args, 0.0)
@@ -657,8 +1902,26 @@ class ExampleEvaluator(SemiringProbability):
             return float(a)
 
     def __call__(self, example):
-        """Evaluate the model with its current estimates for all examples."""
+        """Evaluate the model with its current estimates for the given example.
 
+        The result is reused if the weights of the example did not move more than the tolerance \
+        since its last evaluation.
+        """
+        if self._tolerance is None or self._dense is None:
+            return self._evaluate(example)
+        if numpy is not None:
+            current = self._dense[example.dependencies]
+        else:
+            current = [self._dense[slot] for slot in example.dependencies]
+        last = example.last_result
+        if last is not None and _max_distance(current, last[0]) <= self._tolerance:
+            self.reused += len(example.n)
+            return last[1]
+        result = self._evaluate(example)
+        example.last_result = current, result
+        return result
+
+    def _evaluate(self, example):
         at = example.atoms
         val = example.values
         comp = example.compiled
@@ -675,24 +1938,45 @@ class ExampleEvaluator(SemiringProbability):
                     raise InconsistentEvidenceError(source=a, context=context)
             else:
                 evidence[a] = v
+        for a, node in example.deterministic.items():
+            v = evidence.get(a)
+            if v is not None and v != (node == 0):
+                context = ' (example {})'.format(n[0] + 1)
+                raise InconsistentEvidenceError(source=a, context=context)
+            evidence[a] = None
+        kwargs = {}
+        if self._dense is not None and example.circuit_weights is not None:
+            kwargs['extracted_weights'] = example.circuit_weights.extract(self._dense, self)
         try:
-            evaluator = comp.get_evaluator(semiring=self, evidence=evidence)
+            evaluator = comp.get_evaluator(semiring=self, evidence=evidence, **kwargs)
         except InconsistentEvidenceError as err:
             if err.context == '':
                 context = ' (example {})'.format(n[0] + 1)
             else:
                 context = err.context + ' (example {})'.format(n[0] + 1)
             raise InconsistentEvidenceError(err.source, context)
-        p_queries = {}
         # Probability of query given evidence
-        for name, node, label in evaluator.formula.labeled():
-            w = evaluator.evaluate_fact(node)
-            if w < 1e-6:
-                p_queries[name] = 0.0
-            else:
-                p_queries[name] = w
+        if hasattr(evaluator, 'evaluate_facts'):
+            # All marginals from a single backward pass over the circuit.
+            values = evaluator.evaluate_facts(example.nodes)
+        else:
+            values = [evaluator.evaluate_fact(node) for node in example.nodes]
+        if numpy is not None:
+            values = numpy.array(values, dtype=float)
+            values[values < 1e-6] = 0.0
+        else:
+            values = [0.0 if w < 1e-6 else w for w in values]
         p_evidence = evaluator.evaluate_evidence()
-        return len(n), p_evidence, p_queries
+        return len(n), p_evidence, example.slots, values
+
+
+def _max_distance(a, b):
+    """Largest absolute difference between two weight vectors of the same length."""
+    if len(a) == 0:
+        return 0.0
+    if numpy is not None:
+        return numpy.max(numpy.abs(a - b))
+    return max(abs(x - y) for x, y in zip(a, b))
 
 
 def extract_evidence(pl):
@@ -709,27 +1993,229 @@ def extract_evidence(pl):
     return [(at, str2bool(vl)) for at, vl in atoms]
 
 
+# Tokens of evidence facts: name, unsigned number, negation, punctuation or anything else.
+_evidence_token = re.compile(r"\s*(?:%[^\n]*\n?|([a-z][A-Za-z0-9_]*)|(\d+(?:\.\d+(?:[eE][-+]?\d+)?)?)"
+                             r"|(\\\+)|([(),.])|(\S))?")
+
+# A line starting with '---' separates two examples.
+_example_separator = re.compile(br'^[ \t\r\f\v]*---[^\n]*\n?', re.M)
+# A call of evidence/1,2 or observe/1 that is not in a line comment.
+_example_evidence = re.compile(br'^[^%\n]*?(?<![A-Za-z0-9_])(?:evidence|observe)[\x00-\x20]*\(', re.M)
+
+
+class _NotSimple(Exception):
+    pass
+
+
+def _tokenize_evidence(text):
+    tokens = []
+    pos = 0
+    end = len(text)
+    while pos < end:
+        match = _evidence_token.match(text, pos)
+        pos = match.end()
+        if match.lastindex is None:
+            continue    # white space or comment
+        elif match.lastindex == 5:
+            raise _NotSimple()
+        tokens.append((match.lastindex, match.group(match.lastindex)))
+    return tokens
+
+
+def _parse_simple_term(tokens, i):
+    kind, value = tokens[i]
+    if kind == 2:
+        if '.' in value:
+            return Constant(float(value)), i + 1
+        return Constant(int(value)), i + 1
+    elif kind != 1:
+        raise _NotSimple()
+    if i + 1 < len(tokens) and tokens[i + 1][1] == '(':
+        args = []
+        i += 1
+        while tokens[i][1] in '(,':
+            arg, i = _parse_simple_term(tokens, i + 1)
+            args.append(arg)
+        if tokens[i][1] != ')':
+            raise _NotSimple()
+        return Term(value, *args), i + 1
+    return Term(value), i + 1
+
+
+def _parse_evidence_fast(text):
+    """Parse an example that only consists of evidence/1, evidence/2 and observe/1 facts on \
+    simple ground atoms (names, numbers and compound terms).
+
+    :return: evidence in the same order as :func:`extract_evidence`, or None if the example \
+    contains anything else
+    """
+    try:
+        tokens = _tokenize_evidence(text)
+        with_value = []
+        evidence = []
+        observed = []
+        i = 0
+        while i < len(tokens):
+            functor = tokens[i][1]
+            if functor not in ('evidence', 'observe') or tokens[i + 1][1] != '(':
+                raise _NotSimple()
+            i += 2
+            negated = tokens[i][0] == 3
+            if negated:
+                i += 1
+            atom, i = _parse_simple_term(tokens, i)
+            if tokens[i][1] == ',' and functor == 'evidence' and not negated:
+                value, i = _parse_simple_term(tokens, i + 1)
+                with_value.append((atom, str2bool(value)))
+            elif functor == 'evidence':
+                evidence.append((atom, not negated))
+            else:
+                observed.append((atom, not negated))
+            if tokens[i][1] != ')' or tokens[i + 1][1] != '.':
+                raise _NotSimple()
+            i += 2
+        result = []
+        for atom in with_value + evidence + observed:
+            if atom not in result:
+                result.append(atom)
+        return result
+    except (_NotSimple, IndexError):
+        return None
+
+
+def parse_example(text):
+    """Get the evidence of an example from its text.
+
+    Simple evidence facts are parsed directly, other examples are parsed and queried with the \
+    ProbLog engine (see :func:`extract_evidence`).
+
+    :param text: text of the example
+    :type text: str
+    :return: list of evidence atoms and values
+    :rtype: list[tuple[Term, bool]]
+    """
+    atoms = _parse_evidence_fast(text)
+    if atoms is None:
+        atoms = extract_evidence(PrologString(text))
+    return atoms
+
+
+def index_examples(filename):
+    """Get the byte offsets of the examples in an evidence file.
+
+    Examples are separated by lines starting with ``---``.
+    Examples that do not mention ``evidence`` or ``observe`` (outside of line comments) are \
+    skipped without parsing them.
+
+    :param filename: evidence file
+    :return: list of (start, end) offsets of the examples that can contain evidence
+    :rtype: list[tuple[int, int]]
+    """
+    result = []
+    with open(filename, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return result
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            start = 0
+            for match in _example_separator.finditer(data):
+                if _example_evidence.search(data, start, match.start()):
+                    result.append((start, match.start()))
+                start = match.end()
+            if _example_evidence.search(data, start, size):
+                result.append((start, size))
+        finally:
+            data.close()
+    return result
+
+
+def _read_example_texts(filename):
+    with open(filename) as f:
+        example = ''
+        for line in f:
+            if line.strip().startswith('---'):
+                yield example
+                example = ''
+            else:
+                example += line
+        if example:
+            yield example
+
+
 def read_examples(*filenames):
-    
+    """Read the examples in the given evidence files (lazily).
+
+    Examples are separated by lines starting with ``---``; examples without evidence are skipped.
+
+    :param filenames: evidence files
+    :return: generator of lists of evidence atoms and values
+    """
     for filename in filenames:
-        engine = DefaultEngine()
-        
-        with open(filename) as f:
-            example = ''
-            for line in f:
-                if line.strip().startswith('---'):
-                    pl = PrologString(example)
-                    atoms = extract_evidence(pl)
-                    if len(atoms) > 0:
-                        yield atoms
-                    example = ''
-                else:
-                    example += line
-            if example:
-                pl = PrologString(example)
-                atoms = extract_evidence(pl)
+        for text in _read_example_texts(filename):
+            atoms = parse_example(text)
+            if len(atoms) > 0:
+                yield atoms
+
+
+class ExampleReader(object):
+    """Examples read lazily from files (see :func:`read_examples`).
+
+    The files are read again on every iteration over the examples.
+    The byte offsets of the examples are indexed on first use of :func:`len` or :func:`read`, \
+    such that ranges of examples can be read on demand.
+    Examples without evidence are skipped, as in :func:`read_examples`.
+    """
+
+    def __init__(self, *filenames):
+        self.filenames = filenames
+        self._index = None
+
+    @property
+    def index(self):
+        """Filename and byte offsets of each example with evidence.
+
+        :rtype: list[tuple[str, int, int]]
+        """
+        if self._index is None:
+            self._index = [(filename, start, end) for filename in self.filenames
+                           for start, end in index_examples(filename)]
+        return self._index
+
+    def __len__(self):
+        """Number of examples with evidence (examples that only mention evidence in a way that \
+        is not recognized without parsing, e.g. in a block comment, are counted as well)."""
+        return len(self.index)
+
+    def __iter__(self):
+        return read_examples(*self.filenames)
+
+    def read(self, start, stop):
+        """Read the examples with the given indices.
+
+        :param start: index of the first example
+        :param stop: index after the last example
+        :return: lists of evidence atoms and values (examples without evidence are skipped)
+        """
+        result = []
+        current = None
+        f = None
+        try:
+            for filename, begin, end in self.index[start:stop]:
+                if filename != current:
+                    if f is not None:
+                        f.close()
+                    f = open(filename, 'rb')
+                    current = filename
+                f.seek(begin)
+                atoms = parse_example(f.read(end - begin).decode('utf-8'))
                 if len(atoms) > 0:
-                    yield atoms
+                    result.append(atoms)
+        finally:
+            if f is not None:
+                f.close()
+        return result
 
 
 class DefaultDict(object):
@@ -742,13 +2228,9 @@ class DefaultDict(object):
 
     
 def run_lfi(program, examples, output_model=None, **kwdargs):
-    lfi = LFIProblem(program, examples, **kwdargs)
+    lfi = LFIProblem(program, examples, output_model=output_model, **kwdargs)
     score = lfi.run()
 
-    if output_model is not None:
-        with open(output_model, 'w') as f:
-            f.write(lfi.get_model())
-
     names = []
     weights = []
     for i, name in enumerate(lfi.names):
@@ -785,6 +2267,33 @@ def argparser():
                         default=True,
                         help="Disable evidence propagation")
     parser.add_argument('--normalize', action='store_true', help="Normalize AD-weights.")
+    parser.add_argument('--processes', type=int, default=1,
+                        help="Number of worker processes for compiling and evaluating examples.")
+    parser.add_argument('--method', choices=['em', 'lbfgs', 'adam'], default='em',
+                        help="Learning method (default: em).")
+    parser.add_argument('--learning-rate', type=float, default=0.1,
+                        help="Step size for adam (default: 0.1).")
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help="Number of examples per minibatch for adam (default: all examples) "
+                             "or online EM (default: 100).")
+    parser.add_argument('--online', action='store_true',
+                        help="Stepwise EM over minibatches of examples that are read lazily.")
+    parser.add_argument('--step-decay', type=float, default=0.7,
+                        help="Decay of the step size for online EM (default: 0.7).")
+    parser.add_argument('--cache-size', type=int, default=100,
+                        help="Maximal number of compiled circuits kept by online EM (default: 100).")
+    parser.add_argument('--checkpoint', type=str, default=None,
+                        help="Write the state of the learning to the given file periodically.")
+    parser.add_argument('--checkpoint-every', type=int, default=10,
+                        help="Write the checkpoint and the output model (-O) every N iterations "
+                             "(minibatches for online EM) (default: 10).")
+    parser.add_argument('--checkpoint-circuits', action='store_true',
+                        help="Also store the compiled examples in the checkpoint.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue from the checkpoint (if it exists).")
+    parser.add_argument('--skip-tolerance', type=float, default=0.0,
+                        help="Reuse the result of an example if none of its weights moved more "
+                             "than this since its last evaluation (default: 0.0, i.e. unchanged).")
     parser.add_argument('-v', '--verbose', action='count', default=0)
     parser.add_argument('--web', action='store_true', help=argparse.SUPPRESS)
     parser.add_argument('-a', '--arg', dest='args', action='append',
@@ -825,7 +2334,8 @@ def main(argv, result_handler=None):
     create_logger('problog', args.verbose - 1)
 
     program = PrologFile(args.model)
-    examples = list(read_examples(*args.examples))
+    # The examples are streamed from the files into the grouping of the examples.
+    examples = ExampleReader(*args.examples)
     if len(examples) == 0:
         logging.getLogger('problog_lfi').warn('no examples specified')
     else:
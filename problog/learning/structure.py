@@ -0,0 +1,657 @@
+#! /usr/bin/env python
+
+"""
+Structure learning
+------------------
+
+Structure learning for ProbLog.
+
+Given a probabilistic program, a target predicate and a set of partial interpretations,
+learns probabilistic clauses that define the target predicate.
+
+Algorithm
++++++++++
+
+The search is a greedy hill-climbing over clause refinements:
+
+    0. Start from the given program.
+    1. Propose refinements of the learned clauses: add a new clause ``t(_)::target :- l`` \
+    or add a literal ``l`` to the last learned clause.
+    2. Score each refinement by the log-likelihood of the examples after parameter learning \
+    (see :py:mod:`learning.lfi`).
+    3. Keep the best refinement if it improves the score by at least ``min_gain`` \
+    and repeat from step 1.
+
+Implementation
+++++++++++++++
+
+Only the target predicate and the predicates that depend on it change between candidates.
+The groundings of the other (unchanged) predicates are computed once for each set of evidence
+and reused for every candidate: the engine's table of the cached ground program is copied
+together with the program, so grounding a candidate only adds the changed predicates.
+
+Candidates can be evaluated in parallel by a pool of worker processes.
+
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import zlib
+import random
+import logging
+import itertools
+import multiprocessing
+import traceback
+
+from problog.engine import DefaultEngine, ground
+from problog.logic import Term, Var, Clause, AnnotatedDisjunction, And, Or, Not
+from problog.program import PrologFile, SimpleProgram
+from problog.core import ProbLogError
+from problog.errors import process_error, GroundingError, InconsistentEvidenceError
+from problog import get_evaluatable, get_evaluatables
+from problog.learning.lfi import LFIProblem, read_examples, create_logger
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class GroundingCache(object):
+    """Ground programs of the unchanged predicates, for each set of evidence.
+
+    The evidence on unchanged predicates is grounded once on the base program, together with \
+    the calls of the candidate literals for the evidence on the target.
+    The ground program of a candidate starts from a copy of this ground program (including the \
+    engine's table), such that only the changed predicates are grounded again.
+    """
+
+    def __init__(self, baseprogram, changed, head=None, literals=(), **extra):
+        """
+        :param baseprogram: prepared base program (see :func:`LFIProblem.prepare`)
+        :param changed: signatures of the predicates that change between candidates
+        :type changed: set[str]
+        :param head: head of the learned clauses
+        :type head: Term
+        :param literals: literals that can occur in the body of the learned clauses
+        :type literals: list[Term]
+        :param extra: additional arguments for the grounding engine
+        """
+        self._baseprogram = baseprogram
+        self._changed = changed
+        self._head = head
+        self._literals = [lit.child if isinstance(lit, Not) else lit for lit in literals]
+        self._extra = extra
+        self._formulas = {}
+        self.hits = 0
+        self.misses = 0
+
+    def ground(self, program, atoms, values, propagate_evidence):
+        """Ground the program for the evidence of an example.
+
+        :param program: prepared program of the candidate
+        :param atoms: evidence atoms
+        :param values: evidence values (None for evidence atoms without value)
+        :param propagate_evidence: propagate the evidence in the ground program
+        :return: ground program
+        :rtype: LogicFormula
+        """
+        key, fixed, changed = self._split(atoms, values)
+        formula = self._formulas.get(key)
+        if formula is None:
+            self.misses += 1
+            formula = self._formulas[key] = self._ground_fixed(fixed, changed)
+        else:
+            self.hits += 1
+        return ground(program, formula.copy(), evidence=changed,
+                      propagate_evidence=propagate_evidence)
+
+    def fill(self, atoms, values):
+        """Ground the unchanged predicates for the evidence of an example (if not cached yet).
+
+        :param atoms: evidence atoms
+        :param values: evidence values (None for evidence atoms without value)
+        """
+        key, fixed, changed = self._split(atoms, values)
+        if key not in self._formulas:
+            self._formulas[key] = self._ground_fixed(fixed, changed)
+
+    def _split(self, atoms, values):
+        fixed = []
+        changed = []
+        for atom, value in zip(atoms, values):
+            if atom.signature in self._changed:
+                changed.append((atom, value))
+            else:
+                fixed.append((atom, value))
+        return (tuple(fixed), tuple(atom for atom, value in changed)), fixed, changed
+
+    def _ground_fixed(self, fixed, changed):
+        engine = DefaultEngine(**self._extra)
+        formula = engine.ground_all(self._baseprogram, queries=[], evidence=fixed)
+        for atom, value in changed:
+            if self._head is not None and atom.signature == self._head.signature:
+                subst = _Substitution(zip((arg.name for arg in self._head.args), atom.args))
+                for literal in self._literals:
+                    engine._ground(self._baseprogram, literal.apply(subst), formula,
+                                   assume_prepared=True)
+        return formula
+
+    def __len__(self):
+        return len(self._formulas)
+
+
+class _Substitution(dict):
+    """Substitution that leaves unknown variables unchanged."""
+
+    def __missing__(self, name):
+        return Var(name)
+
+
+class CandidateProblem(LFIProblem):
+    """Parameter learning problem that grounds its examples from a :class:`GroundingCache`.
+
+    The cached ground programs can contain calls that are not used by the candidate, so only the \
+    facts that are relevant for the evidence are learned.
+    """
+
+    relevant_only = True
+
+    def __init__(self, source, examples, groundings=None, **kwdargs):
+        LFIProblem.__init__(self, source, examples, **kwdargs)
+        self._groundings = groundings
+        # Processor time (in seconds) spent grounding the examples.
+        self.grounding_time = 0.0
+
+    def ground_example(self, baseprogram, atoms, values):
+        start = time.process_time()
+        try:
+            if self._groundings is None:
+                return LFIProblem.ground_example(self, baseprogram, atoms, values)
+            return self._groundings.ground(baseprogram, atoms, values, self.propagate_evidence)
+        finally:
+            self.grounding_time += time.process_time() - start
+
+
+class StructureLearner(object):
+
+    def __init__(self, source, examples, target, candidates=None, max_clauses=3, max_length=2,
+                 min_gain=1e-3, max_iter=50, processes=1, cache_groundings=True, knowledge=None,
+                 propagate_evidence=True, seed=None, **extra):
+        """
+        :param source: input model
+        :type source: LogicProgram
+        :param examples: list of examples (list of observed terms / value)
+        :param target: signature of the predicate to learn (e.g. ``smokes/1``)
+        :type target: str
+        :param candidates: signatures of the predicates that can be used in the body of the learned \
+        clauses (default: all predicates of the model that do not depend on the target)
+        :type candidates: list[str] | None
+        :param max_clauses: maximal number of clauses to learn
+        :type max_clauses: int
+        :param max_length: maximal number of literals in the body of a learned clause
+        :type max_length: int
+        :param min_gain: minimal improvement of the log-likelihood to accept a refinement
+        :type min_gain: float
+        :param max_iter: maximal number of parameter learning iterations per candidate
+        :type max_iter: int
+        :param processes: number of worker processes used for evaluating candidates
+        :type processes: int
+        :param cache_groundings: reuse the groundings of unchanged predicates between candidates
+        :type cache_groundings: bool
+        :param knowledge: class to use for knowledge compilation
+        :type knowledge: class
+        :param propagate_evidence: propagate evidence in the ground programs
+        :type propagate_evidence: bool
+        :param seed: seed for the random initial weights of the learned clauses; each candidate \
+        is seeded from this seed and its clauses, such that the search does not depend on the \
+        order or the process in which the candidates are evaluated (default: not seeded)
+        :type seed: int | None
+        :param extra: additional arguments for the grounding engine
+        """
+        self.clauses = list(source)
+        self.examples = examples
+        functor, arity = _parse_signature(target)
+        self.target = Term(functor, *[Var('A%s' % i) for i in range(arity)])
+        if self.target.signature not in _defined_predicates(self.clauses):
+            # Make sure the target is defined when no clauses have been learned.
+            self.clauses.append(Clause(self.target, Term('fail')))
+        self.changed = _dependent_predicates(self.clauses, self.target.signature)
+        if candidates is None:
+            candidates = sorted(_defined_predicates(self.clauses) - self.changed)
+        else:
+            for signature in candidates:
+                _parse_signature(signature)
+                if signature in self.changed:
+                    raise ProbLogError("Candidate predicate '%s' depends on the target '%s'."
+                                       % (signature, target))
+        self.candidates = candidates
+        self.literals = _literals(self.target, candidates)
+        self.max_clauses = max_clauses
+        self.max_length = max_length
+        self.min_gain = min_gain
+        self.max_iter = max_iter
+        self.processes = processes
+        if knowledge is None:
+            knowledge = get_evaluatable()
+        self.knowledge = knowledge
+        self.propagate_evidence = propagate_evidence
+        self.seed = seed
+        self.extra = extra
+        self.groundings = None
+        if cache_groundings:
+            base = LFIProblem(self.program([]), examples)
+            self.groundings = GroundingCache(DefaultEngine(**extra).prepare(base), self.changed,
+                                             head=self.target, literals=self.literals, **extra)
+        # Number of candidates evaluated, processor time spent grounding them and
+        #  (step, candidates, seconds, score) per step.
+        self.evaluations = 0
+        self.grounding_time = 0.0
+        self.trace = []
+
+    def program(self, learned):
+        """Get the program with the given learned clauses.
+
+        :param learned: bodies of the learned clauses
+        :type learned: list[tuple[Term]]
+        :rtype: SimpleProgram
+        """
+        program = SimpleProgram()
+        for clause in self.clauses:
+            program.add_statement(clause)
+        head = self.target.with_probability(Term('t', Var('_')))
+        for body in learned:
+            program.add_clause(Clause(head, And.from_list(list(body))))
+        return program
+
+    def evaluate(self, learned):
+        """Learn the parameters of the program with the given learned clauses.
+
+        :param learned: bodies of the learned clauses
+        :type learned: list[tuple[Term]]
+        :return: log-likelihood of the examples, learned model, processor time spent grounding
+        :rtype: tuple[float, str, float]
+        """
+        if self.seed is not None:
+            seed = '%s:%s' % (self.seed, _format(learned))
+            seed = zlib.crc32(seed.encode('utf-8')) & 0xffffffff
+            random.seed(seed)
+            if numpy is not None:
+                numpy.random.seed(seed)
+        lfi = CandidateProblem(self.program(learned), self.examples, groundings=self.groundings,
+                               max_iter=self.max_iter, knowledge=self.knowledge,
+                               propagate_evidence=self.propagate_evidence, **self.extra)
+        score = lfi.run()
+        return score, lfi.get_model(), lfi.grounding_time
+
+    def refine(self, learned):
+        """Get the refinements of the given learned clauses.
+
+        :param learned: bodies of the learned clauses
+        :type learned: list[tuple[Term]]
+        :rtype: list[list[tuple[Term]]]
+        """
+        refinements = []
+        if len(learned) < self.max_clauses:
+            for literal in self.literals:
+                if (literal,) not in learned:
+                    refinements.append(learned + [(literal,)])
+        if learned and len(learned[-1]) < self.max_length:
+            last = learned[-1]
+            for literal in self.literals:
+                if literal not in last:
+                    refinements.append(learned[:-1] + [last + (literal,)])
+        return refinements
+
+    def _start_pool(self):
+        """Start the worker processes that evaluate the candidates during the whole search.
+
+        The groundings of all examples are cached before the workers are started, such that \
+        every worker starts with the complete cache.
+        """
+        if self.groundings is not None:
+            base = LFIProblem(self.program([]), self.examples,
+                              propagate_evidence=self.propagate_evidence)
+            for unit in base._process_examples().units():
+                self.groundings.fill(unit.atoms, unit.ground_values)
+        return multiprocessing.Pool(self.processes, initializer=_init_worker, initargs=(self,))
+
+    def _evaluate_all(self, candidates, pool=None):
+        if pool is not None and len(candidates) > 1:
+            return pool.map(_evaluate_candidate, candidates)
+        else:
+            return [self._evaluate_safe(learned) for learned in candidates]
+
+    def _evaluate_safe(self, learned):
+        """Evaluate a candidate; candidates that are inconsistent with the examples get score None."""
+        logger = logging.getLogger('problog_structure')
+        try:
+            return self.evaluate(learned)
+        except (InconsistentEvidenceError, GroundingError) as err:
+            logger.debug('Candidate %s failed: %s' % (_format(learned), err))
+            return None, None, 0.0
+        except Exception as err:
+            logger.warning('Candidate %s failed: %s' % (_format(learned), err))
+            raise
+
+    def run(self):
+        """Run the structure search.
+
+        :return: log-likelihood of the examples, bodies of the learned clauses, learned model
+        :rtype: tuple[float, list[tuple[Term]], str]
+        """
+        logger = logging.getLogger('problog_structure')
+        start = time.time()
+        learned = []
+        # The score is None as long as the examples are inconsistent with the program.
+        score, model, grounding_time = self._evaluate_safe(learned)
+        self.evaluations += 1
+        self.grounding_time += grounding_time
+        self.trace.append((0, 1, time.time() - start, score))
+        logger.info('Initial score: %s' % score)
+        logger.info('Candidate literals: %s' % ', '.join(map(str, self.literals)))
+        step = 0
+        pool = None
+        try:
+            while True:
+                candidates = self.refine(learned)
+                if not candidates:
+                    break
+                step += 1
+                if pool is None and self.processes > 1 and len(candidates) > 1:
+                    pool = self._start_pool()
+                results = self._evaluate_all(candidates, pool)
+                self.evaluations += len(candidates)
+                best = None
+                for candidate, (cand_score, cand_model, grounding_time) in zip(candidates, results):
+                    self.grounding_time += grounding_time
+                    logger.debug('%s: %s' % (_format(candidate), cand_score))
+                    if cand_score is not None and (best is None or cand_score > best[1]):
+                        best = candidate, cand_score, cand_model
+                self.trace.append((step, len(candidates), time.time() - start,
+                                   score if best is None else best[1]))
+                if best is None or (score is not None and best[1] - score < self.min_gain):
+                    break
+                learned, score, model = best
+                logger.info('Score after step %s: %s (%s candidates, %.3fs): %s'
+                            % (step, score, len(candidates), time.time() - start,
+                               _format(learned)))
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        if self.groundings is not None:
+            logger.info('Cached groundings: %s (%s hits, %s misses)'
+                        % (len(self.groundings), self.groundings.hits, self.groundings.misses))
+        return score, learned, model
+
+
+# Learner of the worker processes of StructureLearner.
+_worker_learner = None
+
+
+def _init_worker(learner):
+    global _worker_learner
+    _worker_learner = learner
+
+
+def _evaluate_candidate(learned):
+    return _worker_learner._evaluate_safe(learned)
+
+
+def _format_score(score):
+    return '-' if score is None else '%.4f' % score
+
+
+def _format(learned):
+    return ' ; '.join(', '.join(map(str, body)) for body in learned) or 'true'
+
+
+def _parse_signature(signature):
+    try:
+        functor, arity = signature.rsplit('/', 1)
+        return functor, int(arity)
+    except ValueError:
+        raise ProbLogError("Invalid predicate signature '%s' (expected name/arity)." % signature)
+
+
+def _heads(clause):
+    """Get the heads and body of a clause, annotated disjunction or fact."""
+    if isinstance(clause, Clause):
+        return [clause.head], clause.body
+    elif isinstance(clause, AnnotatedDisjunction):
+        return clause.heads, clause.body
+    else:
+        return [clause], None
+
+
+def _body_predicates(body):
+    """Get the signatures of the predicates called in a clause body."""
+    if body is None or isinstance(body, Var):
+        return set()
+    elif isinstance(body, (And, Or)):
+        return _body_predicates(body.op1) | _body_predicates(body.op2)
+    elif isinstance(body, Not):
+        return _body_predicates(body.child)
+    else:
+        return {body.signature}
+
+
+def _defined_predicates(clauses):
+    """Get the signatures of the predicates defined in the program."""
+    result = set()
+    for clause in clauses:
+        heads, body = _heads(clause)
+        for head in heads:
+            if head.functor not in ('query', 'evidence'):
+                result.add(head.signature)
+    return result
+
+
+def _dependent_predicates(clauses, signature):
+    """Get the signatures of the given predicate and the predicates that depend on it."""
+    calls = []
+    for clause in clauses:
+        heads, body = _heads(clause)
+        calls.append(([head.signature for head in heads], _body_predicates(body)))
+    result = {signature}
+    changed = True
+    while changed:
+        changed = False
+        for heads, body in calls:
+            if body & result:
+                for head in heads:
+                    if head not in result:
+                        result.add(head)
+                        changed = True
+    return result
+
+
+def _literals(head, candidates):
+    """Get the literals that can be added to the body of a clause for the given head.
+
+    The arguments are variables of the head or a single new variable.
+    Negative literals are only allowed on variables of the head.
+    """
+    variables = list(head.args)
+    new = Var('V')
+    result = []
+    for signature in candidates:
+        functor, arity = _parse_signature(signature)
+        for args in itertools.product(variables + [new], repeat=arity):
+            literal = Term(functor, *args)
+            result.append(literal)
+            if new not in args:
+                result.append(Not('\\+', literal))
+    return result
+
+
+def run_structure(program, examples, target, output_model=None, **kwdargs):
+    """Learn clauses for the target predicate.
+
+    :param program: input model
+    :type program: LogicProgram
+    :param examples: list of examples
+    :param target: signature of the predicate to learn
+    :param output_model: file to which the learned model is written
+    :param kwdargs: arguments for :class:`StructureLearner`
+    :return: log-likelihood, bodies of the learned clauses, learned model, learner
+    """
+    learner = StructureLearner(program, examples, target, **kwdargs)
+    score, learned, model = learner.run()
+    if output_model is not None:
+        with open(output_model, 'w') as f:
+            f.write(model)
+    return score, learned, model, learner
+
+
+def _without_predicate(program, signature):
+    """Remove the clauses of the given predicate from a program."""
+    result = SimpleProgram()
+    for clause in program:
+        heads, body = _heads(clause)
+        if signature not in [head.signature for head in heads]:
+            result.add_statement(clause)
+    return result
+
+
+def benchmark(processes=2, output=sys.stdout, seed=0, **kwdargs):
+    """Benchmark the structure search on the bundled test1 and test2 models.
+
+    The clauses of the target predicate are removed from the model and learned from the examples,
+    without and with cached groundings and with multiple processes.
+    All settings use the same seed, such that they explore the same candidates.
+    The processor time spent grounding is reported per candidate.
+    """
+    path = os.path.dirname(__file__)
+    problems = [('test1', 'alarm/0'), ('test2', 'smokes/1')]
+    settings = [('no cache', False, 1), ('cache', True, 1),
+                ('cache, %s processes' % processes, True, processes)]
+    print('%-6s %-20s %10s %12s %14s %10s'
+          % ('model', 'setting', 'seconds', 'candidates', 'ground/cand', 'score'), file=output)
+    for name, target in problems:
+        model = PrologFile(os.path.join(path, '%s_model.pl' % name))
+        program = _without_predicate(model, target)
+        examples = list(read_examples(os.path.join(path, '%s_examples.pl' % name)))
+        for label, cache_groundings, nprocs in settings:
+            start = time.time()
+            learner = StructureLearner(program, examples, target, processes=nprocs,
+                                       cache_groundings=cache_groundings, seed=seed, **kwdargs)
+            score, learned, learned_model = learner.run()
+            print('%-6s %-20s %10.3f %12s %12.2fms %10s'
+                  % (name, label, time.time() - start, learner.evaluations,
+                     1000 * learner.grounding_time / learner.evaluations, _format_score(score)),
+                  file=output)
+
+
+def argparser():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Learn the structure of a ProbLog model.")
+    parser.add_argument('model', nargs='?')
+    parser.add_argument('examples', nargs='*')
+    parser.add_argument('-t', '--target', type=str, default=None,
+                        help="Signature of the predicate to learn (e.g. smokes/1).")
+    parser.add_argument('--candidates', type=str, default=None,
+                        help="Comma-separated signatures of the predicates that can be used in "
+                             "the learned clauses (default: all predicates that do not depend on "
+                             "the target).")
+    parser.add_argument('--max-clauses', type=int, default=3,
+                        help="Maximal number of clauses to learn (default: 3).")
+    parser.add_argument('--max-length', type=int, default=2,
+                        help="Maximal number of literals in a learned clause (default: 2).")
+    parser.add_argument('--min-gain', type=float, default=1e-3,
+                        help="Minimal improvement of the log-likelihood to accept a refinement "
+                             "(default: 0.001).")
+    parser.add_argument('-n', dest='max_iter', default=50, type=int,
+                        help="Maximal number of parameter learning iterations per candidate "
+                             "(default: 50).")
+    parser.add_argument('--processes', type=int, default=1,
+                        help="Number of worker processes for evaluating candidates.")
+    parser.add_argument('--no-cache', action='store_false', dest='cache_groundings',
+                        help="Ground every candidate from scratch.")
+    parser.add_argument('--dont-propagate-evidence', action='store_false',
+                        dest='propagate_evidence', default=True,
+                        help="Disable evidence propagation")
+    parser.add_argument('-k', '--knowledge', dest='koption', choices=get_evaluatables(),
+                        default=None, help='knowledge compilation tool')
+    parser.add_argument('-O', '--output-model', type=str, default=None,
+                        help='write resulting model to given file')
+    parser.add_argument('-o', '--output', type=str, default=None,
+                        help='write output to file')
+    parser.add_argument('--seed', '-s', type=int, default=None,
+                        help="Random seed for the initial weights of the learned clauses "
+                             "(default: not seeded, 0 for --benchmark).")
+    parser.add_argument('--benchmark', action='store_true',
+                        help="Benchmark the search on the bundled test1 and test2 models.")
+    parser.add_argument('-v', '--verbose', action='count', default=0)
+    return parser
+
+
+def main(argv, result_handler=None):
+    parser = argparser()
+    args = parser.parse_args(argv)
+
+    if result_handler is None:
+        result_handler = print_result
+
+    if args.output is None:
+        outf = sys.stdout
+    else:
+        outf = open(args.output, 'w')
+
+    create_logger('problog_structure', args.verbose)
+    create_logger('problog_lfi', args.verbose - 2)
+
+    knowledge = get_evaluatable(args.koption)
+
+    if args.benchmark:
+        benchmark(processes=max(2, args.processes), output=outf,
+                  seed=0 if args.seed is None else args.seed, max_clauses=args.max_clauses,
+                  max_length=args.max_length, min_gain=args.min_gain, max_iter=args.max_iter,
+                  knowledge=knowledge, propagate_evidence=args.propagate_evidence)
+        retcode = 0
+    elif args.model is None or not args.examples or args.target is None:
+        parser.error('a model, examples and a target (-t) are required')
+    else:
+        candidates = None
+        if args.candidates is not None:
+            candidates = [c.strip() for c in args.candidates.split(',') if c.strip()]
+        try:
+            program = PrologFile(args.model)
+            examples = list(read_examples(*args.examples))
+            results = run_structure(program, examples, args.target, output_model=args.output_model,
+                                    candidates=candidates, max_clauses=args.max_clauses,
+                                    max_length=args.max_length, min_gain=args.min_gain,
+                                    max_iter=args.max_iter, processes=args.processes,
+                                    cache_groundings=args.cache_groundings, knowledge=knowledge,
+                                    propagate_evidence=args.propagate_evidence, seed=args.seed)
+            retcode = result_handler((True, results), output=outf)
+        except Exception as err:
+            err.trace = traceback.format_exc()
+            retcode = result_handler((False, err), output=outf)
+
+    if args.output is not None:
+        outf.close()
+
+    if retcode:
+        sys.exit(retcode)
+
+
+def print_result(d, output):
+    success, d = d
+    if success:
+        score, learned, model, learner = d
+        print(score, file=output)
+        print(model, file=output)
+        return 0
+    else:
+        print(process_error(d), file=output)
+        return 1
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,166 @@
+"""
+problog.library_cache - Cache of parsed library files
+-----------------------------------------------------
+
+The bundled library files (in ``problog/library``) are parsed once and stored as pickled clauses, \
+such that ``use_module`` and ``consult`` can load them without parsing.
+
+The cache is stored next to the library files (in ``__pycache__``) or, when that directory is not \
+writable, in the user's cache directory (``$XDG_CACHE_HOME/problog`` or ``~/.cache/problog``).
+It can be disabled by setting the environment variable ``PROBLOG_LIBRARY_CACHE=0``.
+
+..
+    Part of the ProbLog distribution.
+
+    Copyright 2015 KU Leuven, DTAI Research Group
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+        http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+from __future__ import print_function
+
+import os
+import sys
+import pickle
+import hashlib
+import tempfile
+
+from io import BytesIO
+
+from .version import version
+from .program import PrologFile, DefaultPrologFactory
+
+enabled = os.environ.get('PROBLOG_LIBRARY_CACHE', '1') != '0'
+
+library_root = os.path.abspath(os.path.join(os.path.dirname(__file__), 'library'))
+
+# Identifier of the file in the locations of the cached clauses (replaced on loading).
+_LOCATION_MARKER = '$problog_library_location'
+
+
+class _Pickler(pickle.Pickler):
+
+    def persistent_id(self, obj):
+        if obj is _LOCATION_MARKER:
+            return 'location'
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+
+    def __init__(self, f, identifier):
+        pickle.Unpickler.__init__(self, f)
+        self.identifier = identifier
+
+    def persistent_load(self, pid):
+        return self.identifier
+
+
+def cache_directories():
+    """Directories in which the cache is stored, in order of preference.
+
+    :return: list of directory names
+    """
+    user_cache = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return [os.path.join(library_root, '__pycache__'),
+            os.path.join(user_cache, 'problog', 'library')]
+
+
+def _cache_key(filename, factory_class):
+    stat = os.stat(filename)
+    return (version, tuple(sys.version_info[:2]), pickle.HIGHEST_PROTOCOL,
+            '%s.%s' % (factory_class.__module__, factory_class.__name__),
+            filename, stat.st_mtime, stat.st_size)
+
+
+def _cache_name(key):
+    digest = hashlib.sha1(repr(key[3:5]).encode('utf-8')).hexdigest()[:16]
+    return '%s.%s.pickle' % (os.path.basename(key[4]), digest)
+
+
+def _read(key, identifier):
+    """Read the clauses and line table from the cache, if it is valid for the given key."""
+    for directory in cache_directories():
+        try:
+            with open(os.path.join(directory, _cache_name(key)), 'rb') as f:
+                unpickler = _Unpickler(f, identifier)
+                if unpickler.load() == key:
+                    return unpickler.load()
+        except Exception:
+            # Missing, outdated or corrupt cache file
+            continue
+    return None
+
+
+def _write(key, data):
+    """Write the pickled data to the first writable cache directory."""
+    for directory in cache_directories():
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            fd, tmpname = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            if hasattr(os, 'replace'):
+                os.replace(tmpname, os.path.join(directory, _cache_name(key)))
+            else:  # pragma: no cover
+                os.rename(tmpname, os.path.join(directory, _cache_name(key)))
+            return True
+        except (IOError, OSError):
+            continue
+    return False
+
+
+def is_cached(filename, parser=None):
+    """Check whether the given file is loaded through the cache.
+
+    :param filename: name of the file
+    :param parser: parser for the file (files with a custom parser are not cached)
+    :return: True if the file is a bundled library file and the cache is enabled
+    """
+    return enabled and parser is None and \
+        os.path.abspath(filename).startswith(library_root + os.sep)
+
+
+def load(filename, identifier=0, factory=None):
+    """Load the clauses of a library file from the cache, parsing and storing it when needed.
+
+    :param filename: name of the library file
+    :param identifier: index of the file (in case of multiple files)
+    :param factory: factory for the clauses (only its class is used)
+    :return: tuple of list of clauses and line table, or None if the file could not be cached
+    """
+    filename = os.path.abspath(filename)
+    factory_class = DefaultPrologFactory if factory is None else factory.__class__
+    try:
+        key = _cache_key(filename, factory_class)
+    except OSError:
+        return None
+    result = _read(key, identifier)
+    if result is not None:
+        return result
+
+    try:
+        program = PrologFile(filename, identifier=_LOCATION_MARKER, factory=factory_class())
+        result = (list(program), program.line_info[0])
+        data = BytesIO()
+        pickler = _Pickler(data, pickle.HIGHEST_PROTOCOL)
+        pickler.dump(key)
+        pickler.dump(result)
+    except Exception:
+        # Errors are reported when the file is parsed without the cache.
+        return None
+    _write(key, data.getvalue())
+    data.seek(0)
+    unpickler = _Unpickler(data, identifier)
+    unpickler.load()
+    return unpickler.load()
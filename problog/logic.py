@@ -670,6 +670,13 @@ class Term(object):
             self.__hash = hash((self.__functor, self.__arity, firstarg, self._list_length()))
         return self.__hash
 
+    def __getstate__(self):
+        # String hashes differ between processes, so cached hashes are not pickled.
+        state = self.__dict__.copy()
+        state['_Term__hash'] = None
+        state['reprhash'] = None
+        return state
+
     def __lshift__(self, body):
         return Clause(self, body)
 
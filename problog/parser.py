@@ -23,6 +23,10 @@ Efficient low-level parser for Prolog programs.
 """
 from __future__ import print_function
 
+import os
+import sys
+import time
+
 from .errors import ParseError as CoreParseError
 
 LINE_COMMENT = '%'
@@ -36,7 +40,8 @@ WHITESPACE = frozenset('\n\t ')
 class ParseError(CoreParseError):
     def __init__(self, string, message, location):
         line, col, text = self._convert_pos(string, location)
-        CoreParseError.__init__(self, message, location=(None, line, col), line=text)
+        CoreParseError.__init__(self, message, location=(None, line, col), line=text,
+                                position=location)
 
     def _convert_pos(self, string, location):
         """Find line number, column number and text of offending line."""
@@ -155,6 +160,29 @@ import re
 
 RE_FLOAT = re.compile(r'(0x[0-9a-fA-F]+)|([-+]?[0-9]*\.?[0-9]+([eE][-+]?[0-9]+)?)')
 
+# Scanner for simple facts: a name with optional arguments that are names or unsigned numbers,
+# optionally preceded by a numeric probability (e.g. '0.3::edge(a,b).').
+_FAST_NAME = r'[a-z][A-Za-z0-9_]*'
+_FAST_NUMBER = r'[0-9]+(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?'
+_FAST_ARG = r'(?:%s|%s)' % (_FAST_NAME, _FAST_NUMBER)
+RE_FAST_FACT = re.compile(r'(?:(?P<prob>%s)[\x00-\x20]*(?P<probop>::)[\x00-\x20]*)?'
+                          r'(?P<functor>%s)'
+                          r'(?:\([\x00-\x20]*(?P<args>%s(?:[\x00-\x20]*,[\x00-\x20]*%s)*)'
+                          r'[\x00-\x20]*\))?'
+                          r'[\x00-\x20]*(?P<end>\.)(?=[\x00-\x20%%/]|$)'
+                          % (_FAST_NUMBER, _FAST_NAME, _FAST_ARG, _FAST_ARG))
+RE_FAST_ARG = re.compile(r'(%s)|(%s)' % (_FAST_NAME, _FAST_NUMBER))
+# Scanner for splitting a text on the terminating periods of its statements.
+# The named groups mark the statement ends ('end'), the neck of a clause ('neck'),
+# negations ('neg') and constructs that may continue beyond the end of the text ('open').
+RE_STATEMENT_SCAN = re.compile(r"""[^'"%/.\\:=]+|=\.\.|(?P<end>\.(?=[\x00-\x20%/]))"""
+                               r"""|'(?:[^']|(?<=\\)')*'|"(?:[^"]|(?<=\\)")*"|%[^\n]*\n"""
+                               r"""|/\*.*?\*/|(?P<neck>:-)|(?P<neg>\\\+)|(?P<open>['"%]|/\*|[=/:\\]?\.?\Z)|.""",
+                               re.S)
+# The prefix operator 'not' (the head of a statement is checked for it when it is complete).
+RE_NOT_OPERATOR = re.compile(r'not(?<![A-Za-z0-9_]not)(?![A-Za-z0-9_])')
+RE_FAST_SKIP = re.compile(r'(?:[\x00-\x20]+|%[^\n]*\n?|/\*(?:[^*]|\*(?!/))*\*/)*')
+
 
 def skip_to(s, pos, char):
     end = s.find(char, pos)
@@ -196,6 +224,10 @@ def is_comment_start(c):
 
 
 class PrologParser(object):
+
+    # Parse simple (probabilistic) facts with a regular expression instead of the full parser.
+    fast_facts = True
+
     def __init__(self, factory):
         self.factory = factory
         self.prepare()
@@ -759,10 +791,126 @@ class PrologParser(object):
     def _parse_statement(self, string, tokens):
         return self.collapse(string, tokens)
 
+    def _build_fast_constant(self, string, pos, end):
+        token = string[pos:end]
+        if '.' in token or 'e' in token or 'E' in token:
+            return self.factory.build_constant(float(token), location=pos)
+        else:
+            return self.factory.build_constant(int(token), location=pos)
+
+    def _build_fast_fact(self, string, match):
+        """Build a fact that was recognized by :data:`RE_FAST_FACT`."""
+        factory = self.factory
+        args = ()
+        if match.group('args') is not None:
+            args = []
+            for arg in RE_FAST_ARG.finditer(string, match.start('args'), match.end('args')):
+                if arg.group(1) is not None:
+                    args.append(factory.build_function(arg.group(1), (), location=arg.start()))
+                else:
+                    args.append(self._build_fast_constant(string, arg.start(), arg.end()))
+        fact = factory.build_function(match.group('functor'), args, location=match.start('functor'))
+        if match.group('prob') is not None:
+            prob = self._build_fast_constant(string, match.start('prob'), match.end('prob'))
+            fact = factory.build_probabilistic(functor='::', operand1=prob, operand2=fact,
+                                               location=match.start('probop'),
+                                               priority=1000, opspec='xfx')
+        return fact
+
+    def _parse_statements(self, string):
+        """Parse the statements in the given string.
+
+        Simple facts are recognized directly with :data:`RE_FAST_FACT` and built by the factory; \
+        all other statements are tokenized and parsed with the full operator precedence parser.
+        """
+        s_len = len(string)
+        pos = 0
+        if string[:2] == '#!':
+            pos = skip_comment_line(string, pos)
+        fast_facts = self.fast_facts
+        while True:
+            pos = RE_FAST_SKIP.match(string, pos).end()
+            if pos >= s_len:
+                break
+            if fast_facts:
+                match = RE_FAST_FACT.match(string, pos)
+                if match is not None:
+                    yield self._build_fast_fact(string, match)
+                    pos = match.end()
+                    continue
+            statement = []
+            end = None
+            while pos < s_len:
+                token, pos = self.next_token(string, pos)
+                if token is None:
+                    continue
+                elif token.is_special(SPECIAL_END):
+                    end = token
+                    break
+                else:
+                    statement.append(token)
+            if end is None:
+                if statement:
+                    raise ParseError(string, 'Incomplete statement', len(string))
+                break
+            elif not statement:
+                raise ParseError(string, 'Empty statement found', end.location)
+            yield self._parse_statement(string, statement)
+
     def parseString(self, string):
-        return self.factory.build_program(mapl(lambda x: self._parse_statement(string, x),
-                                               self._extract_statements(string,
-                                                                        self._tokenize(string))))
+        return self.factory.build_program(list(self._parse_statements(string)))
+
+    def parseBlock(self, string, offset=0):
+        """Parse a block of complete statements that starts at the given offset of a larger text.
+
+        The offset is passed to the factory (as its ``offset`` attribute) for building locations.
+
+        :param string: block of statements (see :class:`StatementReader`)
+        :param offset: position of the block in the text
+        :return: list of parsed statements (not yet passed to the factory's ``build_program``)
+        :raise ParseError: with its ``position`` relative to the text
+        """
+        self.factory.offset = offset
+        try:
+            return list(self._parse_statements(string))
+        except ParseError as err:
+            err.position += offset
+            raise
+        finally:
+            self.factory.offset = 0
+
+    def parseBlocks(self, blocks, processes=1):
+        """Parse blocks of complete statements (see :meth:`parseBlock`) in order.
+
+        With multiple processes, the blocks are parsed by a pool of worker processes, \
+        while at most two blocks per process are read ahead.
+
+        :param blocks: iterable of tuples of offset and text of a block
+        :param processes: number of worker processes
+        :return: generator of the lists of parsed statements of the blocks
+        """
+        if processes <= 1:
+            for offset, block in blocks:
+                yield self.parseBlock(block, offset)
+            return
+
+        import multiprocessing
+        from collections import deque
+        try:
+            context = multiprocessing.get_context('fork')
+        except ValueError:
+            context = multiprocessing.get_context()
+        pool = context.Pool(processes, initializer=_init_parse_worker, initargs=(self,))
+        try:
+            pending = deque()
+            for offset, block in blocks:
+                pending.append(pool.apply_async(_parse_block, (block, offset)))
+                if len(pending) > 2 * processes:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+        finally:
+            pool.terminate()
 
     def parseFile(self, filename):
         with open(filename) as f:
@@ -825,6 +973,95 @@ class PrologParser(object):
         return ListExpression(string, token, close_char)
 
 
+_worker_parser = None
+
+
+def _init_parse_worker(parser):
+    global _worker_parser
+    _worker_parser = parser
+
+
+def _parse_block(block, offset):
+    return _worker_parser.parseBlock(block, offset)
+
+
+class StatementReader(object):
+    """Read a file in blocks of complete statements.
+
+    The file is read in chunks of ``chunk_size`` characters and split on the terminating \
+    periods of its statements, taking into account quoted atoms, strings and comments.
+
+    :param filename: file to read
+    :param chunk_size: number of characters to read at once
+    :param lines: list to which the positions of the line ends are appended (optional)
+    """
+
+    def __init__(self, filename, chunk_size=1 << 20, lines=None):
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.lines = lines
+        # Whether a negation was found in the head of a statement (or in a query).
+        self.negative_heads = False
+
+    def __iter__(self):
+        """Read the blocks of statements.
+
+        :return: generator of tuples of offset and text of a block; the last block contains the \
+        remainder of the file (including incomplete statements)
+        """
+        lines = self.lines
+        offset = 0
+        buffer = ''
+        scan = 0
+        head = True
+        # Start of the current statement in the buffer.
+        statement = 0
+        with open(self.filename) as f:
+            while True:
+                data = f.read(self.chunk_size)
+                if not data:
+                    if buffer:
+                        yield offset, buffer
+                    if lines is not None:
+                        lines.append(offset + len(buffer))
+                    return
+                if lines is not None:
+                    start = offset + len(buffer)
+                    pos = data.find(NEWLINE)
+                    while pos >= 0:
+                        lines.append(start + pos)
+                        pos = data.find(NEWLINE, pos + 1)
+                buffer += data
+                cut = 0
+                for match in RE_STATEMENT_SCAN.finditer(buffer, scan):
+                    kind = match.lastgroup
+                    if kind is None:
+                        continue
+                    elif kind == 'end':
+                        if head and RE_NOT_OPERATOR.search(buffer, statement, match.start()):
+                            self.negative_heads = True
+                        cut = statement = match.end()
+                        head = True
+                    elif kind == 'neck':
+                        if head and RE_NOT_OPERATOR.search(buffer, statement, match.start()):
+                            self.negative_heads = True
+                        head = False
+                    elif kind == 'neg':
+                        if head:
+                            self.negative_heads = True
+                    else:   # needs more data
+                        scan = match.start()
+                        break
+                else:
+                    scan = len(buffer)
+                if cut:
+                    yield offset, buffer[:cut]
+                    buffer = buffer[cut:]
+                    offset += cut
+                    scan -= cut
+                    statement -= cut
+
+
 def mapl(f, l):
     return list(map(f, l))
 
@@ -985,6 +1222,9 @@ class ParenExpression(SubExpression):
 class Factory(object):
     """Factory object for creating suitable objects from the parse tree."""
 
+    # Position of the parsed text in the complete input (see :meth:`PrologParser.parseBlock`).
+    offset = 0
+
     def build_program(self, clauses):
         return '\n'.join(map(str, clauses))
 
@@ -1051,6 +1291,46 @@ def main(filenames):
         print('====================================')
 
 
+def benchmark(facts=200000, repeat=3, output=sys.stdout):
+    """Measure the parse throughput (in MB/s) on a generated file of probabilistic facts.
+
+    :param facts: number of facts in the generated file
+    :param repeat: number of parses (the fastest one is reported)
+    :param output: output stream for the results
+    """
+    import random
+    import tempfile
+    from problog.program import PrologFactory
+
+    lines = []
+    for i in range(facts):
+        a, b = random.randint(0, facts // 10), random.randint(0, facts // 10)
+        if i % 4 == 0:
+            lines.append('node(n%d).\n' % a)
+        else:
+            lines.append('%.4f::edge(n%d,n%d).\n' % (random.random(), a, b))
+    fd, filename = tempfile.mkstemp(suffix='.pl')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.writelines(lines)
+        size = os.path.getsize(filename) / 1e6
+        print('Parsing %d facts (%.1f MB)' % (facts, size), file=output)
+        for fast_facts in (False, True):
+            parser = PrologParser(PrologFactory())
+            parser.fast_facts = fast_facts
+            best = None
+            for _ in range(repeat):
+                start = time.time()
+                parser.parseFile(filename)
+                duration = time.time() - start
+                if best is None or duration < best:
+                    best = duration
+            print('  %-12s %8.2f MB/s' % ('fast path' if fast_facts else 'full parser', size / best),
+                  file=output)
+    finally:
+        os.remove(filename)
+
+
 DefaultPrologParser = PrologParser
 
 # from .parser_pyparsing import PrologParser as DefaultPrologParser
@@ -27,7 +27,7 @@ from .errors import GroundingError
 from .logic import Term, Var, Constant, AnnotatedDisjunction, Clause, And, Or, Not, AggTerm, list2term
 from .core import transform, ProbLogObject
 
-from .parser import DefaultPrologParser, Factory
+from .parser import DefaultPrologParser, Factory, StatementReader, ParseError
 from .core import ProbLogError
 
 import os
@@ -270,12 +270,31 @@ class PrologString(LogicProgram):
 class PrologFile(PrologString):
     """LogicProgram implementation as a pointer to a Prolog file.
 
+    Large files are read and parsed lazily in chunks on each iteration over the program, \
+    such that the clauses can be processed (e.g. by :class:`ClauseDB`) before the whole file is \
+    read. Files that fit in one chunk are parsed once and kept in memory.
+    The chunks of large files can be parsed by multiple worker processes.
+
     :param filename: filename of the Prolog file (optional)
     :param identifier: index of the file (in case of multiple files)
+    :param processes: number of processes for parsing large files (default: \
+    :attr:`PrologFile.processes`)
     :type filename: string
     """
 
-    def __init__(self, filename, parser=None, factory=None, identifier=0):
+    # Number of characters that are read from the file at once.
+    chunk_size = 1 << 20
+
+    # Number of processes that parse the chunks of large files.
+    processes = 1
+
+    def __init__(self, filename, parser=None, factory=None, identifier=0, processes=None):
+        if processes is not None:
+            self.processes = processes
+        self.__filename = None
+        self.__program = None
+        self.__streaming = None
+        self.__complete = False
         if filename == '-':
             source_root = ''
             source_files = ['-']
@@ -286,12 +305,94 @@ class PrologFile(PrologString):
             source_files = [rootfile]
             try:
                 with open(filename) as f:
-                    source_text = f.read()
+                    source_text = f.read(self.chunk_size + 1)
             except IOError as err:
                 raise ProbLogError(str(err))
+            if len(source_text) > self.chunk_size:
+                self.__filename = filename
+                source_text = ''
         PrologString.__init__(self, source_text, parser=parser, factory=factory,
                               source_root=source_root, source_files=source_files,
                               identifier=identifier)
+        if self.__filename is not None:
+            # The line table is filled while reading the file.
+            self.line_info[0] = [-1]
+
+    def _program(self):
+        if self.__filename is None:
+            return PrologString._program(self)
+        if self.__program is None:
+            self.__program = list(self._stream())
+        return self.__program
+
+    def __iter__(self):
+        if self.__filename is None or self.__program is not None:
+            return iter(self._program())
+        return self._stream()
+
+    def _can_stream(self):
+        """Check whether the program can be built per block of statements.
+
+        Negative head literals in an :class:`ExtendedPrologFactory` rename the other clauses \
+        of their predicate, so the file is scanned for them first.
+        """
+        if self.__streaming is None:
+            build_program = getattr(type(self.parser.factory), 'build_program', None)
+            if build_program is PrologFactory.build_program:
+                self.__streaming = True
+            elif build_program is ExtendedPrologFactory.build_program:
+                reader = StatementReader(self.__filename, self.chunk_size)
+                for _ in reader:
+                    pass
+                self.__streaming = not reader.negative_heads
+            else:
+                self.__streaming = False
+        return self.__streaming
+
+    def _stream(self):
+        """Read and parse the file lazily.
+
+        :return: generator of the clauses in the file
+        """
+        factory = self.parser.factory
+        lines = None
+        if not self.__complete:
+            lines = self.line_info[0]
+            del lines[1:]
+        streaming = self._can_stream()
+        # The factory collects the negative head literals while parsing, so it can only be
+        # used in other processes when the program is streamed.
+        processes = self.processes if streaming else 1
+        statements = []
+        blocks = StatementReader(self.__filename, self.chunk_size, lines)
+        try:
+            for parsed in self.parser.parseBlocks(blocks, processes):
+                if streaming:
+                    for clause in factory.build_program(parsed):
+                        yield clause
+                else:
+                    statements += parsed
+        except ParseError as err:
+            raise self._locate_error(err)
+        self.__complete = True
+        if not streaming:
+            for clause in factory.build_program(statements):
+                yield clause
+
+    def _locate_error(self, err):
+        """Set the location of a parse error in a block to its location in the file."""
+        position = getattr(err, 'position', None)
+        if position is not None:
+            import bisect
+            line_info = self.line_info[0]
+            lineno = bisect.bisect_right(line_info, position)
+            # Columns are counted as in :class:`problog.parser.ParseError`.
+            column = position - line_info[lineno - 1]
+            if lineno == 1:
+                column -= 1
+            err.location = (None, lineno, column)
+            err.message = err._message()
+        return err
 
     def add_clause(self, clause, scope=None):
         """Add a clause to the logic program.
@@ -314,20 +415,25 @@ class PrologFactory(Factory):
     def __init__(self, identifier=0):
         self.loc_id = identifier
 
+    def _location(self, location):
+        if location is None:
+            return self.loc_id, None
+        return self.loc_id, location + self.offset
+
     def build_program(self, clauses):
         return clauses
 
     def build_function(self, functor, arguments, location=None, **extra):
-        return Term(functor, *arguments, location=(self.loc_id, location), **extra)
+        return Term(functor, *arguments, location=self._location(location), **extra)
 
     def build_aggregate(self, functor, arguments, location=None, **extra):
-        return AggTerm(functor, *arguments, location=(self.loc_id, location), **extra)
+        return AggTerm(functor, *arguments, location=self._location(location), **extra)
 
     def build_variable(self, name, location=None):
-        return Var(name, location=(self.loc_id, location))
+        return Var(name, location=self._location(location))
 
     def build_constant(self, value, location=None):
-        return Constant(value, location=(self.loc_id, location))
+        return Constant(value, location=self._location(location))
 
     def build_binop(self, functor, operand1, operand2, function=None, location=None, **extra):
         return self.build_function("'" + functor + "'", (operand1, operand2), location=location, **extra)
@@ -368,7 +474,7 @@ class PrologFactory(Factory):
             # elif len(heads) > 1 and head.probability is None:
             #     raise GroundingError("Non-probabilistic head in multi-head clause '%s'" % head)
         if len(heads) > 1:
-            return AnnotatedDisjunction(heads, operand2, location=(self.loc_id, location))
+            return AnnotatedDisjunction(heads, operand2, location=self._location(location))
         else:
             has_agg = False
             # TODO add tests and errors
@@ -387,21 +493,21 @@ class PrologFactory(Factory):
                 headargs = operand1[0].args[:-1] + (result,)
                 head = operand1[0](*headargs)
                 # aggregate(avg_list, Salary, [Dept], (person(X), salary(X, Salary), dept(X, Dept)), ([Dept], AvgSalary)).
-                return Clause(head, body, location=(self.loc_id, location))
+                return Clause(head, body, location=self._location(location))
             else:
-                return Clause(operand1[0], operand2, location=(self.loc_id, location))
+                return Clause(operand1[0], operand2, location=self._location(location))
 
     # noinspection PyUnusedLocal
     def build_disjunction(self, functor, operand1, operand2, location=None, **extra):
-        return Or(operand1, operand2, location=(self.loc_id, location))
+        return Or(operand1, operand2, location=self._location(location))
 
     # noinspection PyUnusedLocal
     def build_conjunction(self, functor, operand1, operand2, location=None, **extra):
-        return And(operand1, operand2, location=(self.loc_id, location))
+        return And(operand1, operand2, location=self._location(location))
 
     # noinspection PyUnusedLocal
     def build_not(self, functor, operand, location=None, **extra):
-        return Not(functor, operand, location=(self.loc_id, location))
+        return Not(functor, operand, location=self._location(location))
 
     def build_probabilistic(self, operand1, operand2, location=None, **extra):
         operand2.probability = operand1
@@ -25,8 +25,16 @@ from __future__ import print_function
 
 import os
 import sys
-import distutils.spawn
-import distutils.ccompiler
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+try:
+    from shutil import which
+except ImportError:
+    from distutils.spawn import find_executable as which
 
 
 def get_system():
@@ -85,10 +93,17 @@ def gather_info():
 
     system_info['python_version'] = sys.version_info
 
-    # Module pyparsing
+    # Module pyparsing (looked up without importing it)
     try:
-        import pyparsing
-        system_info['pyparsing'] = pyparsing.__version__
+        try:
+            from importlib.metadata import version, PackageNotFoundError
+            try:
+                system_info['pyparsing'] = version('pyparsing')
+            except PackageNotFoundError:
+                pass
+        except ImportError:
+            import pyparsing
+            system_info['pyparsing'] = pyparsing.__version__
     except ImportError:
         pass
 
@@ -101,16 +116,39 @@ def gather_info():
         pass
 
     # DSharp
-    system_info['dsharp'] = distutils.spawn.find_executable('dsharp') is not None
+    system_info['dsharp'] = which('dsharp') is not None
 
     # c2d
-    system_info['c2d'] = distutils.spawn.find_executable('cnf2dDNNF') is not None
+    system_info['c2d'] = which('cnf2dDNNF') is not None
     return system_info
 
+
+class SystemInfo(Mapping):
+    """System information (see :func:`gather_info`) that is gathered on first access."""
+
+    def __init__(self):
+        self.__info = None
+
+    def _info(self):
+        if self.__info is None:
+            self.__info = gather_info()
+        return self.__info
+
+    def __getitem__(self, key):
+        return self._info()[key]
+
+    def __iter__(self):
+        return iter(self._info())
+
+    def __len__(self):
+        return len(self._info())
+
+
 def build_maxsatz():
     if get_system() == 'windows':
         return  # We include the binary
 
+    import distutils.ccompiler
     compiler = distutils.ccompiler.new_compiler()
 
     dest_dir, source_dir = get_binary_paths()
@@ -30,6 +30,7 @@ problog_tasks['mpe'] = 'problog.tasks.mpe'
 problog_tasks['sample'] = 'problog.tasks.sample'
 problog_tasks['ground'] = 'problog.tasks.ground'
 problog_tasks['lfi'] = 'problog.learning.lfi'
+problog_tasks['learn-structure'] = 'problog.learning.structure'
 problog_tasks['explain'] = 'problog.tasks.explain'
 problog_tasks['web'] = 'problog.web.server'
 problog_tasks['dt'] = 'problog.tasks.dtproblog'
@@ -39,6 +40,7 @@ problog_tasks['parse'] = 'problog.parser'
 problog_tasks['map'] = 'problog.tasks.map'
 problog_tasks['time'] = 'problog.tasks.time1'
 problog_tasks['constraint'] = 'problog.tasks.constraint'
+problog_tasks['mcmc'] = 'problog.tasks.mcmc'
 
 problog_default_task = 'prob'
 
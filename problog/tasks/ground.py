@@ -25,7 +25,8 @@ from problog.formula import LogicDAG, LogicFormula, LogicNNF
 from problog.evaluator import SemiringLogProbability
 from problog.parser import DefaultPrologParser
 from problog.program import ExtendedPrologFactory, PrologFile
-from problog.cnf_formula import CNF
+from problog.cnf_formula import CNF, write_dimacs
+from problog.formula_disk import DEFAULT_CACHE_SIZE
 from problog.errors import process_error
 from problog.util import subprocess_check_output, mktempfile
 
@@ -47,6 +48,10 @@ def main(argv, result_handler=None):
     parser.add_argument('--compact', action='store_true',
                         help='allow compact model (may remove some predicates)')
     parser.add_argument('--noninterpretable', action='store_true')
+    parser.add_argument('--disk', action='store_true',
+                        help='store the ground program on disk (in a temporary directory)')
+    parser.add_argument('--disk-cache', type=int, default=DEFAULT_CACHE_SIZE, metavar='N',
+                        help='number of nodes kept in memory with --disk (default: %(default)s)')
     parser.add_argument('--web', action='store_true', help=argparse.SUPPRESS)
     parser.add_argument('--verbose', '-v', action='count', default=0, help='Verbose output')
     parser.add_argument('-o', '--output', type=str, help='output file', default=None)
@@ -90,7 +95,8 @@ def main(argv, result_handler=None):
             keep_order=not args.any_order,
             keep_all=args.keep_all, keep_duplicates=args.keep_duplicates,
             hide_builtins=args.hide_builtins,
-            propagate_evidence=args.propagate_evidence, propagate_weights=semiring, args=args.args)
+            propagate_evidence=args.propagate_evidence, propagate_weights=semiring, args=args.args,
+            disk_storage=args.disk, disk_cache_size=args.disk_cache)
 
         if outformat == 'pl':
             rc = print_result((True, gp.to_prolog()), output=outfile)
@@ -107,7 +113,13 @@ def main(argv, result_handler=None):
             cnfnames = False
             if args.verbose > 0:
                 cnfnames = True
-            rc = print_result((True, CNF.createFrom(gp).to_dimacs(names=cnfnames)), output=outfile)
+            if args.disk and not args.web:
+                # Write the clauses directly instead of building the CNF in memory.
+                write_dimacs(gp, outfile, names=cnfnames)
+                print(file=outfile)
+                rc = 0
+            else:
+                rc = print_result((True, CNF.createFrom(gp).to_dimacs(names=cnfnames)), output=outfile)
         elif outformat == 'internal':
             rc = print_result((True, str(gp)), output=outfile)
         else:
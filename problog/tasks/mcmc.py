@@ -0,0 +1,646 @@
+#! /usr/bin/env python
+"""
+Gibbs sampling for ProbLog
+==========================
+
+Markov Chain Monte Carlo inference on the ground program.
+
+  Concept:
+      The program is grounded once into a LogicFormula.
+      The state of the chain is an assignment to its probabilistic facts, where the choices of an
+      annotated disjunction (ConstraintAD) form a single multi-valued variable.
+      The truth values of all other nodes are derived from this assignment.
+
+      A Gibbs step resamples one variable conditioned on all others.
+      Because the program is deterministic given the facts, the conditional distribution of a
+      variable is its prior restricted to the values that keep the evidence true.
+      Only the evidence nodes that depend on the variable (its Markov blanket) need to be
+      checked, and only the nodes above the variable are recomputed after a change.
+
+  Unlike rejection sampling (see :mod:`problog.tasks.sample`) the cost of a sample does not
+  depend on the probability of the evidence.
+  The chain is not guaranteed to be ergodic when the evidence introduces hard dependencies
+  between facts.  Running multiple chains and inspecting the R-hat diagnostic helps to detect
+  this.
+
+
+Part of the ProbLog distribution.
+
+Copyright 2015 KU Leuven, DTAI Research Group
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import print_function
+
+import heapq
+import logging
+import math
+import random
+import sys
+import time
+import traceback
+
+from ..program import PrologFile
+from ..formula import LogicFormula
+from ..evaluator import SemiringProbability
+from ..errors import process_error, InconsistentEvidenceError
+from ..core import ProbLogError
+from ..util import init_logger, format_dictionary, start_timer, stop_timer
+
+
+_ATOM, _CONJ, _DISJ = 0, 1, 2
+
+
+class GibbsModel(object):
+    """Compact representation of a ground program for Gibbs sampling.
+
+    The representation only consists of lists of integers and floats such that it can be
+    shipped to worker processes.
+
+    :param formula: ground program
+    :type formula: LogicFormula
+    """
+
+    def __init__(self, formula):
+        semiring = SemiringProbability()
+        size = len(formula) + 1
+
+        self.types = [None] * size
+        self.children = [()] * size
+        self.parents = [[] for _ in range(0, size)]
+
+        for i, node, t in formula:
+            if t == 'atom':
+                self.types[i] = _ATOM
+            else:
+                self.types[i] = _CONJ if t == 'conj' else _DISJ
+                self.children[i] = tuple(node.children)
+                for c in node.children:
+                    if c is not None and c != 0:
+                        self.parents[abs(c)].append(i)
+
+        self.query_names = []
+        self.queries = []
+        for name, key in formula.queries():
+            self.query_names.append(name)
+            self.queries.append(key)
+
+        self.evidence = []
+        for name, key in formula.evidence():
+            if formula.is_false(key):
+                raise InconsistentEvidenceError(source=name)
+            elif not formula.is_true(key):
+                self.evidence.append(key)
+
+        self._init_variables(formula, semiring)
+        self._init_components()
+        self._init_blankets()
+
+    def _init_variables(self, formula, semiring):
+        """Create the (multi-valued) variables from facts and annotated disjunctions."""
+        weights = formula.extract_weights(semiring)
+
+        def _prob(key):
+            try:
+                return float(weights[key][0])
+            except (TypeError, ValueError):
+                raise ProbLogError("Gibbs sampling requires numeric probabilities: '%s'"
+                                   % formula.get_node(key).probability)
+
+        self.var_nodes = []     # var -> atoms (value j sets atom j to true)
+        self.var_weights = []   # var -> weight for each value
+        self.var_of_atom = {}
+
+        in_group = set()
+        for constraint in formula.constraints():
+            if hasattr(constraint, 'extra_node') and constraint.is_nontrivial():
+                nodes = sorted(constraint.nodes)
+                if constraint.extra_node is not None:
+                    nodes.append(constraint.extra_node)
+                var = len(self.var_nodes)
+                self.var_nodes.append(tuple(nodes))
+                self.var_weights.append(tuple(_prob(n) for n in nodes))
+                for n in nodes:
+                    self.var_of_atom[n] = var
+                    in_group.add(n)
+
+        for i, t in enumerate(self.types):
+            if t == _ATOM and i not in in_group:
+                pos, neg = weights.get(i, (semiring.one(), semiring.one()))
+                try:
+                    pos, neg = float(pos), float(neg)
+                except (TypeError, ValueError):
+                    raise ProbLogError("Gibbs sampling requires numeric probabilities: '%s'"
+                                       % formula.get_node(i).probability)
+                # Value 0: atom is true, value 1: atom is false.
+                var = len(self.var_nodes)
+                self.var_nodes.append((i,))
+                self.var_weights.append((pos / (pos + neg), neg / (pos + neg)))
+                self.var_of_atom[i] = var
+
+    def _init_components(self):
+        """Compute the strongly connected components of the formula in evaluation order."""
+        size = len(self.types)
+        index = [None] * size
+        lowlink = [0] * size
+        on_stack = [False] * size
+        stack = []
+        components = []
+        counter = 0
+
+        for root in range(1, size):
+            if index[root] is not None:
+                continue
+            work = [(root, 0)]
+            while work:
+                node, pos = work.pop()
+                if pos == 0:
+                    index[node] = lowlink[node] = counter
+                    counter += 1
+                    stack.append(node)
+                    on_stack[node] = True
+                children = self.children[node]
+                recurse = False
+                while pos < len(children):
+                    child = children[pos]
+                    pos += 1
+                    if child is None or child == 0:
+                        continue
+                    child = abs(child)
+                    if index[child] is None:
+                        work.append((node, pos))
+                        work.append((child, 0))
+                        recurse = True
+                        break
+                    elif on_stack[child]:
+                        lowlink[node] = min(lowlink[node], index[child])
+                if recurse:
+                    continue
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+        # Tarjan's algorithm produces components with children before parents.
+        self.components = components
+        self.component_of = [0] * size
+        for c, component in enumerate(components):
+            for n in component:
+                self.component_of[n] = c
+        self.cyclic = []
+        for component in components:
+            n = component[0]
+            self.cyclic.append(len(component) > 1 or
+                               any(c is not None and abs(c) == n for c in self.children[n]))
+        self.component_parents = []
+        for c, component in enumerate(components):
+            parents = set()
+            for n in component:
+                for p in self.parents[n]:
+                    if self.component_of[p] != c:
+                        parents.add(self.component_of[p])
+            self.component_parents.append(tuple(parents))
+
+    def _descendants(self, keys):
+        result = set()
+        queue = [abs(k) for k in keys if k is not None and k != 0]
+        while queue:
+            n = queue.pop()
+            if n not in result:
+                result.add(n)
+                queue.extend(abs(c) for c in self.children[n] if c is not None and c != 0)
+        return result
+
+    def _init_blankets(self):
+        """Determine relevant variables and the evidence that depends on each variable."""
+        relevant = self._descendants(self.queries + self.evidence)
+        self.relevant_vars = sorted(set(self.var_of_atom[n] for n in relevant
+                                        if n in self.var_of_atom))
+        self.var_evidence = [[] for _ in self.var_nodes]
+        for e, key in enumerate(self.evidence):
+            for var in set(self.var_of_atom[n] for n in self._descendants([key])
+                           if n in self.var_of_atom):
+                self.var_evidence[var].append(e)
+
+
+class GibbsChain(object):
+    """A single Markov chain over the variables of a :class:`GibbsModel`.
+
+    :param model: model to sample from
+    :type model: GibbsModel
+    :param rng: random number generator
+    :type rng: random.Random
+    """
+
+    def __init__(self, model, rng):
+        self.model = model
+        self.rng = rng
+        self.state = [0] * len(model.var_nodes)
+        self.values = [False] * len(model.types)
+
+    def literal(self, key):
+        """Truth value of the given literal in the current state."""
+        if key == 0:
+            return True
+        elif key is None:
+            return False
+        elif key > 0:
+            return self.values[key]
+        else:
+            return not self.values[-key]
+
+    def _evaluate(self, node):
+        t = self.model.types[node]
+        if t == _CONJ:
+            return all(self.literal(c) for c in self.model.children[node])
+        elif t == _DISJ:
+            return any(self.literal(c) for c in self.model.children[node])
+        else:
+            return self.values[node]
+
+    def _update_component(self, c):
+        """Recompute the nodes of the given component.
+
+        :return: True if one of the nodes changed value
+        """
+        values = self.values
+        component = self.model.components[c]
+        if not self.model.cyclic[c]:
+            n = component[0]
+            if self.model.types[n] == _ATOM:
+                return False
+            v = self._evaluate(n)
+            if v != values[n]:
+                values[n] = v
+                return True
+            return False
+        else:
+            # Least fixpoint of the cycle given the values outside of it.
+            old = [values[n] for n in component]
+            for n in component:
+                values[n] = False
+            changed = True
+            while changed:
+                changed = False
+                for n in component:
+                    if not values[n] and self._evaluate(n):
+                        values[n] = True
+                        changed = True
+            return old != [values[n] for n in component]
+
+    def _set_atoms(self, var, value):
+        """Assign the given value to a variable without propagation.
+
+        :return: list of atoms that changed value
+        """
+        self.state[var] = value
+        nodes = self.model.var_nodes[var]
+        changed = []
+        if len(nodes) == 1:
+            v = value == 0
+            if self.values[nodes[0]] != v:
+                self.values[nodes[0]] = v
+                changed.append(nodes[0])
+        else:
+            for j, n in enumerate(nodes):
+                v = j == value
+                if self.values[n] != v:
+                    self.values[n] = v
+                    changed.append(n)
+        return changed
+
+    def _propagate(self, atoms):
+        """Incrementally recompute all nodes that depend on the given atoms."""
+        model = self.model
+        heap = []
+        queued = set()
+        for n in atoms:
+            for c in model.component_parents[model.component_of[n]]:
+                if c not in queued:
+                    queued.add(c)
+                    heapq.heappush(heap, c)
+        while heap:
+            c = heapq.heappop(heap)
+            if self._update_component(c):
+                for p in model.component_parents[c]:
+                    if p not in queued:
+                        queued.add(p)
+                        heapq.heappush(heap, p)
+            queued.discard(c)
+
+    def set_value(self, var, value):
+        """Assign a value to a variable and propagate the change."""
+        self._propagate(self._set_atoms(var, value))
+
+    def _sample_prior(self, var):
+        weights = self.model.var_weights[var]
+        r = self.rng.random() * sum(weights)
+        for j, w in enumerate(weights):
+            r -= w
+            if r < 0:
+                return j
+        return len(weights) - 1
+
+    def _violations(self, evidence=None):
+        if evidence is None:
+            evidence = range(0, len(self.model.evidence))
+        return [e for e in evidence if not self.literal(self.model.evidence[e])]
+
+    def initialize(self, max_steps=10000, noise=0.2):
+        """Find an initial state that satisfies the evidence.
+
+        Starts from a sample of the prior and then performs a stochastic local search
+        on the violated evidence.
+
+        :param max_steps: maximal number of local search steps
+        :param noise: probability of a random move
+        :raise InconsistentEvidenceError: no consistent state was found
+        """
+        model = self.model
+        for var in range(0, len(model.var_nodes)):
+            self._set_atoms(var, self._sample_prior(var))
+        for c in range(0, len(model.components)):
+            self._update_component(c)
+
+        evidence_vars = [[] for _ in model.evidence]
+        for var in model.relevant_vars:
+            for e in model.var_evidence[var]:
+                evidence_vars[e].append(var)
+
+        violated = self._violations()
+        steps = 0
+        while violated:
+            if steps >= max_steps:
+                raise InconsistentEvidenceError(
+                    context=' (no state consistent with the evidence found after %s steps)'
+                            % max_steps)
+            steps += 1
+            candidates = evidence_vars[self.rng.choice(violated)]
+            if not candidates:
+                raise InconsistentEvidenceError()
+            var = self.rng.choice(candidates)
+            values = [j for j, w in enumerate(model.var_weights[var]) if w > 0]
+            if self.rng.random() < noise:
+                self.set_value(var, self.rng.choice(values))
+            else:
+                best = None
+                for j in values:
+                    self.set_value(var, j)
+                    score = len(self._violations())
+                    if best is None or score < best[0]:
+                        best = (score, [j])
+                    elif score == best[0]:
+                        best[1].append(j)
+                self.set_value(var, self.rng.choice(best[1]))
+            violated = self._violations()
+
+    def step(self, var):
+        """Resample a single variable conditioned on all other variables."""
+        model = self.model
+        current = self.state[var]
+        blanket = model.var_evidence[var]
+        scores = []
+        for j, w in enumerate(model.var_weights[var]):
+            if w <= 0:
+                scores.append(0.0)
+            elif j == current or not blanket:
+                scores.append(w)
+            else:
+                self.set_value(var, j)
+                scores.append(0.0 if self._violations(blanket) else w)
+        r = self.rng.random() * sum(scores)
+        value = current
+        for j, s in enumerate(scores):
+            r -= s
+            if r < 0:
+                value = j
+                break
+        if value != self.state[var]:
+            self.set_value(var, value)
+
+    def sweep(self):
+        """Resample every relevant variable once (in random order)."""
+        variables = self.model.relevant_vars[:]
+        self.rng.shuffle(variables)
+        for var in variables:
+            self.step(var)
+
+
+def run_chain(model, samples, burnin=100, thin=1, seed=None, max_init_steps=10000):
+    """Run a single Gibbs chain.
+
+    :param model: model to sample from
+    :type model: GibbsModel
+    :param samples: number of samples to collect
+    :param burnin: number of sweeps to discard at the start of the chain
+    :param thin: number of sweeps between collected samples
+    :param seed: seed for the chain's random number generator
+    :param max_init_steps: maximal number of steps for finding an initial state
+    :return: number of samples in which each query was true
+    :rtype: list[int]
+    """
+    chain = GibbsChain(model, random.Random(seed))
+    chain.initialize(max_steps=max_init_steps)
+    for _ in range(0, burnin):
+        chain.sweep()
+    counts = [0] * len(model.queries)
+    for _ in range(0, samples):
+        for _ in range(0, thin):
+            chain.sweep()
+        for q, key in enumerate(model.queries):
+            if chain.literal(key):
+                counts[q] += 1
+    return counts
+
+
+def _run_chain(args):
+    return run_chain(*args)
+
+
+def rhat(counts, samples):
+    """Gelman-Rubin potential scale reduction factor for a binary query.
+
+    :param counts: number of samples in which the query was true, for each chain
+    :param samples: number of samples per chain
+    :return: R-hat (1.0 when all chains agree, inf when chains are stuck in different states)
+    :rtype: float
+    """
+    m = len(counts)
+    n = samples
+    if m < 2 or n < 2:
+        return float('nan')
+    means = [float(c) / n for c in counts]
+    mean = sum(means) / m
+    between = n * sum((x - mean) ** 2 for x in means) / (m - 1)
+    within = sum(n * x * (1.0 - x) / (n - 1) for x in means) / m
+    if within == 0:
+        return 1.0 if between == 0 else float('inf')
+    var = (n - 1.0) / n * within + between / n
+    return math.sqrt(var / within)
+
+
+def mcmc(model, samples=1000, burnin=100, thin=1, chains=4, processes=1, seed=None,
+         max_init_steps=10000, **kwdargs):
+    """Estimate the marginal probabilities of the queries given the evidence by Gibbs sampling.
+
+    :param model: model to sample from
+    :type model: LogicProgram
+    :param samples: number of samples per chain
+    :param burnin: number of initial sweeps to discard per chain
+    :param thin: number of sweeps between samples
+    :param chains: number of independent chains
+    :param processes: number of worker processes that run the chains
+    :param seed: random seed
+    :param max_init_steps: maximal number of steps for finding an initial state
+    :param kwdargs: additional arguments for grounding
+    :return: tuple (probabilities, R-hat per query)
+    :rtype: tuple[dict[Term, float], dict[Term, float]]
+    """
+    logger = logging.getLogger('problog_mcmc')
+    formula = LogicFormula.create_from(model, label_all=True, propagate_evidence=True, **kwdargs)
+    gibbs = GibbsModel(formula)
+    logger.info('Variables: %s (relevant: %s)' % (len(gibbs.var_nodes), len(gibbs.relevant_vars)))
+
+    rng = random.Random(seed)
+    tasks = [(gibbs, samples, burnin, thin, rng.randint(0, 2 ** 31 - 1), max_init_steps)
+             for _ in range(0, chains)]
+    if processes > 1 and chains > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(min(processes, chains))
+        try:
+            results = pool.map(_run_chain, tasks)
+        finally:
+            pool.terminate()
+    else:
+        results = list(map(_run_chain, tasks))
+
+    total = samples * chains
+    probabilities = {}
+    diagnostics = {}
+    for q, name in enumerate(gibbs.query_names):
+        counts = [r[q] for r in results]
+        probabilities[name] = float(sum(counts)) / total if total else 0.0
+        diagnostics[name] = rhat(counts, samples)
+    return probabilities, diagnostics
+
+
+def print_result(d, output, precision=8):
+    success, d = d
+    if success:
+        probabilities, diagnostics, info = d
+        print ('%% %s' % info, file=output)
+        print (format_dictionary(probabilities, precision), file=output)
+        print ('% R-hat:', file=output)
+        print (format_dictionary(diagnostics, precision), file=output)
+        return 0
+    else:
+        print (process_error(d), file=output)
+        return 1
+
+
+def print_result_json(d, output, precision=8):
+    import json
+    success, d = d
+    if success:
+        probabilities, diagnostics, info = d
+        result = {'SUCCESS': True,
+                  'probs': [[str(n), round(p, precision), diagnostics[n]]
+                            for n, p in probabilities.items()],
+                  'info': info}
+    else:
+        result = {'SUCCESS': False, 'err': process_error(d)}
+    print (json.dumps(result), file=output)
+    return 0
+
+
+def argparser():
+    import argparse
+    parser = argparse.ArgumentParser(description="Gibbs sampling for ProbLog")
+    parser.add_argument('filename')
+    parser.add_argument('-N', '-n', type=int, dest='samples', default=1000,
+                        help="Number of samples per chain (default: 1000).")
+    parser.add_argument('--burnin', type=int, default=100,
+                        help="Number of initial sweeps to discard (default: 100).")
+    parser.add_argument('--thin', type=int, default=1,
+                        help="Number of sweeps between samples (default: 1).")
+    parser.add_argument('--chains', type=int, default=4,
+                        help="Number of independent chains (default: 4).")
+    parser.add_argument('--processes', '-p', type=int, default=1,
+                        help="Number of worker processes.")
+    parser.add_argument('--max-init-steps', type=int, default=10000,
+                        help="Maximal number of steps for finding an initial state.")
+    parser.add_argument('--seed', '-s', type=int, default=None, help='Random seed')
+    parser.add_argument('--timeout', '-t', type=int, default=0,
+                        help="Set timeout (in seconds, default=off).")
+    parser.add_argument('--output', '-o', type=str, default=None, help="Filename of output file.")
+    parser.add_argument('--web', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--verbose', '-v', action='count', help='Verbose output')
+    parser.add_argument('-a', '--arg', dest='args', action='append',
+                        help='Pass additional arguments to the cmd_args builtin.')
+    return parser
+
+
+def main(argv, result_handler=None):
+    args = argparser().parse_args(argv)
+
+    init_logger(args.verbose, 'problog_mcmc')
+
+    if result_handler is None:
+        if args.web:
+            result_handler = print_result_json
+        else:
+            result_handler = print_result
+
+    if args.output is None:
+        outf = sys.stdout
+    else:
+        outf = open(args.output, 'w')
+
+    if args.timeout:
+        start_timer(args.timeout)
+
+    try:
+        start_time = time.time()
+        probabilities, diagnostics = mcmc(PrologFile(args.filename), samples=args.samples,
+                                          burnin=args.burnin, thin=args.thin,
+                                          chains=args.chains, processes=args.processes,
+                                          seed=args.seed, max_init_steps=args.max_init_steps,
+                                          args=args.args)
+        info = 'Gibbs estimate after %d samples in %d chains (%.4fs)' \
+               % (args.samples * args.chains, args.chains, time.time() - start_time)
+        retcode = result_handler((True, (probabilities, diagnostics, info)), output=outf)
+    except Exception as err:
+        err.trace = traceback.format_exc()
+        retcode = result_handler((False, err), output=outf)
+
+    if args.timeout:
+        stop_timer()
+
+    if args.output is not None:
+        outf.close()
+
+    if retcode:
+        sys.exit(retcode)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
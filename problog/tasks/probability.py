@@ -82,7 +82,8 @@ def print_result_json(d, output, precision=8):
     return 0
 
 
-def execute(filename, knowledge=None, semiring=None, combine=False, profile=False, trace=False, **kwdargs):
+def execute(filename, knowledge=None, semiring=None, combine=False, profile=False, trace=False,
+            parse_processes=None, **kwdargs):
     """Run ProbLog.
 
     :param filename: input file
@@ -91,6 +92,8 @@ def execute(filename, knowledge=None, semiring=None, combine=False, profile=Fals
     :param parse_class: prolog parser to use
     :param debug: enable advanced error output
     :param engine_debug: enable engine debugging output
+    :param parse_processes: number of processes for parsing large files (default: \
+    :attr:`PrologFile.processes`)
     :param kwdargs: additional arguments
     :return: tuple where first value indicates success, and second value contains result details
     """
@@ -100,13 +103,13 @@ def execute(filename, knowledge=None, semiring=None, combine=False, profile=Fals
             if combine:
                 model = SimpleProgram()
                 for i, fn in enumerate(filename):
-                    filemodel = PrologFile(fn)
+                    filemodel = PrologFile(fn, processes=parse_processes)
                     for line in filemodel:
                         model += line
                     if i == 0:
                         model.source_root = filemodel.source_root
             else:
-                model = PrologFile(filename)
+                model = PrologFile(filename, processes=parse_processes)
             if profile or trace:
                 from problog.debug import EngineTracer
                 profiler = EngineTracer(keep_trace=trace)
@@ -223,6 +226,8 @@ def argparser():
     parser.add_argument('--profile-level', type=int, default=0)
     parser.add_argument('--format', choices=['text', 'prolog'])
     parser.add_argument('-L', '--library', action='append', help='Add to ProbLog library search path')
+    parser.add_argument('--parse-processes', type=int, default=1,
+                        help='number of processes for parsing large model files (default: 1)')
 
     # Additional arguments (passed through)
     parser.add_argument('--engine-debug', action='store_true', help=argparse.SUPPRESS)
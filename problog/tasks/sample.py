@@ -47,16 +47,20 @@ from problog.logic import Term, Constant, ArithmeticError, term2list, list2term
 from problog.engine import DefaultEngine, UnknownClause, UnknownClauseInternal
 from problog.engine_builtin import check_mode, builtin_simple
 from problog.formula import LogicFormula
-from problog.errors import process_error, GroundingError
+from problog.errors import process_error, GroundingError, InstallError
 from problog.util import start_timer, stop_timer, format_dictionary, init_logger
 from problog.engine_unify import UnifyError, unify_value
 import random
 import math
 import signal
+import struct
 import time
+import tempfile
 import traceback
 import logging
 
+from collections import OrderedDict
+
 try:
     from tqdm import tqdm
 except ImportError:
@@ -140,15 +144,146 @@ class FunctionStore(object):
         return _function
 
 
+class DistributionBuffers(object):
+    """Pre-drawn values for continuous distributions.
+
+    Values are drawn with NumPy in blocks of ``size`` and consumed one at a time from a ring
+    buffer, which is refilled when exhausted.
+    Location-scale families (normal, uniform, exponential, triangular) share one buffer of
+    standard draws.  The other families have a buffer per parameter set, which starts with a
+    single value and doubles on each refill (up to ``size``), such that parameter sets that are
+    used only a few times do not waste draws.  Only the ``max_buffers`` most recently used
+    parameter sets keep a buffer.
+
+    :param seed: seed for the NumPy random generator (default: drawn from :mod:`random`)
+    :param size: number of values drawn at once
+    :param exclude: names of distributions that should not be buffered
+    :param max_buffers: maximal number of buffers for parametrized distributions
+    """
+
+    _standard = {
+        'normal': 'normal',
+        'gaussian': 'normal',
+        'uniform': 'uniform',
+        'exponential': 'exponential',
+        'triangular': 'uniform'
+    }
+
+    _parametrized = ('poisson', 'beta', 'gamma', 'vonmises', 'weibull', 'in_range')
+
+    def __init__(self, seed=None, size=4096, exclude=(), max_buffers=256):
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.generator = numpy.random.default_rng(seed)
+        self.size = size
+        self.exclude = set(exclude)
+        self.max_buffers = max_buffers
+        self._standard_buffers = {}
+        self._buffers = OrderedDict()
+
+    def supports(self, functor):
+        """Check whether values for the given distribution are buffered."""
+        if functor in self.exclude:
+            return False
+        return functor in self._standard or functor in self._parametrized
+
+    def _fill(self, key, n):
+        g = self.generator
+        family, args = key
+        if family == 'normal':
+            return g.standard_normal(n)
+        elif family == 'uniform':
+            return g.random(n)
+        elif family == 'exponential':
+            return g.standard_exponential(n)
+        elif family == 'poisson':
+            return g.poisson(args[0], n)
+        elif family == 'beta':
+            return g.beta(args[0], args[1], n)
+        elif family == 'gamma':
+            return g.gamma(args[0], args[1], n)
+        elif family == 'vonmises':
+            # Same range as random.vonmisesvariate: [0, 2 * pi)
+            return numpy.mod(g.vonmises(args[0], args[1], n), 2 * math.pi)
+        elif family == 'weibull':
+            return args[0] * g.weibull(args[1], n)
+        elif family == 'in_range':
+            return g.integers(int(args[0]), int(args[1]) + 1, n)
+        else:
+            raise ValueError("Unknown distribution: '%s'" % family)
+
+    def _next_standard(self, family):
+        buffer = self._standard_buffers.get(family)
+        if buffer is None or buffer[1] >= len(buffer[0]):
+            buffer = [self._fill((family, ()), self.size).tolist(), 0]
+            self._standard_buffers[family] = buffer
+        value = buffer[0][buffer[1]]
+        buffer[1] += 1
+        return value
+
+    def _next(self, key):
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = [[], 0]
+            self._buffers[key] = buffer
+            if len(self._buffers) > self.max_buffers:
+                self._buffers.popitem(last=False)
+        else:
+            self._buffers.move_to_end(key)
+        if buffer[1] >= len(buffer[0]):
+            buffer[0] = self._fill(key, min(self.size, max(1, 2 * len(buffer[0])))).tolist()
+            buffer[1] = 0
+        value = buffer[0][buffer[1]]
+        buffer[1] += 1
+        return value
+
+    def draw(self, functor, args):
+        """Draw a value from the given distribution.
+
+        The parameters follow the conventions of the corresponding functions in :mod:`random`.
+
+        :param functor: name of the distribution
+        :param args: parameters of the distribution (floats)
+        :return: sampled value
+        """
+        standard = self._standard.get(functor)
+        if standard is None:
+            return self._next((functor, tuple(args)))
+        x = self._next_standard(standard)
+        if standard == 'normal':
+            return args[0] + args[1] * x
+        elif functor == 'uniform':
+            return args[0] + (args[1] - args[0]) * x
+        elif functor == 'exponential':
+            return x / args[0]
+        else:
+            # triangular(low, high, mode) by inversion
+            low, high = args[0], args[1]
+            if len(args) > 2:
+                mode = args[2]
+            else:
+                mode = (low + high) / 2.0
+            if high == low:
+                return low
+            c = (mode - low) / (high - low)
+            if x < c:
+                return low + math.sqrt(x * (high - low) * (mode - low))
+            else:
+                return high - math.sqrt((1.0 - x) * (high - low) * (high - mode))
+
+
 class SampledFormula(LogicFormula):
 
-    def __init__(self, **kwargs):
+    def __init__(self, draws=None, **kwargs):
         LogicFormula.__init__(self, **kwargs)
         self.facts = {}
         self.groups = {}
         self.probability = 1.0  # Try to compute
         self.values = []
 
+        # Buffered draws for continuous distributions (see DistributionBuffers).
+        self.draws = draws
+
         self.distributions = {
             'normal': random.normalvariate,
             'gaussian': random.normalvariate,
@@ -174,8 +309,11 @@ class SampledFormula(LogicFormula):
         if term.functor == 'fixed':
             return term.args[0], 1.0
         elif term.functor in self.distributions:
-            args = map(float, term.args)
-            value = self.distributions[term.functor](*args)
+            args = list(map(float, term.args))
+            if self.draws is not None and self.draws.supports(term.functor):
+                value = self.draws.draw(term.functor, args)
+            else:
+                value = self.distributions[term.functor](*args)
             return Constant(value), 0.0
         else:
             raise ValueError("Unknown distribution: '%s'" % term.functor)
@@ -344,6 +482,22 @@ class SampledFormula(LogicFormula):
                 result[k] = False
         return result
 
+    def query_row(self, columns):
+        """Truth values of the queries as a row of bytes (1 for true, 0 for false).
+
+        Queries with a sampled value (continuous facts) are reported as true.
+
+        :param columns: mapping of query term to column index (other queries are ignored)
+        :type columns: dict[Term, int]
+        :rtype: bytearray
+        """
+        row = bytearray(len(columns))
+        for k, v in self.queries():
+            index = columns.get(k)
+            if index is not None and v is not None:
+                row[index] = 1
+        return row
+
 
 def translate(db, atom_id):
     if type(atom_id) == tuple:
@@ -473,6 +627,16 @@ def init_db(engine, model, propagate_evidence=False):
     return db, evidence_facts, ev_target
 
 
+def create_draws(**kwdargs):
+    """Create buffers for continuous distributions (None if NumPy is not available).
+
+    The buffers are seeded from :mod:`random` such that seeding it makes sampling reproducible.
+    """
+    if numpy is None:
+        return None
+    return DistributionBuffers(**kwdargs)
+
+
 class RateCounter(object):
 
     def __init__(self):
@@ -492,9 +656,14 @@ class RateCounter(object):
         self.rate.update(1)
 
 
-def sample(model, n=1, format='str', propagate_evidence=False, distributions=None, progress=False, **kwdargs):
+def _generate_samples(model, n, propagate_evidence, distributions, progress, kwdargs):
+    """Generate the accepted samples of the model one at a time.
+
+    :return: generator of tuples (prepared database, sample)
+    """
     engine = init_engine(**kwdargs)
     db, evidence, ev_target = init_db(engine, model, propagate_evidence)
+    draws = create_draws(exclude=distributions or ())
     i = 0
     r = 0
 
@@ -503,7 +672,7 @@ def sample(model, n=1, format='str', propagate_evidence=False, distributions=Non
 
     try:
         while i < n or n == 0:
-            target = SampledFormula()
+            target = SampledFormula(draws=draws)
             if distributions is not None:
                 target.distributions.update(distributions)
 
@@ -512,23 +681,76 @@ def sample(model, n=1, format='str', propagate_evidence=False, distributions=Non
 
             engine.functions = FunctionStore(target=target, database=db, engine=engine)
             result = ground(engine, db, target=target)
-            if verify_evidence(engine, db, ev_target, target):
-                if format == 'str':
-                    yield result.to_string(db, **kwdargs)
-                else:
-                    yield result.to_dict()
-                i += 1
-            else:
-                r += 1
+            accepted = verify_evidence(engine, db, ev_target, target)
             engine.previous_result = result
             if progress:
                 rate.update()
+            if accepted:
+                i += 1
+                yield db, result
+            else:
+                r += 1
     except KeyboardInterrupt:
         pass
     if r:
         logging.getLogger('problog_sample').info('Rejected samples: %s' % r)
 
 
+def _format_sample(result, db, format, kwdargs):
+    if format == 'str':
+        return result.to_string(db, **kwdargs)
+    elif format == 'formula':
+        return result
+    else:
+        return result.to_dict()
+
+
+def sample_batches(model, n=1, format='str', propagate_evidence=False, distributions=None,
+                   progress=False, batch_size=100, **kwdargs):
+    """Generate samples from the model in batches.
+
+    :param model: model to sample from
+    :param n: number of samples (0 for no limit)
+    :param format: output format of a sample: 'str', 'dict' or 'formula' (the SampledFormula)
+    :param propagate_evidence: use evidence propagation
+    :param distributions: additional distributions for continuous facts
+    :param progress: show progress
+    :param batch_size: maximal number of samples per batch
+    :param kwdargs: additional arguments for the engine and for formatting
+    :return: generator of lists of samples
+    """
+    if n:
+        batch_size = min(batch_size, n)
+    batch_size = max(1, batch_size)
+
+    def _format(results):
+        return [_format_sample(result, db, format, kwdargs) for result in results]
+
+    db = None
+    batch = []
+    for db, result in _generate_samples(model, n, propagate_evidence, distributions, progress,
+                                        kwdargs):
+        batch.append(result)
+        if len(batch) >= batch_size:
+            yield _format(batch)
+            batch = []
+    if batch:
+        yield _format(batch)
+
+
+def sample(model, n=1, format='str', propagate_evidence=False, distributions=None, progress=False,
+           **kwdargs):
+    """Generate samples from the model.
+
+    Each sample is yielded as soon as it is drawn.
+
+    :return: generator of samples
+    """
+    for db, result in _generate_samples(model, n, propagate_evidence, distributions, progress,
+                                        kwdargs):
+        yield _format_sample(result, db, format, kwdargs)
+
+
 def verify_evidence(engine, db, ev_target, q_target):
 
     if ev_target is None:
@@ -615,47 +837,462 @@ def verify_evidence(engine, db, ev_target, q_target):
         return True
 
 
+def _sample_estimate_batch(engine, db, evidence, ev_target, size, draws=None):
+    """Draw a batch of samples and count for each query how often it is true.
+
+    :param engine: sampling engine (see :func:`init_engine`)
+    :param db: prepared database
+    :param evidence: evidence facts obtained through evidence propagation
+    :param ev_target: formula used for verifying evidence (or None)
+    :param size: number of samples to draw (including rejected samples)
+    :param draws: buffers for continuous distributions
+    :return: tuple (counts, accepted, rejected)
+    :rtype: tuple[dict[Term, int], int, int]
+    """
+    counts = {}
+    accepted = 0
+    rejected = 0
+    for _ in range(0, size):
+        target = SampledFormula(draws=draws)
+        for ev_fact in evidence:
+            target.add_atom(*ev_fact)
+
+        result = ground(engine, db, target=target)
+        if verify_evidence(engine, db, ev_target, target):
+            for k, v in result.queries():
+                if v == 0:
+                    counts[k] = counts.get(k, 0) + 1
+                else:
+                    counts.setdefault(k, 0)
+            accepted += 1
+        else:
+            rejected += 1
+        engine.previous_result = result
+    return counts, accepted, rejected
+
+
+def _estimate_worker(model, seed, quota, batch_size, propagate_evidence, kwdargs, queue, stop):
+    """Worker process for :func:`estimate`.
+
+    Sends batches of counts to the parent process until it accepted ``quota`` samples \
+    (0 for no limit) or the stop event is set.
+    A final ``None`` on the queue signals that the worker has finished.
+    """
+    try:
+        random.seed(seed)
+        engine = init_engine(**kwdargs)
+        db, evidence, ev_target = init_db(engine, model, propagate_evidence)
+        draws = create_draws()
+        accepted = 0
+        while not stop.is_set() and not (quota and accepted >= quota):
+            if quota:
+                size = min(batch_size, quota - accepted)
+            else:
+                size = batch_size
+            result = _sample_estimate_batch(engine, db, evidence, ev_target, size, draws)
+            accepted += result[1]
+            queue.put(result)
+    except KeyboardInterrupt:
+        pass
+    except Exception as err:
+        queue.put(err)
+    finally:
+        queue.put(None)
+
+
+def _normal_quantile(q):
+    """Compute the q-quantile of the standard normal distribution (by bisection on erf)."""
+    lo, hi = -10.0, 10.0
+    while hi - lo > 1e-10:
+        mid = (lo + hi) / 2
+        if 0.5 * (1.0 + math.erf(mid / math.sqrt(2.0))) < q:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
+class EstimateCounter(object):
+    """Aggregates query counts for sample based probability estimation.
+
+    :param delta: confidence parameter (intervals hold with probability 1 - delta)
+    :param interval: type of confidence interval: 'wilson' or 'hoeffding'
+    """
+
+    def __init__(self, delta=0.05, interval='wilson'):
+        if interval not in ('wilson', 'hoeffding'):
+            raise ValueError("Unknown confidence interval: '%s'" % interval)
+        self.counts = {}
+        self.samples = 0
+        self.rejected = 0
+        self.delta = delta
+        self.interval = interval
+        self._z = _normal_quantile(1.0 - delta / 2)
+
+    def update(self, counts, accepted, rejected):
+        for k, v in counts.items():
+            self.counts[k] = self.counts.get(k, 0) + v
+        self.samples += accepted
+        self.rejected += rejected
+
+    def estimates(self):
+        """Current probability estimates of the queries.
+
+        :rtype: dict[Term, float]
+        """
+        if not self.samples:
+            return {k: 0.0 for k in self.counts}
+        return {k: float(v) / self.samples for k, v in self.counts.items()}
+
+    def error(self, count):
+        """Half-width of the confidence interval for a query that was true in count samples.
+
+        :param count: number of samples in which the query was true
+        :return: half-width of the interval (inf if no samples were drawn)
+        :rtype: float
+        """
+        n = self.samples
+        if n == 0:
+            return float('inf')
+        if self.interval == 'hoeffding':
+            return math.sqrt(math.log(2.0 / self.delta) / (2.0 * n))
+        else:
+            z = self._z
+            p = float(count) / n
+            return z / (1.0 + z * z / n) * math.sqrt(p * (1.0 - p) / n + z * z / (4.0 * n * n))
+
+    def max_error(self):
+        """Largest half-width of the confidence intervals over all queries."""
+        if not self.counts:
+            return self.error(0)
+        return max(self.error(c) for c in self.counts.values())
+
+    def converged(self, epsilon):
+        """Check whether all confidence intervals have a half-width below epsilon."""
+        return self.samples > 0 and self.max_error() <= epsilon
+
+
 # noinspection PyUnusedLocal
-def estimate(model, n=0, propagate_evidence=False, **kwdargs):
-    from collections import defaultdict
+def estimate(model, n=0, propagate_evidence=False, epsilon=None, delta=0.05, interval='wilson',
+             processes=1, batch_size=100, **kwdargs):
+    """Estimate the probability of the queries by sampling.
+
+    Sampling stops when one of the following conditions holds:
+
+        * ``n`` samples were accepted (if n > 0);
+        * the confidence interval of every query has a half-width of at most ``epsilon``
+          (if epsilon is given);
+        * the process is interrupted (CTRL-C, timeout or TERM signal).
+
+    :param model: model to sample from
+    :param n: number of samples (0 for no limit)
+    :param propagate_evidence: use evidence propagation
+    :param epsilon: target half-width of the confidence intervals (None to disable)
+    :param delta: confidence parameter of the intervals (confidence level is 1 - delta)
+    :param interval: type of confidence interval: 'wilson' or 'hoeffding'
+    :param processes: number of worker processes
+    :param batch_size: number of samples drawn between convergence checks
+    :param kwdargs: additional arguments for the engine
+    :return: probability estimates for the queries
+    :rtype: dict[Term, float]
+    """
+    counter = EstimateCounter(delta=delta, interval=interval)
+    if n:
+        batch_size = max(1, min(batch_size, n))
 
-    engine = init_engine(**kwdargs)
-    db, evidence, ev_target = init_db(engine, model, propagate_evidence)
+    def _done():
+        if n and counter.samples >= n:
+            return True
+        return epsilon is not None and counter.converged(epsilon)
 
     start_time = time.time()
-    estimates = defaultdict(float)
-    counts = 0.0
-    r = 0
     try:
-        while n == 0 or counts < n:
-            target = SampledFormula()
-            for ev_fact in evidence:
-                target.add_atom(*ev_fact)
-
-            result = ground(engine, db, target=target)
-            if verify_evidence(engine, db, ev_target, target):
-                for k, v in result.queries():
-                    if v == 0:
-                        estimates[k] += 1.0
-                counts += 1.0
-            else:
-                r += 1
-            engine.previous_result = result
+        if processes > 1:
+            _estimate_parallel(model, counter, _done, n, processes, batch_size,
+                               propagate_evidence, kwdargs)
+        else:
+            engine = init_engine(**kwdargs)
+            db, evidence, ev_target = init_db(engine, model, propagate_evidence)
+            draws = create_draws()
+            while not _done():
+                if n:
+                    size = min(batch_size, n - counter.samples)
+                else:
+                    size = batch_size
+                counter.update(*_sample_estimate_batch(engine, db, evidence, ev_target, size,
+                                                       draws))
     except KeyboardInterrupt:
         pass
     except SystemExit:
         pass
 
     total_time = time.time() - start_time
-    rate = counts / total_time
-    print ('%% Probability estimate after %d samples (%.4f samples/second):' % (counts, rate))
+    if total_time > 0:
+        rate = counter.samples / total_time
+    else:
+        rate = 0.0
+    print ('%% Probability estimate after %d samples (%.4f samples/second, %.4fs):'
+           % (counter.samples, rate, total_time))
+    if epsilon is not None:
+        print ('%% Maximal %s interval half-width: %.6g (delta: %g)'
+               % (interval, counter.max_error(), delta))
 
-    if r:
-        logging.getLogger('problog_sample').info('Rejected samples: %s' % r)
+    if counter.rejected:
+        logging.getLogger('problog_sample').info('Rejected samples: %s' % counter.rejected)
 
-    for k in estimates:
-        estimates[k] = estimates[k] / counts
-    return estimates
+    return counter.estimates()
+
+
+def _estimate_parallel(model, counter, done, n, processes, batch_size, propagate_evidence,
+                       kwdargs):
+    """Run the sampling for :func:`estimate` in multiple worker processes.
+
+    The n samples (if n > 0) are divided over the workers.
+    """
+    import multiprocessing
+
+    if n:
+        processes = min(processes, n)
+        quotas = [n // processes + (i < n % processes) for i in range(0, processes)]
+    else:
+        quotas = [0] * processes
+    queue = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    workers = []
+    for quota in quotas:
+        seed = random.randint(0, 2 ** 31 - 1)
+        worker = multiprocessing.Process(target=_estimate_worker,
+                                         args=(model, seed, quota, batch_size, propagate_evidence,
+                                               kwdargs, queue, stop))
+        worker.daemon = True
+        worker.start()
+        workers.append(worker)
+
+    running = len(workers)
+    error = None
+    try:
+        while running and not done():
+            result = queue.get()
+            if result is None:
+                running -= 1
+            elif isinstance(result, Exception):
+                error = result
+                break
+            else:
+                counter.update(*result)
+    finally:
+        stop.set()
+        # Drain the queue so that the workers can terminate.
+        while running:
+            try:
+                if queue.get(timeout=10) is None:
+                    running -= 1
+            except Exception:
+                break
+        for worker in workers:
+            worker.join(1)
+            if worker.is_alive():
+                worker.terminate()
+    if error is not None:
+        raise error
+
+
+class SampleWriter(object):
+    """Writes samples as a matrix with one row per sample and one column per query.
+
+    Rows are taken directly from the samples (see :func:`SampledFormula.query_row`).
+    The columns are all ground queries that occur in any sample, in order of appearance: with \
+    non-ground queries, later samples may contain new answers.
+    The rows are therefore spooled to a temporary file and written to the output in buffered \
+    chunks when the writer is closed; rows from before a column was added get a 0 in it.
+    A JSON header that maps columns to query terms is written to ``<filename>.json``.
+
+    :param filename: output file
+    :param buffer_size: size of the output buffer in bytes
+    """
+
+    format = None
+
+    def __init__(self, filename, buffer_size=1 << 20, strip_tag=False):
+        self.filename = filename
+        self.buffer_size = buffer_size
+        self.strip_tag = strip_tag
+        self.columns = {}
+        self.names = []
+        self.rows = 0
+        self._output = None
+        self._spool = None
+        self._segments = []     # list of [row width, number of rows]
+
+    def _add_columns(self, formula):
+        for k, v in formula.queries():
+            # Non-ground query terms stand for queries without answers in this sample.
+            if k not in self.columns and not k.functor.startswith('hidden_') and k.is_ground():
+                self.columns[k] = len(self.names)
+                self.names.append(k)
+
+    def _open(self):
+        self._output = open(self.filename, 'wb', self.buffer_size)
+
+    def write_batch(self, formulas):
+        """Write a batch of samples.
+
+        :param formulas: samples
+        :type formulas: list[SampledFormula]
+        """
+        if not formulas:
+            return
+        if self._spool is None:
+            self._spool = tempfile.TemporaryFile(buffering=self.buffer_size)
+        for f in formulas:
+            self._add_columns(f)
+        width = len(self.names)
+        rows = [f.query_row(self.columns) for f in formulas]
+        self._spool.write(b''.join(rows))
+        if self._segments and self._segments[-1][0] == width:
+            self._segments[-1][1] += len(rows)
+        else:
+            self._segments.append([width, len(rows)])
+        self.rows += len(rows)
+
+    def _spooled_rows(self):
+        """Read the spooled rows in chunks, padded to the final number of columns."""
+        width = len(self.names)
+        self._spool.seek(0)
+        for row_width, count in self._segments:
+            padding = bytes(width - row_width)
+            chunk_size = max(1, self.buffer_size // max(1, row_width))
+            while count > 0:
+                size = min(count, chunk_size)
+                data = self._spool.read(row_width * size)
+                yield [data[i:i + row_width] + padding
+                       for i in range(0, row_width * size, row_width)]
+                count -= size
+
+    def _write_rows(self, rows):
+        self._output.write(b''.join(rows))
+
+    def _close(self):
+        self._output.close()
+
+    def column_names(self):
+        """Names of the columns (as strings)."""
+        names = self.names
+        if self.strip_tag:
+            names = [n.args[0] for n in names]
+        return [str(n) for n in names]
+
+    def header(self):
+        """JSON header describing the output."""
+        return {'format': self.format,
+                'rows': self.rows,
+                'columns': self.column_names()}
+
+    def close(self):
+        import json
+        self._open()
+        if self._spool is not None:
+            for rows in self._spooled_rows():
+                self._write_rows(rows)
+            self._spool.close()
+        self._close()
+        with open(self.filename + '.json', 'w') as f:
+            json.dump(self.header(), f)
+
+
+class CSVSampleWriter(SampleWriter):
+    """Writes samples as a comma separated bit-matrix (with a header line)."""
+
+    format = 'csv'
+    _digits = bytes(bytearray([ord('0'), ord('1')]) + bytearray(254))
+
+    def _open(self):
+        import csv
+        import io
+        SampleWriter._open(self)
+        line = io.StringIO()
+        csv.writer(line, lineterminator='\n').writerow(self.column_names())
+        self._output.write(line.getvalue().encode('utf8'))
+
+    def _write_rows(self, rows):
+        digits = self._digits
+        width = len(self.names)
+        if width == 0:
+            self._output.write(b'\n' * len(rows))
+            return
+        separators = b',' * (width - 1) + b'\n'
+        line = bytearray(2 * width)
+        chunk = []
+        for row in rows:
+            line[0::2] = row.translate(digits)
+            line[1::2] = separators
+            chunk.append(bytes(line))
+        self._output.write(b''.join(chunk))
+
+
+class NpySampleWriter(SampleWriter):
+    """Writes samples as a NumPy ``.npy`` file containing an unsigned byte matrix.
+
+    The file is written without requiring NumPy. The shape in the header is filled in when the
+    writer is closed.
+    """
+
+    format = 'npy'
+    _header_size = 128
+
+    def _header_bytes(self):
+        header = "{'descr': '|u1', 'fortran_order': False, 'shape': (%d, %d), }" \
+                 % (self.rows, len(self.columns))
+        header = header.ljust(self._header_size - 11) + '\n'
+        return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1')
+
+    def _open(self):
+        SampleWriter._open(self)
+        self._output.write(self._header_bytes())
+
+    def _close(self):
+        self._output.seek(0)
+        self._output.write(self._header_bytes())
+        self._output.close()
+
+
+class ArrowSampleWriter(SampleWriter):
+    """Writes samples as Arrow record batches (one boolean column per query).
+
+    Requires the ``pyarrow`` package.
+    """
+
+    format = 'arrow'
+
+    def __init__(self, filename, **kwdargs):
+        try:
+            import pyarrow
+        except ImportError:
+            raise InstallError('The Arrow output format requires the pyarrow package.')
+        self._pa = pyarrow
+        self._writer = None
+        SampleWriter.__init__(self, filename, **kwdargs)
+
+    def _open(self):
+        SampleWriter._open(self)
+        schema = self._pa.schema([(n, self._pa.bool_()) for n in self.column_names()])
+        self._writer = self._pa.ipc.new_stream(self._output, schema)
+
+    def _write_rows(self, rows):
+        columns = [self._pa.array([bool(row[i]) for row in rows], type=self._pa.bool_())
+                   for i in range(0, len(self.names))]
+        self._writer.write_batch(self._pa.record_batch(columns, names=self.column_names()))
+
+    def _close(self):
+        self._writer.close()
+        self._output.close()
+
+
+sample_writers = {
+    'csv': CSVSampleWriter,
+    'npy': NpySampleWriter,
+    'arrow': ArrowSampleWriter
+}
 
 
 def print_result(result, output=sys.stdout, oneline=False):
@@ -716,6 +1353,15 @@ def main(args, result_handler=None):
     parser.add_argument('--oneline', action='store_true', help="Format samples on one line.")
     parser.add_argument('--estimate', action='store_true',
                         help='Estimate probability of queries from samples.')
+    parser.add_argument('--epsilon', type=float, default=None,
+                        help='Stop estimation when all confidence intervals have at most this '
+                             'half-width.')
+    parser.add_argument('--delta', type=float, default=0.05,
+                        help='Confidence parameter of the intervals (default: 0.05).')
+    parser.add_argument('--interval', choices=['wilson', 'hoeffding'], default='wilson',
+                        help='Confidence interval used for --epsilon (default: wilson).')
+    parser.add_argument('--processes', '-p', type=int, default=1,
+                        help='Number of worker processes used for estimation.')
     parser.add_argument('--timeout', '-t', type=int, default=0,
                         help="Set timeout (in seconds, default=off).")
     parser.add_argument('--output', '-o', type=str, default=None, help="Filename of output file.")
@@ -727,9 +1373,15 @@ def main(args, result_handler=None):
     parser.add_argument('-a', '--arg', dest='args', action='append',
                         help='Pass additional arguments to the cmd_args builtin.')
     parser.add_argument('--progress', help='show progress', action='store_true')
+    parser.add_argument('--output-format', choices=['text'] + sorted(sample_writers),
+                        default='text',
+                        help='Output format: text (default), or a bit-matrix of query values as '
+                             'csv, npy or arrow (requires --output).')
 
 
     args = parser.parse_args(args)
+    if args.output_format != 'text' and args.output is None:
+        parser.error('--output-format %s requires --output' % args.output_format)
 
     init_logger(args.verbose, 'problog_sample')
 
@@ -742,8 +1394,9 @@ def main(args, result_handler=None):
 
     pl = PrologFile(args.filename)
 
+    # Columnar output formats write to args.output themselves.
     outf = sys.stdout
-    if args.output is not None:
+    if args.output is not None and args.output_format == 'text':
         outf = open(args.output, 'w')
 
     if args.timeout:
@@ -766,6 +1419,13 @@ def main(args, result_handler=None):
         if args.estimate:
             results = estimate(pl, **vars(args))
             print (format_dictionary(results))
+        elif args.output_format != 'text':
+            writer = sample_writers[args.output_format](args.output, strip_tag=args.strip_tag)
+            try:
+                for batch in sample_batches(pl, format='formula', **vars(args)):
+                    writer.write_batch(batch)
+            finally:
+                writer.close()
         else:
             result_handler((True, sample(pl, format=outformat, **vars(args))),
                            output=outf, oneline=args.oneline)
@@ -777,7 +1437,7 @@ def main(args, result_handler=None):
     if args.timeout:
         stop_timer()
 
-    if args.output is not None:
+    if outf is not sys.stdout:
         outf.close()
 
 
@@ -1,12 +1,16 @@
 from __future__ import print_function
 
 import argparse
+import os
+import subprocess
+import sys
+import tempfile
 import time
 
 from ..program import SimpleProgram, PrologFile
 from ..engine import DefaultEngine
 from ..formula import LogicFormula, LogicDAG
-from .. import get_evaluatables, get_evaluatable
+from .. import get_evaluatables, get_evaluatable, root_path
 
 
 def argparser():
@@ -14,10 +18,12 @@ def argparser():
 
     # TODO support more options of task 'prob' (e.g. -k)
 
-    ap.add_argument('filename', nargs='+', help='Name of file to run (can be multiple).')
+    ap.add_argument('filename', nargs='*', help='Name of file to run (can be multiple).')
     ap.add_argument('-b', '--base', action='append', default=[], help='Additional models to load.')
     ap.add_argument('-n', '--repeat', type=int, default=1, help='Repeat each run this many times.')
     ap.add_argument('-k', choices=get_evaluatables())
+    ap.add_argument('--startup', action='store_true',
+                    help='Measure the startup time of the command line interface.')
 
     return ap
 
@@ -26,6 +32,13 @@ def main(argv):
     parser = argparser()
     args = parser.parse_args(argv)
 
+    if args.startup:
+        print('command', 'min', 'mean', sep=';')
+        for name, times in startup(repeat=args.repeat, ktype=args.k):
+            print(name, '%.6f' % min(times), '%.6f' % (sum(times) / len(times)), sep=';')
+    elif not args.filename:
+        parser.error('expected a model or --startup')
+
     first = True
     for filename in args.filename:
         for run in range(0, args.repeat):
@@ -98,6 +111,40 @@ class TimerCollection(object):
         return len(self.timers)
 
 
+def startup(repeat=1, ktype=None):
+    """Measure the latency of the command line interface in new processes, for \
+    ``problog --version`` and for a trivial model.
+
+    :param repeat: number of runs of each command
+    :param ktype: knowledge compilation for the trivial model
+    :return: list of tuples of command and elapsed times of its runs
+    """
+    fd, filename = tempfile.mkstemp(suffix='.pl')
+    with os.fdopen(fd, 'w') as f:
+        f.write('0.5::a.\nquery(a).\n')
+    model = [filename]
+    if ktype is not None:
+        model += ['-k', ktype]
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([root_path()] + env.get('PYTHONPATH', '').split(os.pathsep))
+    result = []
+    try:
+        with open(os.devnull, 'w') as devnull:
+            for name, args in (('--version', ['--version']), ('trivial model', model)):
+                times = []
+                for run in range(0, repeat):
+                    tmr = Timer(name)
+                    with tmr:
+                        subprocess.check_call([sys.executable, '-m', 'problog'] + args,
+                                              stdout=devnull, env=env)
+                    times.append(tmr.elapsed_time)
+                result.append((name, times))
+    finally:
+        os.remove(filename)
+    return result
+
+
 def process(filename, base=None, ktype=None):
     if base is None:
         base = []
@@ -23,6 +23,8 @@ from problog.program import PrologString
 from problog.engine import DefaultEngine
 from problog.logic import Term, Constant
 from problog.formula import LogicFormula
+from problog.errors import InvalidValue
+from problog import get_evaluatable
 
 import glob, os, random
 
@@ -107,6 +109,33 @@ class TestEngine(unittest.TestCase):
         self.assertCollectionEqual( r3, [])
 
 
+    def test_cache_policy(self):
+        """Tabling policies set with cache_policy/3"""
+
+        program = """
+            0.5::e(1). 0.5::e(2). 0.5::e(3).
+            d(X) :- e(X).
+            q(X) :- d(X), d(Y), X \\= Y.
+            query(q(_)).
+        """
+        expected = None
+        for policy, check in [('', lambda s: s[0] > 0 and s[3] == 0),
+                              (':- cache_policy(d, 1, lru(1)).', lambda s: s[3] > 0),
+                              (':- cache_policy(d, 1, never).', lambda s: s[0] == 0 and s[2] == 0)]:
+            engine = DefaultEngine()
+            db = engine.prepare(PrologString(policy + program))
+            target = engine.ground_all(db)
+            self.assertTrue(check(target._cache.statistics()['d/1']), policy)
+            result = get_evaluatable().create_from(target).evaluate()
+            if expected is None:
+                expected = result
+            self.assertEqual(expected, result)
+
+        engine = DefaultEngine()
+        self.assertRaises(InvalidValue, engine.prepare,
+                          PrologString(':- cache_policy(d, 1, lru(0)).' + program))
+
+
 class TestEngineCycles(unittest.TestCase):
 
     def setUp(self) :
@@ -0,0 +1,176 @@
+"""
+Part of the ProbLog distribution.
+
+Copyright 2015 KU Leuven, DTAI Research Group
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from problog import root_path
+from problog.logic import Term, Constant
+from problog.program import PrologString, PrologFile
+from problog.learning import lfi
+
+
+class TestLFI(unittest.TestCase):
+
+    model = """
+        t(0.5)::burglary.
+        0.2::earthquake.
+        t(0.3)::p_alarm1.
+        t(0.4)::p_alarm2.
+        t(0.6)::p_alarm3.
+
+        alarm :- burglary, earthquake, p_alarm1.
+        alarm :- burglary, \+earthquake, p_alarm2.
+        alarm :- \+burglary, earthquake, p_alarm3.
+    """
+
+    def setUp(self):
+        alarm = Term('alarm')
+        burglary = Term('burglary')
+        earthquake = Term('earthquake')
+
+        self.examples = [
+            [(burglary, False), (alarm, False)],
+            [(earthquake, False), (alarm, True), (burglary, True)],
+            [(burglary, False)],
+            [(burglary, True), (alarm, True)],
+            [(burglary, False), (alarm, False)]
+        ]
+
+    def _run(self, **kwdargs):
+        return lfi.run_lfi(PrologString(self.model), self.examples, **kwdargs)
+
+    def test_em(self):
+        score, weights, names, iterations, problem = self._run()
+        self.assertAlmostEqual(weights[0], 0.4)
+        self.assertAlmostEqual(weights[2], 1.0, places=4)
+
+    def test_processes(self):
+        expected = self._run()
+        result = self._run(processes=2)
+        self.assertAlmostEqual(expected[0], result[0])
+        for w1, w2 in zip(expected[1], result[1]):
+            self.assertAlmostEqual(w1, w2)
+        self.assertEqual(expected[3], result[3])
+
+    def test_parametrized(self):
+        model = PrologFile(root_path('problog', 'learning', 'test2_model.pl'))
+        examples = list(lfi.read_examples(root_path('problog', 'learning', 'test2_examples.pl')))
+        score, weights, names, iterations, problem = lfi.run_lfi(model, examples)
+        self.assertAlmostEqual(weights[0], 2.0 / 3, places=4)
+        self.assertAlmostEqual(weights[1], 1.0 / 3, places=4)
+
+    def test_shared_structure(self):
+        expected = self._run()
+        result = self._run(propagate_evidence=False)
+        self.assertAlmostEqual(expected[0], result[0])
+        for w1, w2 in zip(expected[1], result[1]):
+            self.assertAlmostEqual(w1, w2)
+        # Examples with the same evidence atoms are compiled into one circuit.
+        units = result[4]._compiled_examples.units()
+        self.assertEqual(len(units), 3)
+        self.assertEqual(sum(len(e.n) for e in result[4]._compiled_examples), 5)
+
+    def test_gradient(self):
+        expected = self._run()
+        for method, places in (('lbfgs', 6), ('adam', 2)):
+            result = self._run(method=method, max_iter=2000, min_improv=1e-12, learning_rate=0.05)
+            self.assertAlmostEqual(expected[0], result[0], places=places)
+            self.assertAlmostEqual(result[1][0], 0.4, places=2)
+            self.assertEqual(len(result[4].trace), result[3])
+
+    def test_online(self):
+        examples = self.examples * 20
+        score, weights, names, iterations, problem = lfi.run_lfi(
+            PrologString(self.model), examples, online=True, batch_size=10, cache_size=2,
+            propagate_evidence=False, max_iter=100)
+        self.assertEqual(iterations, 100)
+        self.assertAlmostEqual(weights[0], 0.4, places=1)
+        self.assertGreater(weights[2], 0.9)
+
+    def test_annotated_disjunction(self):
+        model = """
+            t(_)::a; t(_)::b :- c.
+            0.6::c.
+        """
+        examples = [[(Term('a'), True)], [(Term('b'), False)], [(Term('a'), False)]]
+        calls = []
+        normalize_weights = lfi.LFIProblem._normalize_weights
+
+        def record(problem, *args, **kwdargs):
+            calls.append(kwdargs)
+            return normalize_weights(problem, *args, **kwdargs)
+
+        lfi.LFIProblem._normalize_weights = record
+        try:
+            # Batch EM keeps the M-step result, unless normalization is requested.
+            lfi.run_lfi(PrologString(model), examples, max_iter=5)
+            self.assertEqual(calls, [])
+            lfi.run_lfi(PrologString(model), examples * 4, online=True, batch_size=4, max_iter=3)
+            self.assertEqual(calls, [{'exceeding': True}] * 3)
+        finally:
+            lfi.LFIProblem._normalize_weights = normalize_weights
+
+    def test_resume(self):
+        expected = self._run()
+        tmpdir = tempfile.mkdtemp()
+        try:
+            checkpoint = os.path.join(tmpdir, 'lfi.ckpt')
+            self._run(max_iter=5, checkpoint=checkpoint, checkpoint_every=2, checkpoint_circuits=True)
+            result = self._run(checkpoint=checkpoint, checkpoint_circuits=True, resume=True)
+        finally:
+            shutil.rmtree(tmpdir)
+        self.assertEqual(result[4].trace[0][0], 1)
+        self.assertEqual(expected[3], result[3])
+        self.assertAlmostEqual(expected[0], result[0])
+        for w1, w2 in zip(expected[1], result[1]):
+            self.assertAlmostEqual(w1, w2)
+
+    def test_skip_unchanged(self):
+        expected = self._run(skip_tolerance=None)
+        result = self._run(skip_tolerance=0.0)
+        self.assertEqual(expected[3], result[3])
+        self.assertAlmostEqual(expected[0], result[0])
+        for w1, w2 in zip(expected[1], result[1]):
+            self.assertAlmostEqual(w1, w2)
+        # Examples whose weights did not move are not evaluated again.
+        self.assertLess(result[4].evaluations, result[3] * len(self.examples))
+
+    def test_example_reader(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, 'examples.pl')
+            with open(filename, 'w') as f:
+                for example in self.examples:
+                    for atom, value in example:
+                        f.write('evidence(%s, %s).\n' % (atom, str(value).lower()))
+                    f.write('----\n')
+                    # Examples without evidence are skipped.
+                    f.write('% no evidence(a).\n----\na.\n----\n')
+            examples = lfi.ExampleReader(filename)
+            self.assertEqual(list(examples), self.examples)
+            self.assertEqual(len(examples), len(self.examples))
+            self.assertEqual(examples.read(1, 3), self.examples[1:3])
+        finally:
+            shutil.rmtree(tmpdir)
+        # Examples that are not simple evidence facts are parsed by the engine.
+        text = 'a :- b.\nb.\nevidence(a).\nevidence(c(1), false).\n'
+        self.assertEqual(lfi.parse_example(text), [(Term('c', Constant(1)), False), (Term('a'), True)])
@@ -0,0 +1,103 @@
+"""
+Part of the ProbLog distribution.
+
+Copyright 2015 KU Leuven, DTAI Research Group
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from problog import library_cache
+from problog.parser import PrologParser, ParseError
+from problog.program import ExtendedPrologFactory, PrologFile, PrologString
+
+
+class TestParser(unittest.TestCase):
+
+    program = """
+        % facts
+        0.3::edge(a,b).
+        0.25 :: edge( b , c ).
+        1::edge(c,d). /* comment */ node(1, 2.5, 1e3).
+        stop.
+        0.5::\\+a.
+        path(X, Y) :- edge(X, Y).
+        q(0x1f). r("s"). 0.4::t(-1).
+        query(path(a,_)).
+    """
+
+    def _parse(self, string, fast_facts):
+        parser = PrologParser(ExtendedPrologFactory())
+        parser.fast_facts = fast_facts
+        return parser.parseString(string)
+
+    def test_fast_facts(self):
+        expected = self._parse(self.program, False)
+        result = self._parse(self.program, True)
+        self.assertEqual(list(map(str, expected)), list(map(str, result)))
+        for e, r in zip(expected, result):
+            self.assertEqual(e.location, r.location)
+            self.assertEqual(str(getattr(e, 'probability', None)),
+                             str(getattr(r, 'probability', None)))
+
+    def test_errors(self):
+        for string in ('a(b). c(d)', 'a(b). .', 'a (b).'):
+            self.assertRaises(ParseError, self._parse, string, True)
+
+    def test_stream_file(self):
+        tmpdir = tempfile.mkdtemp()
+        chunk_size = PrologFile.chunk_size
+        try:
+            filename = os.path.join(tmpdir, 'program.pl')
+            PrologFile.chunk_size = 16
+            # Negative heads (written with the operator 'not' or '\+') rename the other
+            #  clauses of their predicate, including the clauses in earlier blocks.
+            negative = '0.6::a. b :- a.\n' + self.program
+            programs = (self.program, self.program.replace('0.5::\\+a.', ''),
+                        negative.replace('0.5::\\+a.', '0.3::not a.'),
+                        negative.replace('0.5::\\+a.', 'not a :- stop.'))
+            for program in programs:
+                with open(filename, 'w') as f:
+                    f.write(program)
+                expected = PrologString(program)
+                for processes in (1, 2):
+                    result = PrologFile(filename, processes=processes)
+                    self.assertEqual(list(map(str, expected)), list(map(str, result)))
+                    self.assertEqual([result.lineno(c.location) for c in result],
+                                     [expected.lineno(c.location) for c in expected])
+
+            with open(filename, 'w') as f:
+                f.write(self.program.replace('0.5::\\+a.', '') + '\n a(b) c(d).\n')
+            for processes in (1, 2):
+                with self.assertRaises(ParseError) as context:
+                    list(PrologFile(filename, processes=processes))
+                self.assertEqual(context.exception.location[1:], (12, 7))
+        finally:
+            PrologFile.chunk_size = chunk_size
+            shutil.rmtree(tmpdir)
+
+    def test_library_cache(self):
+        filename = os.path.join(library_cache.library_root, 'apply.pl')
+        expected = PrologFile(filename, identifier=2)
+        for i in range(2):
+            result = library_cache.load(filename, identifier=2)
+            self.assertIsNotNone(result)
+            clauses, line_info = result
+            self.assertEqual(list(map(str, expected)), list(map(str, clauses)))
+            self.assertEqual([c.location for c in expected], [c.location for c in clauses])
+            self.assertEqual(expected.line_info[0], line_info)
@@ -0,0 +1,294 @@
+"""
+Part of the ProbLog distribution.
+
+Copyright 2015 KU Leuven, DTAI Research Group
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+
+import unittest
+import random
+import math
+import os
+import json
+import shutil
+import tempfile
+import io
+import contextlib
+
+from problog.program import PrologString
+from problog.logic import Term, Constant
+from problog.tasks import sample
+
+
+class TestSampleEstimate(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(12345)
+        self.model = PrologString("""
+            0.3::a.
+            0.6::b.
+            c :- a; b.
+            query(a).
+            query(c).
+            query(d).
+            d :- a, \+a.
+        """)
+
+    def _estimate(self, **kwdargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return sample.estimate(self.model, **kwdargs)
+
+    def test_fixed_samples(self):
+        result = self._estimate(n=500)
+        self.assertAlmostEqual(result[Term('a')], 0.3, delta=0.1)
+        self.assertAlmostEqual(result[Term('c')], 0.72, delta=0.1)
+        self.assertEqual(result[Term('d')], 0.0)
+
+    def test_epsilon(self):
+        for interval in ('wilson', 'hoeffding'):
+            result = self._estimate(epsilon=0.05, interval=interval, batch_size=50)
+            self.assertAlmostEqual(result[Term('a')], 0.3, delta=0.1)
+
+    def test_processes(self):
+        sequential = self._estimate(n=2000)
+        parallel = self._estimate(n=2000, processes=2, batch_size=50)
+        for query in (Term('a'), Term('c')):
+            self.assertAlmostEqual(parallel[query], sequential[query], delta=0.06)
+        self.assertEqual(parallel[Term('d')], 0.0)
+        # Exactly n samples are drawn, also if n is not a multiple of the batch size.
+        for n, processes in ((150, 3), (2, 3)):
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                sample.estimate(self.model, n=n, processes=processes)
+            self.assertIn('after %d samples' % n, output.getvalue())
+
+    def test_interval(self):
+        counter = sample.EstimateCounter(delta=0.05, interval='wilson')
+        counter.update({Term('a'): 50}, 100, 0)
+        self.assertAlmostEqual(counter.error(50), 0.0960, places=3)
+        counter = sample.EstimateCounter(delta=0.05, interval='hoeffding')
+        counter.update({Term('a'): 50}, 100, 0)
+        self.assertAlmostEqual(counter.error(50), 0.1358, places=3)
+        self.assertTrue(counter.converged(0.2))
+        self.assertFalse(counter.converged(0.1))
+
+
+class TestSampleProbability(unittest.TestCase):
+
+    def test_batch_probability(self):
+        random.seed(3)
+        model = PrologString("""
+            0.3::a.
+            0.6::b.
+            0.2::x(1); 0.3::x(2).
+            c :- a; b.
+            query(c).
+            query(x(1)).
+            query(x(2)).
+        """)
+        batches = list(sample.sample_batches(model, n=20, batch_size=8, with_probability=True))
+        self.assertEqual([len(b) for b in batches], [8, 8, 4])
+        for batch in batches:
+            for s in batch:
+                p = float(s.split('% Probability: ')[1])
+                self.assertIn(round(p, 6), {round(a * b * x, 6) for a in (0.3, 0.7)
+                                            for b in (0.6, 0.4) for x in (0.2, 0.3, 0.5)})
+
+    def test_sample_count(self):
+        model = PrologString("""
+            0.3::a.
+            query(a).
+        """)
+        self.assertEqual(len(list(sample.sample(model, n=1))), 1)
+        self.assertEqual(len(list(sample.sample(model, n=101))), 101)
+
+    def test_sample_incremental(self):
+        """Samples are yielded as soon as they are drawn."""
+        model = PrologString("""
+            0.3::a.
+            query(a).
+        """)
+        calls = []
+        ground = sample.ground
+
+        def _ground(*args, **kwdargs):
+            calls.append(1)
+            return ground(*args, **kwdargs)
+
+        sample.ground = _ground
+        try:
+            samples = sample.sample(model, n=0, with_probability=True)
+            p = float(next(samples).split('% Probability: ')[1])
+            self.assertIn(round(p, 6), (0.3, 0.7))
+            self.assertEqual(len(calls), 1)
+        finally:
+            sample.ground = ground
+
+
+
+class TestSampleWriters(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(5)
+        self.model = PrologString("""
+            0.5::a.
+            b :- \+a.
+            query(a).
+            query(b).
+        """)
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, cls, n=10):
+        filename = os.path.join(self.tmpdir, 'samples')
+        writer = cls(filename)
+        for batch in sample.sample_batches(self.model, n=n, format='formula', batch_size=4):
+            writer.write_batch(batch)
+        writer.close()
+        with open(filename + '.json') as f:
+            header = json.load(f)
+        self.assertEqual(header['rows'], n)
+        self.assertEqual(header['columns'], ['a', 'b'])
+        return filename
+
+    def test_csv(self):
+        filename = self._write(sample.CSVSampleWriter)
+        with open(filename) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0], 'a,b')
+        self.assertEqual(len(lines), 11)
+        for line in lines[1:]:
+            self.assertIn(line, ('1,0', '0,1'))
+
+    def test_npy(self):
+        filename = self._write(sample.NpySampleWriter)
+        with open(filename, 'rb') as f:
+            data = f.read()
+        self.assertTrue(data.startswith(b'\x93NUMPY'))
+        self.assertIn(b"'shape': (10, 2)", data[:128])
+        rows = data[128:]
+        self.assertEqual(len(rows), 20)
+        for i in range(0, 10):
+            self.assertEqual(rows[2 * i] + rows[2 * i + 1], 1)
+
+    def test_new_answers(self):
+        """Answers of non-ground queries that only occur in later samples get a column."""
+        self.model = PrologString("""
+            0.5::p(1). 0.5::p(2). 0.5::p(3).
+            query(p(X)).
+        """)
+        filename = os.path.join(self.tmpdir, 'samples')
+        writer = sample.CSVSampleWriter(filename)
+        seen = []
+        for batch in sample.sample_batches(self.model, n=20, format='formula', batch_size=4):
+            seen += [set(str(k) for k, v in f.queries() if v is not None) for f in batch]
+            writer.write_batch(batch)
+        writer.close()
+        self.assertNotEqual(seen[0], set.union(*seen))
+        with open(filename) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(sorted(lines[0].split(',')), ['p(1)', 'p(2)', 'p(3)'])
+        self.assertEqual(len(lines), 21)
+        for line in lines[1:]:
+            self.assertEqual(len(line.split(',')), 3)
+
+
+@unittest.skipIf(sample.numpy is None, 'NumPy is not available')
+class TestDistributionBuffers(unittest.TestCase):
+
+    def test_reproducible(self):
+        a = sample.DistributionBuffers(seed=7, size=16)
+        b = sample.DistributionBuffers(seed=7, size=16)
+        for _ in range(0, 40):
+            self.assertEqual(a.draw('normal', [1.0, 2.0]), b.draw('normal', [1.0, 2.0]))
+            self.assertEqual(a.draw('poisson', [3.0]), b.draw('poisson', [3.0]))
+
+    def test_moments(self):
+        draws = sample.DistributionBuffers(seed=1, size=1000)
+        n = 5000
+        normal = [draws.draw('normal', [10.0, 2.0]) for _ in range(0, n)]
+        self.assertAlmostEqual(sum(normal) / n, 10.0, delta=0.2)
+        uniform = [draws.draw('uniform', [2.0, 4.0]) for _ in range(0, n)]
+        self.assertTrue(all(2.0 <= x <= 4.0 for x in uniform))
+        triangular = [draws.draw('triangular', [0.0, 1.0, 1.0]) for _ in range(0, n)]
+        self.assertAlmostEqual(sum(triangular) / n, 2.0 / 3, delta=0.02)
+        dice = set(draws.draw('in_range', [1.0, 6.0]) for _ in range(0, 500))
+        self.assertEqual(dice, {1, 2, 3, 4, 5, 6})
+
+    def test_vonmises_range(self):
+        draws = sample.DistributionBuffers(seed=1)
+        values = [draws.draw('vonmises', [0.0, 1.0]) for _ in range(0, 1000)]
+        self.assertTrue(all(0.0 <= x < 2 * math.pi for x in values))
+
+    def test_bounded_buffers(self):
+        draws = sample.DistributionBuffers(seed=1, size=64, max_buffers=8)
+        for i in range(0, 100):
+            draws.draw('poisson', [1.0 + i])
+        self.assertEqual(len(draws._buffers), 8)
+        # Parameter sets that are used once draw a single value.
+        self.assertTrue(all(len(b[0]) == 1 for b in draws._buffers.values()))
+        for _ in range(0, 100):
+            draws.draw('poisson', [2.0])
+        self.assertEqual(len(draws._buffers[('poisson', (2.0,))][0]), 64)
+
+    def test_exclude(self):
+        draws = sample.DistributionBuffers(seed=1, exclude=['normal'])
+        self.assertFalse(draws.supports('normal'))
+        self.assertTrue(draws.supports('gaussian'))
+
+
+class TestGibbs(unittest.TestCase):
+
+    def test_rare_evidence(self):
+        """Evidence with low probability that makes rejection sampling impractical."""
+        from problog.tasks import mcmc
+        model = PrologString("""
+            0.001::a.
+            0.001::b.
+            0.5::c.
+            e :- a, b.
+            e :- a, c.
+            evidence(e).
+            query(b).
+            query(c).
+        """)
+        probs, rhat = mcmc.mcmc(model, samples=2000, burnin=50, chains=2, seed=42)
+        # P(b | e) = 0.001 / (0.001 + 0.5 - 0.0005)
+        self.assertAlmostEqual(probs[Term('b')], 0.002, delta=0.01)
+        self.assertAlmostEqual(probs[Term('c')], 0.999, delta=0.01)
+        self.assertEqual(set(rhat), {Term('b'), Term('c')})
+
+    def test_annotated_disjunction(self):
+        from problog.tasks import mcmc
+        model = PrologString("""
+            0.2::x(1); 0.3::x(2); 0.5::x(3).
+            0.4::y.
+            z :- x(1).
+            z :- x(2), y.
+            evidence(z).
+            query(x(1)).
+            query(x(2)).
+        """)
+        probs, rhat = mcmc.mcmc(model, samples=3000, burnin=50, chains=2, seed=1)
+        # P(z) = 0.2 + 0.3 * 0.4 = 0.32
+        self.assertAlmostEqual(probs[Term('x', Constant(1))], 0.2 / 0.32, delta=0.05)
+        self.assertAlmostEqual(probs[Term('x', Constant(2))], 0.12 / 0.32, delta=0.05)
+
+    def test_rhat(self):
+        from problog.tasks import mcmc
+        self.assertAlmostEqual(mcmc.rhat([50, 50, 50], 100), 0.995, places=3)
+        self.assertEqual(mcmc.rhat([0, 100], 100), float('inf'))
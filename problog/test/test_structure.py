@@ -0,0 +1,103 @@
+"""
+Part of the ProbLog distribution.
+
+Copyright 2015 KU Leuven, DTAI Research Group
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+from __future__ import print_function
+
+import random
+import unittest
+
+from problog.logic import Term
+from problog.program import PrologString
+from problog.learning import structure
+
+
+class _PoolCounter(structure.StructureLearner):
+
+    pools = 0
+
+    def _start_pool(self):
+        self.pools += 1
+        return structure.StructureLearner._start_pool(self)
+
+
+class TestStructure(unittest.TestCase):
+
+    model = """
+        t(0.5)::burglary.
+        0.2::earthquake.
+    """
+
+    def setUp(self):
+        alarm = Term('alarm')
+        burglary = Term('burglary')
+        earthquake = Term('earthquake')
+
+        self.examples = [
+            [(burglary, False), (alarm, False)],
+            [(earthquake, False), (alarm, True), (burglary, True)],
+            [(burglary, False)],
+            [(burglary, True), (alarm, True)],
+            [(burglary, False), (alarm, False)]
+        ]
+
+    def test_learn(self):
+        score, learned, model, learner = structure.run_structure(
+            PrologString(self.model), self.examples, 'alarm/0', max_iter=20)
+        self.assertEqual(learned[0], (Term('burglary'),))
+        self.assertIn('alarm :- burglary', model)
+
+    def test_cached_groundings(self):
+        learners = [structure.StructureLearner(PrologString(self.model), self.examples, 'alarm/0',
+                                               cache_groundings=cache, max_iter=20)
+                    for cache in (False, True)]
+        candidates = learners[0].refine([(Term('earthquake'),)])
+        scores = []
+        for learner in learners:
+            random.seed(1)
+            scores.append([learner._evaluate_safe(learned)[0] for learned in candidates])
+        for s1, s2 in zip(*scores):
+            if s1 is None:
+                self.assertIsNone(s2)
+            else:
+                self.assertAlmostEqual(s1, s2)
+        self.assertGreater(learners[1].groundings.hits, 0)
+
+    def test_seed(self):
+        results = []
+        for cache, processes in ((False, 1), (True, 1), (True, 2)):
+            random.seed(cache + processes)
+            learner = _PoolCounter(PrologString(self.model), self.examples, 'alarm/0',
+                                   cache_groundings=cache, processes=processes, max_iter=20,
+                                   seed=0)
+            score, learned, model = learner.run()
+            results.append((learner.evaluations, learned, model))
+            self.assertGreater(learner.grounding_time, 0)
+            # The worker processes are started once for all steps of the search.
+            self.assertGreater(len(learner.trace), 2)
+            self.assertEqual(learner.pools, int(processes > 1))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0], results[2])
+
+    def test_errors(self):
+        learner = structure.StructureLearner(PrologString(self.model), self.examples, 'alarm/0',
+                                             max_iter=20)
+
+        def fail(learned):
+            raise ValueError('bug')
+
+        learner.evaluate = fail
+        self.assertRaises(ValueError, learner._evaluate_safe, [])
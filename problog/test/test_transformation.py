@@ -1,9 +1,13 @@
 from __future__ import print_function
 
+import pickle
 import unittest
 
+from io import StringIO
+
 from problog.program import PrologString
-from problog.formula import LogicFormula
+from problog.formula import LogicFormula, LogicDAG
+from problog.cnf_formula import CNF, write_dimacs
 from problog import get_evaluatable
 from problog.evaluator import SemiringProbability
 
@@ -59,6 +63,33 @@ class TestTransformation(unittest.TestCase):
         kc = kc_class.create_from(lf)  # type: LogicFormula
         self.assertEqual(3, kc.atomcount)
 
+    def test_disk_storage(self):
+        """Formulas with disk_storage contain the same nodes as in-memory formulas."""
+        program = """
+                    0.3::edge(1,2). 0.4::edge(2,3). 0.5::edge(3,1). 0.6::edge(2,4).
+                    path(X,Y) :- edge(X,Y).
+                    path(X,Y) :- edge(X,Z), path(Z,Y).
+                    0.2::a ; 0.8::b.
+                    c :- a.
+                    c :- b, \+ path(1,4).
+                    query(path(1,_)).
+                    query(c).
+                """
+        dag = LogicDAG.create_from(PrologString(program), label_all=True)
+        disk = LogicDAG.create_from(PrologString(program), label_all=True,
+                                    disk_storage=True, disk_cache_size=2)
+        self.assertEqual(str(dag), str(disk))
+        self.assertEqual(str(dag), str(disk.copy()))
+        self.assertEqual(str(dag), str(pickle.loads(pickle.dumps(disk))))
+
+        dimacs = CNF.create_from(dag).to_dimacs(names=True)
+        output = StringIO()
+        write_dimacs(disk, output, names=True)
+        self.assertEqual(dimacs, output.getvalue())
+
+        kc_class = get_evaluatable(name='ddnnf')
+        self.assertEqual(kc_class.create_from(dag).evaluate(), kc_class.create_from(disk).evaluate())
+
 
 if __name__ == '__main__':
     suite = unittest.TestLoader().loadTestsFromTestCase(TestTransformation)
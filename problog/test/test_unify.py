@@ -28,6 +28,23 @@ class TestUnify(unittest.TestCase):
         except AttributeError:
             self.assertCollectionEqual = self.assertCountEqual
 
+    def test_compile_head(self):
+        heads = [(0, 1), (0, 0), (a(0), 0), (0, a(0, b)), (a, 0), (a(0, 1), b(1))]
+        calls = [(-1, -2), (-1, -1), (a, b), (a(-1), a), (a(-1), -2), (None, a(-1, b)),
+                 (a(b, -1), b(-1)), (a(-1, -1), b(c))]
+        for head in heads:
+            match = problog.engine_unify.compile_head(head)
+            for call in calls:
+                expected = [None] * 2
+                result = [None] * 2
+                try:
+                    problog.engine_unify.unify_call_head(call, head, expected)
+                except problog.engine_unify.UnifyError:
+                    self.assertRaises(problog.engine_unify.UnifyError, match, call, result)
+                else:
+                    match(call, result)
+                    self.assertEqual(expected, result)
+
 
 tests = [
     (a(-1, a, -2, -2), a(-1, -3, -1, -2), {-1: -1, -2: -1}),
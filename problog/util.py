@@ -30,11 +30,15 @@ import signal
 import sys
 import os
 import subprocess
-import distutils.spawn
 import tempfile
 import imp
 import collections
 
+try:
+    from shutil import which
+except ImportError:
+    from distutils.spawn import find_executable as which
+
 
 class ProbLogLogFormatter(logging.Formatter):
 
@@ -213,7 +217,7 @@ def subprocess_call(*popenargs, **kwargs):
 
 
 def _find_process(cmd, *rest):
-    fullname = distutils.spawn.find_executable(cmd[0])
+    fullname = which(cmd[0])
     if fullname is not None:
         return ([fullname] + cmd[1:],) + rest
     else: